@@ -0,0 +1,248 @@
+import os
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import case, func, select
+
+from connection import patient_table, Session
+from patient_service import get_latest_patient_id
+from scoring import CLUSTER_DESCRIPTIONS
+
+# Population analytics over the whole patient table. Histograms and per-group counts and
+# means are aggregated in SQL (GROUP BY over CASE buckets), so only a few rows come back.
+# Percentiles need the values themselves and are computed with NumPy over a columnar
+# snapshot of the few columns involved, which grows incrementally as patients arrive.
+
+ANALYTICS_CACHE_TTL_SECONDS = float(os.getenv('ANALYTICS_CACHE_TTL_SECONDS', '60'))
+# New patients invalidate the cached summary, but it is recomputed at most this often
+ANALYTICS_MIN_REFRESH_SECONDS = float(os.getenv('ANALYTICS_MIN_REFRESH_SECONDS', '5'))
+# Rows are only appended to the snapshot; a periodic rebuild picks up risk columns
+# rewritten by backfill_risk.py
+ANALYTICS_SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv('ANALYTICS_SNAPSHOT_MAX_AGE_SECONDS', '900'))
+SNAPSHOT_FETCH_SIZE = 50000
+
+# Metric -> (patient column, histogram bucket edges). Values below the first edge or at
+# or above the last one fall into open-ended buckets.
+HISTOGRAM_METRICS = {
+    'BMI': ('bmi', [15 + 2.5 * i for i in range(17)]),
+    'BloodGlucose': ('blood_glucose', [60 + 10 * i for i in range(25)]),
+    'HDL': ('hdl', [20 + 5 * i for i in range(21)]),
+    'Triglycerides': ('triglycerides', [25 * i for i in range(25)]),
+}
+
+AGE_BAND_EDGES = [30, 40, 50, 60, 70]
+# Band index -> label; rows without an age are grouped under -1, like unscored clusters
+AGE_BAND_LABELS = {-1: 'Unknown', 0: '<30', 1: '30-39', 2: '40-49', 3: '50-59', 4: '60-69', 5: '70+'}
+
+PERCENTILES = [10, 25, 50, 75, 90]
+
+SNAPSHOT_COLUMNS = ['id', 'age', 'risk_cluster'] + [column for column, _ in HISTOGRAM_METRICS.values()]
+
+
+def _bucket_expression(column, edges):
+    # Bucket index 0..len(edges): 0 is below edges[0], i is [edges[i-1], edges[i])
+    return case(*[(column < edge, index) for index, edge in enumerate(edges)], else_=len(edges))
+
+
+def _bucket_label(edges, index):
+    if index == 0:
+        return f"<{edges[0]:g}"
+    if index == len(edges):
+        return f">={edges[-1]:g}"
+    return f"{edges[index - 1]:g}-{edges[index]:g}"
+
+
+def sql_histograms(session):
+    histograms = {}
+    for metric, (column_name, edges) in HISTOGRAM_METRICS.items():
+        column = patient_table.c[column_name]
+        bucket = _bucket_expression(column, edges).label('bucket')
+        rows = session.execute(
+            select(bucket, func.count()).where(column.is_not(None)).group_by(bucket)
+        ).fetchall()
+        counts = [0] * (len(edges) + 1)
+        for index, count in rows:
+            counts[index] = count
+        histograms[metric] = {
+            'buckets': [_bucket_label(edges, index) for index in range(len(edges) + 1)],
+            'counts': counts,
+        }
+    return histograms
+
+
+def sql_group_summaries(session, group_expression):
+    # {group key: {'count': n, 'mean': {metric: mean}}}
+    means = [func.avg(patient_table.c[column]).label(metric) for metric, (column, _) in HISTOGRAM_METRICS.items()]
+    key = group_expression.label('group_key')
+    rows = session.execute(select(key, func.count().label('count'), *means).group_by(key)).fetchall()
+    return {
+        row.group_key: {
+            'count': row.count,
+            'mean': {metric: None if getattr(row, metric) is None else float(getattr(row, metric))
+                     for metric in HISTOGRAM_METRICS},
+        }
+        for row in rows
+    }
+
+
+# The snapshot columns as one float64 matrix (NULL -> NaN), filled from id order and
+# extended with rows above the last id seen
+class ColumnarSnapshot:
+    def __init__(self, columns=SNAPSHOT_COLUMNS, max_age_seconds=ANALYTICS_SNAPSHOT_MAX_AGE_SECONDS):
+        self.columns = columns
+        self.index = {column: position for position, column in enumerate(columns)}
+        self.max_age_seconds = max_age_seconds
+        self.buffer = np.empty((0, len(columns)))
+        self.size = 0
+        self.last_id = 0
+        self.built_at = None
+
+    def column(self, name):
+        return self.buffer[:self.size, self.index[name]]
+
+    def _append(self, rows):
+        needed = self.size + len(rows)
+        if needed > len(self.buffer):
+            # Grow geometrically so appending stays amortized O(new rows)
+            grown = np.empty((max(needed, 2 * len(self.buffer), 1024), len(self.columns)))
+            grown[:self.size] = self.buffer[:self.size]
+            self.buffer = grown
+        self.buffer[self.size:needed] = np.array(rows, dtype='float64')
+        self.size = needed
+
+    def refresh(self):
+        if self.built_at is None or time.monotonic() - self.built_at > self.max_age_seconds:
+            self.size = 0
+            self.last_id = 0
+            self.built_at = time.monotonic()
+
+        selected = [patient_table.c[column] for column in self.columns]
+        session = Session()
+        try:
+            while True:
+                rows = session.execute(
+                    select(*selected).where(patient_table.c.id > self.last_id)
+                    .order_by(patient_table.c.id).limit(SNAPSHOT_FETCH_SIZE)
+                ).fetchall()
+                if not rows:
+                    break
+                self._append(rows)
+                self.last_id = rows[-1][0]
+                if len(rows) < SNAPSHOT_FETCH_SIZE:
+                    break
+        finally:
+            session.close()
+
+
+def group_percentiles(snapshot, group_keys, groups):
+    # {group: {metric: {'p10': ..., ...}}} in one NumPy pass per group over the snapshot
+    result = {}
+    for group in groups:
+        mask = group_keys == group
+        result[group] = {}
+        for metric, (column, _) in HISTOGRAM_METRICS.items():
+            values = snapshot.column(column)[mask]
+            values = values[~np.isnan(values)]
+            if len(values) == 0:
+                result[group][metric] = None
+                continue
+            result[group][metric] = {
+                f"p{percentile}": float(value)
+                for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES))
+            }
+    return result
+
+
+class PopulationAnalytics:
+    def __init__(self, ttl_seconds=ANALYTICS_CACHE_TTL_SECONDS, min_refresh_seconds=ANALYTICS_MIN_REFRESH_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.min_refresh_seconds = min_refresh_seconds
+        self.snapshot = ColumnarSnapshot()
+        self.lock = threading.Lock()
+        self.cached = None
+        self.cached_at = None
+        self.cached_latest_id = None
+        self.hits = 0
+        self.misses = 0
+
+    def summary(self):
+        # Served from the cache until it expires or a newer patient id appears; inserts from
+        # this process advance the id at once, others within CHANGE_FEED_REFRESH_SECONDS
+        latest_id = get_latest_patient_id()
+        with self.lock:
+            if self.cached is not None:
+                age = time.monotonic() - self.cached_at
+                if age < self.min_refresh_seconds or (latest_id == self.cached_latest_id and age < self.ttl_seconds):
+                    self.hits += 1
+                    return self.cached
+            self.misses += 1
+            start = time.perf_counter()
+            summary = self.compute()
+            summary['latest_patient_id'] = latest_id
+            summary['compute_ms'] = (time.perf_counter() - start) * 1000
+            self.cached = summary
+            self.cached_at = time.monotonic()
+            self.cached_latest_id = latest_id
+            return summary
+
+    def compute(self):
+        # NULL fails every comparison and would otherwise land in the last band
+        age_band = case((patient_table.c.age.is_(None), -1),
+                        *[(patient_table.c.age < edge, index) for index, edge in enumerate(AGE_BAND_EDGES)],
+                        else_=len(AGE_BAND_EDGES))
+        session = Session()
+        try:
+            total = session.execute(select(func.count()).select_from(patient_table)).scalar()
+            histograms = sql_histograms(session)
+            by_cluster = sql_group_summaries(session, patient_table.c.risk_cluster)
+            by_age_band = sql_group_summaries(session, age_band)
+        finally:
+            session.close()
+
+        self.snapshot.refresh()
+        cluster_keys = self.snapshot.column('risk_cluster')
+        # Unscored rows (NULL cluster) are grouped under -1
+        cluster_keys = np.where(np.isnan(cluster_keys), -1, cluster_keys)
+        cluster_percentiles = group_percentiles(
+            self.snapshot, cluster_keys, [-1 if key is None else key for key in by_cluster])
+        ages = self.snapshot.column('age')
+        # np.digitize puts NaN past the last edge; missing ages get the SQL band -1 instead
+        age_keys = np.where(np.isnan(ages), -1, np.digitize(ages, AGE_BAND_EDGES))
+        age_percentiles = group_percentiles(self.snapshot, age_keys, list(by_age_band))
+
+        return {
+            'total': total,
+            'histograms': histograms,
+            'by_risk_cluster': [
+                {
+                    'cluster': key,
+                    'label': CLUSTER_DESCRIPTIONS.get(key, 'Not scored'),
+                    **summary,
+                    'percentiles': cluster_percentiles[-1 if key is None else key],
+                }
+                for key, summary in sorted(by_cluster.items(), key=lambda item: -1 if item[0] is None else item[0])
+            ],
+            'by_age_band': [
+                {
+                    'band': AGE_BAND_LABELS[key],
+                    **summary,
+                    'percentiles': age_percentiles[key],
+                }
+                for key, summary in sorted(by_age_band.items())
+            ],
+        }
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'snapshot_rows': self.snapshot.size,
+                'snapshot_last_id': self.snapshot.last_id,
+            }
+
+
+population_analytics = PopulationAnalytics()
@@ -0,0 +1,97 @@
+// Clientside callbacks of the digital twin page (registered in dashboard.py). They only
+// combine the patient values in current-patient-data with the thresholds and global
+// feature importances published in the model-constants store, so they run in the
+// browser instead of costing a server round trip per refresh.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    digitalTwin: {
+        healthAlerts: function(patient, constants) {
+            if (!patient || !constants) {
+                return window.dash_clientside.no_update;
+            }
+
+            var alerts = [];
+            constants.alerts.forEach(function(alert) {
+                var value = patient[alert.column];
+                if (value === null || value === undefined) {
+                    return;
+                }
+                if ((alert.comparison === 'above' && value > alert.threshold) ||
+                    (alert.comparison === 'below' && value < alert.threshold)) {
+                    alerts.push({
+                        type: 'Div',
+                        namespace: 'dash_html_components',
+                        props: {
+                            className: 'blinking',
+                            children: [
+                                {
+                                    type: 'I',
+                                    namespace: 'dash_html_components',
+                                    props: {
+                                        className: 'fas fa-exclamation-triangle',
+                                        style: {color: '#e74c3c', marginRight: '10px'}
+                                    }
+                                },
+                                alert.label + ': ' + value.toFixed(2) + ' mg/dL (Normal range: ' + alert.normal_range + ')'
+                            ]
+                        }
+                    });
+                }
+            });
+
+            if (alerts.length === 0) {
+                return {
+                    type: 'Div',
+                    namespace: 'dash_html_components',
+                    props: {
+                        style: {color: '#2ecc71', fontWeight: 'bold'},
+                        children: [
+                            {
+                                type: 'I',
+                                namespace: 'dash_html_components',
+                                props: {
+                                    className: 'fas fa-check-circle',
+                                    style: {color: '#2ecc71', marginRight: '10px'}
+                                }
+                            },
+                            'No health alerts at this time. All indicators are within normal ranges.'
+                        ]
+                    }
+                };
+            }
+            return {type: 'Div', namespace: 'dash_html_components', props: {children: alerts}};
+        },
+
+        featureImportance: function(patient, constants, figure) {
+            if (!patient || !constants || !figure) {
+                return window.dash_clientside.no_update;
+            }
+
+            // Global importance scaled by the patient's value relative to a typical maximum,
+            // as a percentage, sorted ascending
+            var bars = constants.features.map(function(feature) {
+                var value = patient[feature.column] || 0;
+                return {
+                    name: feature.display_name,
+                    value: value,
+                    importance: feature.importance * Math.min(1, value / feature.max_value) * 100
+                };
+            });
+            bars.sort(function(a, b) { return a.importance - b.importance; });
+
+            // Copy the skeleton and replace only the patient-specific values
+            var trace = Object.assign({}, figure.data[0], {
+                x: bars.map(function(bar) { return bar.importance; }),
+                y: bars.map(function(bar) { return bar.name; }),
+                text: bars.map(function(bar) {
+                    return 'Value: ' + bar.value.toFixed(1) + ' | Impact: ' + bar.importance.toFixed(1) + '%';
+                })
+            });
+            var maxImportance = bars[bars.length - 1].importance;
+            var xaxis = Object.assign({}, figure.layout.xaxis, {range: [0, maxImportance * 1.1]});  // Add 10% padding
+            return {
+                data: [trace].concat(figure.data.slice(1)),
+                layout: Object.assign({}, figure.layout, {xaxis: xaxis})
+            };
+        }
+    }
+});
@@ -0,0 +1,91 @@
+import argparse
+import time
+
+import numpy as np
+from sqlalchemy import bindparam, or_, select, update
+
+from connection import patient_table, get_engine, wait_for_db
+from model_store import load_or_train, DATASET_PATH, SELECTED_FEATURES
+from online_clustering import CLUSTER_MODE, online_cluster_model
+from risk_pipeline import FEATURE_COLUMNS
+from scoring import score_matrix
+
+# Scores patient rows that have no stored risk, or one from another model version, in
+# id order and in chunks. Each chunk is committed on its own and finished rows carry the
+# current model_version, so an interrupted run simply continues where it stopped when
+# started again. With CLUSTER_MODE=online the version includes the online clusters' update
+# count (RiskPipeline.stored_version), and rows scored against older centers are rescored
+# with the latest checkpoint. Run it after deploying a retrained model:
+#
+#   python backfill_risk.py --chunk-size 5000
+
+BACKFILL_CHUNK_SIZE = 5000
+
+
+def fetch_stale_chunk(conn, model_version, after_id, chunk_size):
+    columns = [patient_table.c.id] + [patient_table.c[column] for column in FEATURE_COLUMNS.values()]
+    return conn.execute(
+        select(*columns)
+        .where(patient_table.c.id > after_id)
+        .where(or_(patient_table.c.model_version.is_(None), patient_table.c.model_version != model_version))
+        .order_by(patient_table.c.id)
+        .limit(chunk_size)
+    ).fetchall()
+
+
+def score_rows(pipeline, rows):
+    # Update parameters for one chunk; missing measurements are imputed by the pipeline
+    values = np.array([row[1:] for row in rows], dtype='float64')
+    model_version = pipeline.stored_version()
+    probabilities, clusters = score_matrix(pipeline, values)
+    return [
+        {
+            'b_id': row[0],
+            'b_risk_probability': probability,
+            'b_risk_cluster': cluster,
+            'b_model_version': model_version,
+        }
+        for row, probability, cluster in zip(rows, probabilities.tolist(), clusters.tolist())
+    ]
+
+
+def backfill(trainer, clustertrainer, chunk_size=BACKFILL_CHUNK_SIZE, max_chunks=None):
+    engine = get_engine()
+    statement = (
+        update(patient_table)
+        .where(patient_table.c.id == bindparam('b_id'))
+        .values(risk_probability=bindparam('b_risk_probability'),
+                risk_cluster=bindparam('b_risk_cluster'),
+                model_version=bindparam('b_model_version'))
+    )
+    after_id = 0
+    scored = 0
+    chunks = 0
+    start = time.perf_counter()
+    while max_chunks is None or chunks < max_chunks:
+        with engine.begin() as conn:
+            rows = fetch_stale_chunk(conn, trainer.pipeline.stored_version(), after_id, chunk_size)
+            if not rows:
+                break
+            conn.execute(statement, score_rows(trainer.pipeline, rows))
+        after_id = rows[-1][0]
+        scored += len(rows)
+        chunks += 1
+        elapsed = time.perf_counter() - start
+        print(f"Scored {scored} rows up to id {after_id} ({scored / elapsed:.0f} rows/s)")
+    return scored
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Store risk scores for patients scored by no or another model version')
+    parser.add_argument('--chunk-size', type=int, default=BACKFILL_CHUNK_SIZE, help='Rows scored and committed together')
+    parser.add_argument('--max-chunks', type=int, help='Stop after this many chunks (the next run resumes)')
+    args = parser.parse_args()
+
+    wait_for_db()
+    trainer, clustertrainer = load_or_train(DATASET_PATH, SELECTED_FEATURES, n_clusters=3)
+    if CLUSTER_MODE == 'online':
+        # The clusters as of the server's latest checkpoint; the updater is not started
+        clustertrainer, _ = online_cluster_model(trainer, clustertrainer)
+    total = backfill(trainer, clustertrainer, chunk_size=args.chunk_size, max_chunks=args.max_chunks)
+    print(f"Backfill complete: {total} rows scored with model {trainer.pipeline.stored_version()}")
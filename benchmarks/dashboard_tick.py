@@ -0,0 +1,133 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# What one refresh of the digital twin page costs: every callback that fires when
+# current-patient-data changes is posted to /_dash-update-component through Flask's test
+# client, the way the browser does on each tick. Reports requests, response bytes and
+# server time per tick, and the time spent serializing each callback's return value.
+# Runs against a local SQLite database seeded from digital_twin_patient.sql:
+#
+#   python benchmarks/dashboard_tick.py --ticks 50
+
+TRIGGER = 'current-patient-data.data'
+
+
+def split_output(output):
+    # "a.b" or "..a.b...c.d.." -> [{'id': 'a', 'property': 'b'}, ...]
+    specs = output[2:-2].split('...') if output.startswith('..') else [output]
+    outputs = []
+    for spec in specs:
+        component_id, prop = spec.rsplit('.', 1)
+        outputs.append({'id': component_id, 'property': prop})
+    return outputs
+
+
+def tick_callbacks(app):
+    # Server callbacks triggered by a new patient in the store, as (name, output key,
+    # callback), and the number of clientside ones, which run in the browser
+    callbacks = []
+    clientside = 0
+    for output, callback in app.callback_map.items():
+        if not any(f"{dependency['id']}.{dependency['property']}" == TRIGGER for dependency in callback['inputs']):
+            continue
+        if 'callback' not in callback:
+            clientside += 1
+            continue
+        callbacks.append((callback['callback'].__wrapped__.__name__, output, callback))
+    return callbacks, clientside
+
+
+def request_body(output, callback, values, changed=(TRIGGER,)):
+    # callback is a callback_map entry or a /_dash-dependencies item; values maps
+    # "id.property" to the value the browser would send
+    outputs = split_output(output)
+    return {
+        'output': output,
+        'outputs': outputs if output.startswith('..') else outputs[0],
+        'inputs': [dict(dependency, value=values.get(f"{dependency['id']}.{dependency['property']}"))
+                   for dependency in callback['inputs']],
+        'state': [dict(dependency, value=values.get(f"{dependency['id']}.{dependency['property']}"))
+                  for dependency in callback['state']],
+        'changedPropIds': list(changed),
+    }
+
+
+def serialization_ms(callback, values, repeat=20):
+    from plotly.io.json import to_json_plotly
+
+    args = [values.get(f"{dependency['id']}.{dependency['property']}")
+            for dependency in callback['inputs'] + callback['state']]
+    result = callback['callback'].__wrapped__(*args)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        to_json_plotly(result)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-tick request count, payload size and server time of the dashboard')
+    parser.add_argument('--ticks', type=int, default=50, help='Refreshes to simulate, each with another patient')
+    parser.add_argument('--workdir', help='Directory for the benchmark database (default: a temporary one)')
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='digital-twin-tick-')
+    os.environ['DB_BACKEND'] = 'sqlite'
+    os.environ['SQLITE_PATH'] = os.path.join(workdir, 'benchmark.db')
+
+    from dashboard import Dashboard
+    from import_dump import import_dump
+    from model_store import load_or_train, DATASET_PATH, SELECTED_FEATURES
+    from patient_service import fetch_patients_after
+
+    import_dump(os.path.join(REPO_ROOT, 'digital_twin_patient.sql'), replace=True)
+    trainer, clustertrainer = load_or_train(DATASET_PATH, SELECTED_FEATURES, n_clusters=3)
+    dashboard = Dashboard(trainer, clustertrainer)
+    dashboard.layout()
+    dashboard.add_callbacks()
+    client = dashboard.app.server.test_client()
+
+    patients = [dashboard.patient_dict(row) for row in fetch_patients_after(0, args.ticks)]
+    callbacks, clientside = tick_callbacks(dashboard.app)
+
+    # Warm up imports, caches and the first request path
+    for _, output, callback in callbacks:
+        client.post('/_dash-update-component', json=request_body(output, callback, {TRIGGER: patients[0]}))
+
+    per_callback = {name: {'bytes': [], 'ms': []} for name, _, _ in callbacks}
+    tick_ms = []
+    for patient in patients:
+        tick_start = time.perf_counter()
+        for name, output, callback in callbacks:
+            start = time.perf_counter()
+            response = client.post('/_dash-update-component', json=request_body(output, callback, {TRIGGER: patient}))
+            per_callback[name]['ms'].append((time.perf_counter() - start) * 1000)
+            if response.status_code not in (200, 204):
+                raise RuntimeError(f"{name} returned HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+            per_callback[name]['bytes'].append(len(response.get_data()))
+        tick_ms.append((time.perf_counter() - tick_start) * 1000)
+
+    print(f"{'callback':<28}{'bytes':>10}{'server ms':>12}{'serialize ms':>15}")
+    total_bytes = 0
+    for name, output, callback in callbacks:
+        stats = per_callback[name]
+        mean_bytes = statistics.mean(stats['bytes'])
+        total_bytes += mean_bytes
+        serialize = serialization_ms(callback, {TRIGGER: patients[-1]})
+        print(f"{name:<28}{mean_bytes:>10.0f}{statistics.median(stats['ms']):>12.3f}{serialize:>15.3f}")
+    print(f"{'per tick':<28}{total_bytes:>10.0f}{statistics.median(tick_ms):>12.3f}"
+          f"{'':>15}  ({len(callbacks)} requests, {clientside} clientside callbacks, {len(patients)} ticks)")
+    print(json.dumps({'requests_per_tick': len(callbacks), 'clientside_callbacks': clientside,
+                      'bytes_per_tick': total_bytes,
+                      'server_ms_per_tick': statistics.median(tick_ms)}))
+
+
+if __name__ == '__main__':
+    main()
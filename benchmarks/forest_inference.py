@@ -0,0 +1,62 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_store import load_or_train, DATASET_PATH, SELECTED_FEATURES
+
+# Parity check and latency comparison of the compiled forest against sklearn's
+# predict_proba. Run from the repository root: python benchmarks/forest_inference.py
+
+# Rough value ranges of the six dashboard features, used to draw random patients
+FEATURE_LOW = np.array([18, 50, 15, 50, 10, 30], dtype='float32')
+FEATURE_HIGH = np.array([90, 180, 60, 400, 120, 800], dtype='float32')
+
+
+def random_patients(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return (FEATURE_LOW + rng.random((n_rows, len(FEATURE_LOW))) * (FEATURE_HIGH - FEATURE_LOW)).astype('float32')
+
+
+def time_call(function, X, repeat):
+    function(X)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(X)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compiled forest parity and latency benchmark')
+    parser.add_argument('--rows', type=int, default=10000, help='Rows in the batch benchmark and parity check')
+    parser.add_argument('--repeat', type=int, default=200, help='Repetitions of the single-row benchmark')
+    args = parser.parse_args()
+
+    trainer, _ = load_or_train(DATASET_PATH, SELECTED_FEATURES, n_clusters=3)
+    sklearn_model = trainer.model
+    compiled = trainer.pipeline.compiled_forest
+
+    X = random_patients(args.rows)
+    expected = sklearn_model.predict_proba(X)
+    actual = compiled.predict_proba(X)
+    if not np.array_equal(expected, actual):
+        print(f"Parity FAILED: max abs difference {np.abs(expected - actual).max():.3e}")
+        sys.exit(1)
+    print(f"Parity OK: compiled forest matches sklearn on {args.rows} rows")
+
+    single = X[:1]
+    batch_repeat = max(1, args.repeat // 50)
+    print(f"{'case':<12}{'sklearn ms':>14}{'compiled ms':>14}{'pipeline ms':>14}")
+    for label, rows, repeat in (('1 row', single, args.repeat), (f"{args.rows} rows", X, batch_repeat)):
+        print(f"{label:<12}"
+              f"{time_call(sklearn_model.predict_proba, rows, repeat):>14.3f}"
+              f"{time_call(compiled.predict_proba, rows, repeat):>14.3f}"
+              f"{time_call(trainer.pipeline.predict_proba, rows, repeat):>14.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,328 @@
+import argparse
+import contextlib
+import http.client
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from dashboard_tick import TRIGGER, request_body
+
+# Load generator for the API and the dashboard together. Upload workers post a mix of
+# single records (/api/upload_patient_record) and bulk batches (/api/upload_patient_records)
+# while simulated dashboard sessions open the latest-patient page and then post the same
+# /_dash-update-component requests as its 1-second interval-update ticks, plus the panel
+# refresh whenever a tick finds a new patient. Prints throughput and p50/p95/p99 latency
+# per route.
+#
+# Without --url the dashboard and the API are served in this process (the app serve.py
+# builds, on Werkzeug's threaded server) from a local SQLite database seeded from
+# digital_twin_patient.sql:
+#
+#   python benchmarks/loadtest.py --duration 30 --sessions 20 --upload-workers 4
+#
+# To size gunicorn workers, start serve.py (for example with DB_BACKEND=sqlite and
+# SERVE_WORKERS=N) and point the generator at it:
+#
+#   python benchmarks/loadtest.py --url http://localhost:8050 --duration 60 --sessions 50
+
+POLL_TRIGGER = 'interval-update.n_intervals'
+PAGE_TRIGGER = 'url.pathname'
+PAGE_PATH = '/digital-twin'
+
+
+class LatencyRecorder:
+    def __init__(self, measure_from):
+        self.measure_from = measure_from
+        self.latencies = {}
+        self.errors = {}
+        self.records = 0
+        self.lock = threading.Lock()
+
+    def record(self, route, started_at, ms, ok, records=0):
+        # Requests started during the warm-up are not counted
+        if started_at < self.measure_from:
+            return
+        with self.lock:
+            self.latencies.setdefault(route, []).append(ms)
+            if not ok:
+                self.errors[route] = self.errors.get(route, 0) + 1
+            elif records:
+                self.records += records
+
+    def report(self, seconds):
+        routes = []
+        with self.lock:
+            for route in sorted(self.latencies):
+                latencies = np.array(self.latencies[route])
+                p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+                routes.append({
+                    'route': route,
+                    'requests': len(latencies),
+                    'errors': self.errors.get(route, 0),
+                    'requests_per_second': len(latencies) / seconds,
+                    'p50_ms': p50,
+                    'p95_ms': p95,
+                    'p99_ms': p99,
+                    'max_ms': latencies.max(),
+                })
+            records = self.records
+        return routes, records
+
+
+# One keep-alive connection per simulated client, reopened after a failure
+class HttpClient:
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.connection = None
+
+    def post(self, path, body):
+        payload = json.dumps(body).encode()
+        try:
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            self.connection.request('POST', path, payload, {'Content-Type': 'application/json'})
+            response = self.connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            return None, None
+        return response.status, data
+
+    def get_json(self, path):
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            if response.status != 200:
+                raise RuntimeError(f"GET {path} returned HTTP {response.status}")
+            return json.loads(response.read())
+        finally:
+            connection.close()
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+        self.connection = None
+
+
+def timed_post(client, recorder, route, path, body, records=0):
+    started_at = time.perf_counter()
+    status, data = client.post(path, body)
+    ms = (time.perf_counter() - started_at) * 1000
+    # 204 is Dash's "nothing to update"
+    ok = status is not None and 200 <= status < 300
+    recorder.record(route, started_at, ms, ok, records)
+    return status, data
+
+
+def synthetic_record(rng, worker, sequence):
+    return {
+        'Name': f"Load Test {worker}-{sequence}",
+        'Age': rng.randint(20, 80),
+        'WaistCirc': round(rng.uniform(60, 140), 1),
+        'BMI': round(rng.uniform(17, 45), 1),
+        'BloodGlucose': round(rng.uniform(70, 220), 1),
+        'HDL': round(rng.uniform(25, 90), 1),
+        'Triglycerides': round(rng.uniform(50, 400), 1),
+    }
+
+
+def upload_worker(base_url, recorder, stop_at, worker, args):
+    # Closed loop: each worker sends its next upload once the previous one is answered,
+    # optionally paced to --upload-rate requests per second
+    client = HttpClient(base_url)
+    rng = random.Random(args.seed + worker)
+    sequence = 0
+    next_at = time.perf_counter()
+    while time.perf_counter() < stop_at:
+        if rng.random() < args.bulk_ratio:
+            records = [synthetic_record(rng, worker, sequence + offset) for offset in range(args.bulk_size)]
+            timed_post(client, recorder, 'POST /api/upload_patient_records', '/api/upload_patient_records',
+                       records, records=len(records))
+        else:
+            records = [synthetic_record(rng, worker, sequence)]
+            timed_post(client, recorder, 'POST /api/upload_patient_record', '/api/upload_patient_record',
+                       records[0], records=1)
+        sequence += len(records)
+        if args.upload_rate > 0:
+            next_at += 1 / args.upload_rate
+            time.sleep(max(0.0, next_at - time.perf_counter()))
+    client.close()
+
+
+def dashboard_callbacks(dependencies):
+    # The server callbacks a latest-patient page runs: the page load, the interval poll and
+    # the panel refreshes that fire when current-patient-data changes
+    page, poll, refresh = None, None, []
+    for dependency in dependencies:
+        if dependency.get('clientside_function'):
+            continue
+        inputs = {f"{item['id']}.{item['property']}" for item in dependency['inputs']}
+        if PAGE_TRIGGER in inputs and 'current-patient-data' in dependency['output']:
+            page = dependency
+        elif POLL_TRIGGER in inputs:
+            poll = dependency
+        elif TRIGGER in inputs:
+            refresh.append(dependency)
+    if page is None or poll is None:
+        raise RuntimeError("The server does not expose the latest-patient page callbacks")
+    return page, poll, refresh
+
+
+def callback_route(dependency, name):
+    output = dependency['output'].strip('.').split('...')[0].split('@')[0]
+    return f"DASH {name} {output}"
+
+
+def new_patient(status, data):
+    # current-patient-data from a /_dash-update-component response, or None if unchanged
+    # or failed (failures are already counted as errors)
+    if status != 200:
+        return None
+    response = json.loads(data).get('response', {})
+    return response.get('current-patient-data', {}).get('data')
+
+
+def dashboard_session(base_url, recorder, stop_at, session, callbacks, args):
+    page, poll, refresh = callbacks
+    client = HttpClient(base_url)
+    rng = random.Random(args.seed + 10000 + session)
+
+    def refresh_panels(patient):
+        for dependency in refresh:
+            timed_post(client, recorder, callback_route(dependency, 'refresh'), '/_dash-update-component',
+                       request_body(dependency['output'], dependency, {TRIGGER: patient}))
+
+    # Spread the sessions over the first tick so they do not poll in lockstep
+    time.sleep(rng.uniform(0, args.tick_seconds))
+    status, data = timed_post(client, recorder, callback_route(page, 'page'), '/_dash-update-component',
+                         request_body(page['output'], page, {PAGE_TRIGGER: PAGE_PATH}, changed=(PAGE_TRIGGER,)))
+    patient = new_patient(status, data)
+    if patient:
+        refresh_panels(patient)
+
+    n_intervals = 0
+    next_tick = time.perf_counter()
+    while True:
+        next_tick = max(next_tick + args.tick_seconds, time.perf_counter())
+        time.sleep(max(0.0, next_tick - time.perf_counter()))
+        if time.perf_counter() >= stop_at:
+            break
+        n_intervals += 1
+        values = {POLL_TRIGGER: n_intervals, 'interval-update.interval': int(args.tick_seconds * 1000),
+                  TRIGGER: patient}
+        status, data = timed_post(client, recorder, callback_route(poll, 'poll'), '/_dash-update-component',
+                             request_body(poll['output'], poll, values, changed=(POLL_TRIGGER,)))
+        latest = new_patient(status, data)
+        if latest:
+            patient = latest
+            refresh_panels(patient)
+    client.close()
+
+
+def start_local_server(workdir):
+    # The app serve.py runs, on Werkzeug's threaded server, over a seeded SQLite database
+    os.environ['DB_BACKEND'] = 'sqlite'
+    os.environ['SQLITE_PATH'] = os.path.join(workdir, 'loadtest.db')
+
+    from werkzeug.serving import make_server
+
+    from import_dump import import_dump
+    from serve import create_app
+
+    import_dump(os.path.join(REPO_ROOT, 'digital_twin_patient.sql'), replace=True)
+    # One access log line per request would cost more than some of the requests
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the upload API and the dashboard together')
+    parser.add_argument('--url', help='Base URL of a running serve.py (default: serve the app in this process)')
+    parser.add_argument('--duration', type=float, default=30, help='Measured seconds, after the warm-up')
+    parser.add_argument('--warmup', type=float, default=3, help='Seconds of load before measuring starts')
+    parser.add_argument('--sessions', type=int, default=10, help='Simulated dashboard sessions')
+    parser.add_argument('--tick-seconds', type=float, default=1.0, help='interval-update period of a session')
+    parser.add_argument('--upload-workers', type=int, default=2, help='Concurrent upload clients')
+    parser.add_argument('--upload-rate', type=float, default=0,
+                        help='Uploads per second per worker (default: as fast as answered)')
+    parser.add_argument('--bulk-ratio', type=float, default=0.1, help='Fraction of uploads sent as bulk batches')
+    parser.add_argument('--bulk-size', type=int, default=100, help='Records per bulk upload')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the generated records')
+    parser.add_argument('--workdir', help='Directory for the local database (default: a temporary one)')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url.rstrip('/') if args.url else None
+    if base_url is None:
+        workdir = args.workdir or tempfile.mkdtemp(prefix='digital-twin-load-')
+        os.makedirs(workdir, exist_ok=True)
+        server, base_url = start_local_server(workdir)
+
+    callbacks = dashboard_callbacks(HttpClient(base_url).get_json('/_dash-dependencies'))
+    start = time.perf_counter()
+    measure_from = start + args.warmup
+    stop_at = measure_from + args.duration
+    recorder = LatencyRecorder(measure_from)
+
+    threads = [threading.Thread(target=upload_worker, args=(base_url, recorder, stop_at, worker, args))
+               for worker in range(args.upload_workers)]
+    threads += [threading.Thread(target=dashboard_session, args=(base_url, recorder, stop_at, session, callbacks, args))
+                for session in range(args.sessions)]
+    print(f"Load testing {base_url}: {args.upload_workers} upload workers, {args.sessions} dashboard sessions, "
+          f"{args.warmup:.0f} s warm-up + {args.duration:.0f} s")
+    # The in-process server prints a line per stored upload; keep the report readable
+    quiet = contextlib.redirect_stdout(open(os.devnull, 'w')) if server is not None else contextlib.nullcontext()
+    with quiet:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    # Requests still in flight at the deadline finish after it
+    seconds = max(args.duration, time.perf_counter() - measure_from)
+    if server is not None:
+        server.shutdown()
+
+    routes, records = recorder.report(seconds)
+    print(f"{'route':<52}{'requests':>10}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for route in routes:
+        print(f"{route['route']:<52}{route['requests']:>10}{route['errors']:>8}{route['requests_per_second']:>9.1f}"
+              f"{route['p50_ms']:>9.1f}{route['p95_ms']:>9.1f}{route['p99_ms']:>9.1f}{route['max_ms']:>9.1f}")
+    total_requests = sum(route['requests'] for route in routes)
+    print(f"{'total':<52}{total_requests:>10}{sum(route['errors'] for route in routes):>8}"
+          f"{total_requests / seconds:>9.1f}   ({records / seconds:.1f} records stored/s)")
+
+    results = {
+        'url': base_url if args.url else 'local',
+        'seconds': seconds,
+        'sessions': args.sessions,
+        'upload_workers': args.upload_workers,
+        'bulk_ratio': args.bulk_ratio,
+        'bulk_size': args.bulk_size,
+        'records_per_second': records / seconds,
+        'routes': routes,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
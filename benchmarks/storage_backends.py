@@ -0,0 +1,149 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from suite import measure
+
+# Compares patient_service latency on the MySQL and SQLite backends. Each backend runs
+# in its own process because connection.py reads DB_BACKEND at import time.
+#
+#   python benchmarks/storage_backends.py --backends sqlite,mysql --rows 10000
+#
+# The MySQL run uses the MYSQL_* settings and adds rows named 'Benchmark ...' to its
+# patient table, removed again at the end; point MYSQL_DATABASE at a scratch database.
+
+BENCHMARK_NAME_PREFIX = 'Benchmark'
+SEED_CHUNK_SIZE = 5000
+
+
+def seed(n_rows):
+    from sqlalchemy import func, select
+    import connection
+    from connection import patient_table
+    from import_dump import import_dump
+
+    engine = connection.get_engine()
+    connection.metadata.create_all(engine)
+    with engine.connect() as conn:
+        empty = conn.execute(select(func.count()).select_from(patient_table)).scalar() == 0
+    if empty:
+        import_dump(os.path.join(REPO_ROOT, 'digital_twin_patient.sql'))
+
+    with engine.begin() as conn:
+        for start in range(0, n_rows, SEED_CHUNK_SIZE):
+            conn.execute(patient_table.insert(), [
+                {
+                    'name': f"{BENCHMARK_NAME_PREFIX} {i % 1000}",
+                    'age': 20 + i % 60,
+                    'waist_circ': 70.0 + i % 60,
+                    'bmi': 18.0 + i % 25,
+                    'blood_glucose': 80.0 + i % 120,
+                    'hdl': 30.0 + i % 50,
+                    'triglycerides': 60.0 + i % 300,
+                }
+                for i in range(start, min(start + SEED_CHUNK_SIZE, n_rows))
+            ])
+
+
+def cleanup():
+    import connection
+    from connection import patient_table
+
+    with connection.get_engine().begin() as conn:
+        conn.execute(patient_table.delete().where(patient_table.c.name.like(f"{BENCHMARK_NAME_PREFIX}%")))
+
+
+def run_worker(n_rows, repeat):
+    import patient_service
+    from patient_service import (insert_patient, insert_patients, get_latest_patient_id, fetch_patient_data_by_id,
+                                 fetch_patient_ids_by_name, count_patients, fetch_patients_page)
+
+    def cold():
+        patient_service.patient_cache.clear()
+        patient_service._expire_high_water_mark()
+
+    record = {'Name': f"{BENCHMARK_NAME_PREFIX} insert", 'Age': 55, 'WaistCirc': 90.0, 'BMI': 27.5,
+              'BloodGlucose': 110, 'HDL': 45, 'Triglycerides': 160}
+    filters = [('age', '>=', 50), ('name', 'contains', f"{BENCHMARK_NAME_PREFIX} 1")]
+
+    seed(n_rows)
+    try:
+        latest_id = get_latest_patient_id()
+        middle = fetch_patients_page(10, offset=n_rows // 2)[-1]
+        cursor = (middle.created_at.isoformat() if middle.created_at is not None else None, middle.id)
+        workload = [
+            ('insert_patient', lambda: insert_patient(record)),
+            ('insert_patients.500', lambda: insert_patients([record] * 500)),
+            ('get_latest_patient_id', get_latest_patient_id),
+            ('fetch_patient_data_by_id', lambda: fetch_patient_data_by_id(latest_id)),
+            ('fetch_patient_ids_by_name', lambda: fetch_patient_ids_by_name(f"{BENCHMARK_NAME_PREFIX} 42")),
+            ('count_patients', count_patients),
+            ('count_patients.filtered', lambda: count_patients(filters)),
+            ('fetch_patients_page.first', lambda: fetch_patients_page(10)),
+            ('fetch_patients_page.offset', lambda: fetch_patients_page(10, offset=n_rows // 2)),
+            ('fetch_patients_page.cursor', lambda: fetch_patients_page(10, cursor=cursor)),
+            ('fetch_patients_page.filtered', lambda: fetch_patients_page(10, sort_column='bmi', filters=filters)),
+        ]
+        return {name: measure(function, repeat, setup=cold) for name, function in workload}
+    finally:
+        cleanup()
+
+
+def run_backend(backend, args):
+    env = dict(os.environ, DB_BACKEND=backend)
+    if backend == 'sqlite':
+        env['SQLITE_PATH'] = args.sqlite_path or os.path.join(tempfile.mkdtemp(prefix='digital-twin-sqlite-'), 'benchmark.db')
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', '--rows', str(args.rows), '--repeat', str(args.repeat)],
+        env=env, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        # The exception line is followed by SQLAlchemy's "Background on this error" link
+        print(f"{backend}: failed")
+        print('\n'.join(completed.stderr.strip().splitlines()[-3:]))
+        return None
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare patient_service latency across storage backends')
+    parser.add_argument('--backends', default='sqlite,mysql', help='Comma-separated backends to run')
+    parser.add_argument('--rows', type=int, default=10000, help='Synthetic patients added before timing')
+    parser.add_argument('--repeat', type=int, default=20, help='Repetitions per operation')
+    parser.add_argument('--sqlite-path', help='SQLite file to use (default: a temp file)')
+    parser.add_argument('--output', help='Write the results as JSON')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        results = run_worker(args.rows, args.repeat)
+        print(json.dumps(results))
+        return
+
+    backends = args.backends.split(',')
+    results = {}
+    for backend in backends:
+        backend_results = run_backend(backend, args)
+        if backend_results is not None:
+            results[backend] = backend_results
+
+    ran = [backend for backend in backends if backend in results]
+    if ran:
+        names = list(results[ran[0]])
+        print(f"{'median ms':<32}" + ''.join(f"{backend:>12}" for backend in ran))
+        for name in names:
+            print(f"{name:<32}" + ''.join(f"{results[backend][name]['median_ms']:>12.3f}" for backend in ran))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'rows': args.rows, 'repeat': args.repeat, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
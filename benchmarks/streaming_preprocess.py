@@ -0,0 +1,93 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from suite import synthetic_dataset
+
+# Peak traced memory and time of preparing the training data, in memory (whole source in
+# a DataFrame, as DataPreprocessor does) and streaming (StreamingPreprocessor feeding
+# ModelTrainer.prepare_data_from_chunks), on synthetic sources of growing size:
+#
+#   python benchmarks/streaming_preprocess.py --sizes 10000,100000,1000000
+#
+# The streaming peak should stay flat once the source is larger than the training sample.
+
+
+def write_source(n_rows, workdir, file_format):
+    from data_preprocessor import DataPreprocessor
+    from model_store import DATASET_PATH
+
+    base_preprocessor = DataPreprocessor(os.path.join(REPO_ROOT, DATASET_PATH), use_cache=False)
+    base_preprocessor.load_data()
+    data = synthetic_dataset(base_preprocessor.get_processed_data(), n_rows)
+    path = os.path.join(workdir, f"streaming_{n_rows}.{file_format}")
+    if file_format == 'csv':
+        data.to_csv(path, index=False)
+    else:
+        data.to_excel(path, index=False)
+    return path
+
+
+def prepare_in_memory(path):
+    from data_preprocessor import DataPreprocessor
+    from model_store import SELECTED_FEATURES
+    from model_trainer import ModelTrainer
+
+    preprocessor = DataPreprocessor(path, use_cache=False)
+    preprocessor.data = pd.read_csv(path) if path.endswith('.csv') else pd.read_excel(path)
+    preprocessor.impute_missing_values()
+    ModelTrainer(SELECTED_FEATURES).prepare_data(preprocessor.get_processed_data())
+
+
+def prepare_streaming(path, chunk_size):
+    from model_store import SELECTED_FEATURES
+    from model_trainer import ModelTrainer
+    from streaming_preprocessor import StreamingPreprocessor
+
+    preprocessor = StreamingPreprocessor(path, chunk_size=chunk_size).fit()
+    ModelTrainer(SELECTED_FEATURES).prepare_data_from_chunks(preprocessor.iter_imputed_chunks())
+
+
+def traced(function, *args):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    function(*args)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2 ** 20, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Peak memory of in-memory and streaming preprocessing')
+    parser.add_argument('--sizes', default='10000,100000,1000000', help='Comma-separated source sizes in rows')
+    parser.add_argument('--format', choices=['csv', 'xlsx'], default='csv', help='Source file format')
+    parser.add_argument('--chunk-size', type=int, default=50000, help='Rows per streamed chunk')
+    parser.add_argument('--skip-memory', action='store_true', help='Only run the streaming mode')
+    parser.add_argument('--workdir', help='Directory for the synthetic sources (default: a temporary one)')
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='digital-twin-stream-')
+    os.makedirs(workdir, exist_ok=True)
+    print(f"{'rows':>10}{'mode':>12}{'peak MB':>12}{'seconds':>10}")
+    for n_rows in sorted(int(size) for size in args.sizes.split(',')):
+        path = write_source(n_rows, workdir, args.format)
+        modes = [('streaming', prepare_streaming, (path, args.chunk_size))]
+        if not args.skip_memory:
+            modes.insert(0, ('memory', prepare_in_memory, (path,)))
+        for mode, function, function_args in modes:
+            peak_mb, seconds = traced(function, *function_args)
+            print(f"{n_rows:>10}{mode:>12}{peak_mb:>12.1f}{seconds:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,413 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# Benchmark suite for the hot paths of the app: preprocessing, training, clustering,
+# inference, patient_service queries and the dashboard callbacks. Data is resampled
+# from the real workbook to each requested size, results are written as JSON, and a
+# previous results file can be passed as a baseline to fail on regressions.
+#
+#   python benchmarks/suite.py --sizes 1000,10000 --output results.json
+#   python benchmarks/suite.py --baseline results.json --threshold 0.25
+#   python benchmarks/suite.py --results new.json --baseline old.json
+
+DEFAULT_SIZES = '1000,10000,100000,1000000'
+# The pipeline group always runs: the other groups need its fitted models
+GROUPS = ['inference', 'database', 'dashboard']
+
+# Writing and parsing .xlsx is slow; larger synthetic datasets are only timed warm,
+# from a primed dataset cache
+MAX_XLSX_ROWS = 100000
+
+# Operations that take seconds at scale are run once from this size up
+HEAVY_SINGLE_RUN_ROWS = 100000
+
+# Continuous columns that get a little noise so resampled rows are not exact copies
+JITTER_COLUMNS = ['Income', 'WaistCirc', 'BMI', 'UrAlbCr', 'UricAcid']
+INTEGER_JITTER_COLUMNS = ['Age', 'BloodGlucose', 'HDL', 'Triglycerides']
+
+DB_INSERT_CHUNK_SIZE = 10000
+
+
+def measure(function, repeat, setup=None):
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    return {
+        'repeat': repeat,
+        'median_ms': statistics.median(times),
+        'min_ms': min(times),
+        'max_ms': max(times),
+    }
+
+
+class Recorder:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = []
+
+    def run(self, name, rows, function, setup=None, heavy=False):
+        repeat = 1 if heavy and rows >= HEAVY_SINGLE_RUN_ROWS else self.repeat
+        try:
+            result = measure(function, repeat, setup)
+        except Exception as e:
+            print(f"{name:<48}{rows:>9}  failed: {e}")
+            self.results.append({'name': name, 'rows': rows, 'error': str(e)})
+            return
+        print(f"{name:<48}{rows:>9}{result['median_ms']:>12.3f} ms  (min {result['min_ms']:.3f}, n={repeat})")
+        self.results.append({'name': name, 'rows': rows, **result})
+
+
+def synthetic_dataset(base, n_rows, seed=0):
+    # Resample workbook rows with replacement (missing values come along at their
+    # natural rate) and jitter the measurements
+    rng = np.random.default_rng(seed)
+    data = base.iloc[rng.integers(0, len(base), n_rows)].reset_index(drop=True)
+    data['seqn'] = np.arange(1, n_rows + 1)
+    for column in JITTER_COLUMNS:
+        values = data[column].to_numpy(dtype='float64')
+        noise = rng.normal(0.0, 0.05 * np.nanstd(values), n_rows)
+        data[column] = np.round(np.clip(values + noise, 0, None), 1)
+    for column in INTEGER_JITTER_COLUMNS:
+        values = data[column].to_numpy(dtype='float64')
+        noise = rng.normal(0.0, 0.05 * np.nanstd(values), n_rows)
+        data[column] = np.clip(np.round(values + noise), 1, None).astype('int64')
+    return data
+
+
+def write_source(data, workdir, max_xlsx_rows):
+    # Returns (path, is_workbook). Above max_xlsx_rows the rows are written as CSV and
+    # the dataset cache is primed directly, so only warm loads can be timed.
+    from dataset_cache import DatasetCache
+
+    if len(data) <= max_xlsx_rows:
+        path = os.path.join(workdir, f"synthetic_{len(data)}.xlsx")
+        if not os.path.exists(path):
+            data.to_excel(path, index=False)
+        return path, True
+
+    path = os.path.join(workdir, f"synthetic_{len(data)}.csv")
+    data.to_csv(path, index=False)
+    DatasetCache().save(path, 'raw', data)
+    return path, False
+
+
+def open_database(workdir):
+    # The embedded SQLite backend (DB_BACKEND=sqlite, set in run_suite) so runs need no
+    # database server; seeded with the rows of digital_twin_patient.sql
+    import connection
+    from import_dump import import_dump
+
+    import_dump(os.path.join(REPO_ROOT, 'digital_twin_patient.sql'), replace=True)
+    return connection.get_engine()
+
+
+def grow_database(engine, data, n_rows):
+    # Append synthetic patients until the table holds n_rows rows
+    from sqlalchemy import func, select
+    from connection import patient_table
+
+    with engine.begin() as conn:
+        current = conn.execute(select(func.count()).select_from(patient_table)).scalar()
+        start_time = datetime(2024, 7, 1)
+        for start in range(current, n_rows, DB_INSERT_CHUNK_SIZE):
+            stop = min(start + DB_INSERT_CHUNK_SIZE, n_rows)
+            chunk = data.iloc[start:stop]
+            conn.execute(patient_table.insert(), [
+                {
+                    'name': f"Synthetic {(start + i) % 5000}",
+                    'age': int(row.Age),
+                    'waist_circ': None if pd.isna(row.WaistCirc) else float(row.WaistCirc),
+                    'bmi': None if pd.isna(row.BMI) else float(row.BMI),
+                    'blood_glucose': float(row.BloodGlucose),
+                    'hdl': float(row.HDL),
+                    'triglycerides': float(row.Triglycerides),
+                    'created_at': start_time + timedelta(seconds=start + i),
+                }
+                for i, row in enumerate(chunk.itertuples(index=False))
+            ])
+
+
+def bench_pipeline(recorder, data, source_path, is_workbook, n_rows):
+    from data_preprocessor import DataPreprocessor
+    from model_trainer import ModelTrainer
+    from cluster_model_trainer import ClusterModelTrainer
+    from model_store import SELECTED_FEATURES
+    from risk_pipeline import RiskPipeline
+
+    if is_workbook:
+        recorder.run('preprocessor.load_data.cold', n_rows,
+                     lambda: DataPreprocessor(source_path, use_cache=False).load_data(), heavy=True)
+    # First call primes the dataset cache for the warm timings
+    DataPreprocessor(source_path).load_data()
+    recorder.run('preprocessor.load_data.warm', n_rows, lambda: DataPreprocessor(source_path).load_data())
+
+    preprocessor = DataPreprocessor(source_path, use_cache=False)
+
+    def reset_preprocessor():
+        preprocessor.data = data.copy()
+
+    recorder.run('preprocessor.impute_missing_values', n_rows, preprocessor.impute_missing_values,
+                 setup=reset_preprocessor, heavy=True)
+    processed = preprocessor.get_processed_data()
+
+    trainer = ModelTrainer(SELECTED_FEATURES)
+    recorder.run('trainer.prepare_data', n_rows, lambda: trainer.prepare_data(processed.copy()), heavy=True)
+    recorder.run('trainer.train_model', n_rows, trainer.train_model, heavy=True)
+    recorder.run('trainer.evaluate_model', n_rows, trainer.evaluate_model, heavy=True)
+
+    clustertrainer = ClusterModelTrainer(n_clusters=3)
+    recorder.run('cluster.fit', n_rows, lambda: clustertrainer.fit(trainer.X_train), heavy=True)
+    recorder.run('cluster.predict', n_rows, lambda: clustertrainer.predict(trainer.X_test), heavy=True)
+    # What model_store.load_or_train stores and the app scores with
+    trainer.pipeline = RiskPipeline.from_trainers(trainer, clustertrainer)
+    return trainer, clustertrainer
+
+
+def bench_risk_pipeline(recorder, trainer, n_rows):
+    pipeline = trainer.pipeline
+    X = trainer.X_test.to_numpy(dtype='float64')
+    # Raw records as uploads send them, one in ten without a waist measurement
+    records = [dict(zip(trainer.selected_features, row)) for row in X.tolist()]
+    for record in records[::10]:
+        del record['WaistCirc']
+    recorder.run('inference.pipeline.score_records.1_row', n_rows, lambda: pipeline.score_records(records[:1]))
+    recorder.run('inference.pipeline.score_records.batch', n_rows, lambda: pipeline.score_records(records),
+                 heavy=True)
+
+
+def bench_inference(recorder, trainer, n_rows):
+    X = np.ascontiguousarray(trainer.X_test.to_numpy(dtype='float32'))
+    single = X[:1]
+    # The forest stage of the RiskPipeline: compiled forest for small batches, sklearn above
+    pipeline = trainer.pipeline
+    recorder.run('inference.predict_proba.1_row', n_rows, lambda: pipeline.predict_proba(single))
+    recorder.run('inference.predict_proba.sklearn_1_row', n_rows, lambda: trainer.model.predict_proba(single))
+    recorder.run('inference.predict_proba.batch', n_rows, lambda: pipeline.predict_proba(X), heavy=True)
+
+
+def bench_database(recorder, n_rows):
+    import patient_service
+    from patient_service import (insert_patient, insert_patients, get_latest_patient_id, get_latest_patient,
+                                 fetch_all_patients, fetch_patient_data_by_id, fetch_patient_ids_by_name,
+                                 count_patients, fetch_patients_page)
+
+    def cold():
+        patient_service.patient_cache.clear()
+        patient_service._expire_high_water_mark()
+
+    record = {'Name': 'Benchmark', 'Age': 55, 'WaistCirc': 90.0, 'BMI': 27.5,
+              'BloodGlucose': 110, 'HDL': 45, 'Triglycerides': 160}
+    filters = [('age', '>=', 50), ('name', 'contains', 'Synthetic 1')]
+    middle_id = n_rows // 2
+    middle_page = fetch_patients_page(10, offset=n_rows // 2)
+    last = middle_page[-1]
+    cursor = (last.created_at.isoformat() if last.created_at is not None else None, last.id)
+
+    recorder.run('patient_service.insert_patient', n_rows, lambda: insert_patient(record))
+    recorder.run('patient_service.insert_patients.500', n_rows, lambda: insert_patients([record] * 500))
+    recorder.run('patient_service.get_latest_patient_id', n_rows, get_latest_patient_id, setup=cold)
+    recorder.run('patient_service.get_latest_patient', n_rows, get_latest_patient, setup=cold)
+    recorder.run('patient_service.fetch_all_patients', n_rows, fetch_all_patients, setup=cold, heavy=True)
+    recorder.run('patient_service.fetch_patient_data_by_id', n_rows,
+                 lambda: fetch_patient_data_by_id(middle_id), setup=cold)
+    recorder.run('patient_service.fetch_patient_ids_by_name', n_rows,
+                 lambda: fetch_patient_ids_by_name('Synthetic 42'), setup=cold)
+    recorder.run('patient_service.count_patients', n_rows, count_patients)
+    recorder.run('patient_service.count_patients.filtered', n_rows, lambda: count_patients(filters))
+    recorder.run('patient_service.fetch_patients_page.first', n_rows, lambda: fetch_patients_page(10))
+    recorder.run('patient_service.fetch_patients_page.offset', n_rows,
+                 lambda: fetch_patients_page(10, offset=n_rows // 2))
+    recorder.run('patient_service.fetch_patients_page.cursor', n_rows,
+                 lambda: fetch_patients_page(10, cursor=cursor))
+    recorder.run('patient_service.fetch_patients_page.filtered', n_rows,
+                 lambda: fetch_patients_page(10, sort_column='bmi', descending=False, filters=filters))
+
+
+def dashboard_fixture(dashboard):
+    # Input/State values by "component-id.property"
+    from patient_service import get_latest_patient
+
+    patient = dashboard.patient_dict(get_latest_patient())
+    return {
+        'url.pathname': '/digital-twin',
+        'current-patient-data.data': patient,
+        'interval-update.n_intervals': 3,
+        'interval-update.interval': 1000,
+        'patient-table.data': [{'id': patient['id'], 'Name': patient['name']}],
+        'patient-table.selected_rows': [0],
+        'patient-table.page_current': 5,
+        'patient-table.page_size': 10,
+        'patient-table.sort_by': [],
+        'patient-table.filter_query': '{Age} >= 50',
+        'patient-table-cursors.data': {},
+    }
+
+
+def bench_dashboard(recorder, trainer, clustertrainer, n_rows):
+    import patient_service
+    from dash.exceptions import PreventUpdate
+    from dashboard import Dashboard
+
+    dashboard = Dashboard(trainer, clustertrainer)
+    dashboard.layout()
+    dashboard.add_callbacks()
+    fixture = dashboard_fixture(dashboard)
+
+    def cold():
+        dashboard.inference_cache.clear()
+        patient_service.patient_cache.clear()
+        patient_service._expire_high_water_mark()
+
+    # Every registered callback, called directly with its inputs and states taken from the fixture
+    for callback in dashboard.app.callback_map.values():
+        if 'callback' not in callback:
+            continue
+        function = callback['callback'].__wrapped__
+        args = [fixture.get(f"{dependency['id']}.{dependency['property']}")
+                for dependency in callback['inputs'] + callback['state']]
+
+        def call(function=function, args=args):
+            try:
+                function(*args)
+            except PreventUpdate:
+                pass
+
+        recorder.run(f"dashboard.{function.__name__}", n_rows, call, setup=cold)
+
+
+def run_suite(args):
+    sizes = sorted(int(size) for size in args.sizes.split(','))
+    groups = args.groups.split(',')
+    workdir = args.workdir or tempfile.mkdtemp(prefix='digital-twin-bench-')
+    # Keep dataset cache entries for the synthetic files out of the project's cache, and
+    # patients in a database of their own
+    os.environ['DATASET_CACHE_DIR'] = os.path.join(workdir, 'dataset_cache')
+    os.environ['DB_BACKEND'] = 'sqlite'
+    os.environ['SQLITE_PATH'] = os.path.join(workdir, 'benchmark.db')
+    os.makedirs(workdir, exist_ok=True)
+
+    from data_preprocessor import DataPreprocessor
+    from model_store import DATASET_PATH
+
+    base_preprocessor = DataPreprocessor(os.path.join(REPO_ROOT, DATASET_PATH), use_cache=False)
+    base_preprocessor.load_data()
+    base = base_preprocessor.get_processed_data()
+
+    recorder = Recorder(args.repeat)
+    engine = open_database(workdir) if 'database' in groups or 'dashboard' in groups else None
+    print(f"{'benchmark':<48}{'rows':>9}{'median':>15}")
+    for n_rows in sizes:
+        data = synthetic_dataset(base, n_rows)
+        source_path, is_workbook = write_source(data, workdir, args.max_xlsx_rows)
+
+        trainer, clustertrainer = bench_pipeline(recorder, data, source_path, is_workbook, n_rows)
+        if 'inference' in groups:
+            bench_inference(recorder, trainer, n_rows)
+            bench_risk_pipeline(recorder, trainer, n_rows)
+        if engine is not None:
+            grow_database(engine, data, n_rows)
+        if 'database' in groups:
+            bench_database(recorder, n_rows)
+        if 'dashboard' in groups:
+            bench_dashboard(recorder, trainer, clustertrainer, n_rows)
+
+    return {'meta': run_metadata(args, sizes, groups, workdir), 'results': recorder.results}
+
+
+def run_metadata(args, sizes, groups, workdir):
+    import sklearn
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'commit': commit,
+        'sizes': sizes,
+        'groups': groups,
+        'repeat': args.repeat,
+        'workdir': workdir,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+    }
+
+
+def compare(baseline, current, threshold, min_delta_ms):
+    # A benchmark regresses when its median is more than threshold (a fraction) slower
+    # than the baseline and by at least min_delta_ms, which filters out timer noise
+    baseline_results = {(r['name'], r['rows']): r for r in baseline['results'] if 'median_ms' in r}
+    regressions = []
+    print(f"\n{'benchmark':<48}{'rows':>9}{'baseline':>12}{'current':>12}{'change':>9}")
+    for result in current['results']:
+        before = baseline_results.get((result['name'], result['rows']))
+        if before is None or 'median_ms' not in result:
+            continue
+        ratio = result['median_ms'] / before['median_ms'] if before['median_ms'] else float('inf')
+        regressed = ratio > 1 + threshold and result['median_ms'] - before['median_ms'] >= min_delta_ms
+        print(f"{result['name']:<48}{result['rows']:>9}{before['median_ms']:>12.3f}{result['median_ms']:>12.3f}"
+              f"{(ratio - 1) * 100:>8.1f}%{'  REGRESSION' if regressed else ''}")
+        if regressed:
+            regressions.append(result)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Digital twin benchmark suite')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='Comma-separated synthetic dataset sizes')
+    parser.add_argument('--groups', default=','.join(GROUPS), help='Comma-separated subset of ' + ', '.join(GROUPS))
+    parser.add_argument('--repeat', type=int, default=5, help='Repetitions per benchmark (heavy ones run once at scale)')
+    parser.add_argument('--max-xlsx-rows', type=int, default=MAX_XLSX_ROWS,
+                        help='Largest dataset written as .xlsx; larger ones are only timed from the dataset cache')
+    parser.add_argument('--workdir', help='Directory for synthetic files and the benchmark database (default: a temp dir)')
+    parser.add_argument('--output', default='benchmark-results.json', help='Where to write the JSON results')
+    parser.add_argument('--results', help='Compare an existing results file instead of running the suite')
+    parser.add_argument('--baseline', help='Results file to check for regressions against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Allowed slowdown as a fraction of the baseline')
+    parser.add_argument('--min-delta-ms', type=float, default=0.5, help='Ignore slowdowns smaller than this')
+    args = parser.parse_args()
+
+    if args.results:
+        with open(args.results) as f:
+            current = json.load(f)
+    else:
+        current = run_suite(args)
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"Wrote {len(current['results'])} results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,4 @@
+import numpy as np
 from sklearn.cluster import KMeans
 from sklearn.preprocessing import StandardScaler
 
@@ -6,6 +7,8 @@ class ClusterModelTrainer:
         self.kmeans = KMeans(n_clusters=n_clusters, random_state=42)
         self.scaler = StandardScaler()
         self.cluster_centers = None
+        # Changes whenever the fitted clusters change, so cached cluster results can be told apart
+        self.version = 0
 
     def fit(self, X):
         # Fit the scaler on the training data
@@ -13,9 +16,10 @@ class ClusterModelTrainer:
         # Fit the KMeans model on the scaled data
         self.kmeans.fit(X_scaled)
         self.cluster_centers = self.kmeans.cluster_centers_
+        self.version += 1
 
     def predict(self, X):
-        # Scale the input data using the same scaler
-        X_scaled = self.scaler.transform(X.values)
+        # Scale the input data (DataFrame or array) using the same scaler
+        X_scaled = self.scaler.transform(np.asarray(X))
         return self.kmeans.predict(X_scaled)
 
@@ -1,27 +1,219 @@
-from sqlalchemy import create_engine, MetaData, Table
+from sqlalchemy import create_engine, event, inspect, MetaData, Table, Column, Index, Integer, String, Float, TIMESTAMP, func
+from sqlalchemy.dialects.sqlite import DATETIME as SQLITE_DATETIME
 from sqlalchemy.orm import sessionmaker
 from urllib.parse import quote
 import os
+import random
+import threading
 import time
 from sqlalchemy.exc import OperationalError
 
+from metrics import METRICS_ENABLED, DB_QUERIES, DB_QUERY_ERRORS, DB_QUERY_SECONDS
+
+# Storage backend: 'mysql' (default) or 'sqlite' for a single-box deployment with an
+# embedded database file and no database server
+DB_BACKEND = os.getenv('DB_BACKEND', 'mysql').lower()
+
 # Get database configuration from environment variables
 DB_HOST = os.getenv('MYSQL_HOST', 'localhost')
+DB_PORT = os.getenv('MYSQL_PORT', '3306')
 DB_USER = os.getenv('MYSQL_USER', 'root')
 DB_PASSWORD = os.getenv('MYSQL_PASSWORD', 'Minhajsiddiqui@1997')
 DB_NAME = os.getenv('MYSQL_DATABASE', 'digitaltwin')
 
-# SQLAlchemy engine creation
-database_url = f"mysql+pymysql://{DB_USER}:{quote(DB_PASSWORD)}@{DB_HOST}:3306/{DB_NAME}"
-engine = create_engine(database_url, echo=True)
+# Connection pool settings (per process)
+DB_POOL_SIZE = int(os.getenv('MYSQL_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('MYSQL_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('MYSQL_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('MYSQL_POOL_RECYCLE', '3600'))
+DB_POOL_PRE_PING = os.getenv('MYSQL_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+
+# SQLite settings, used when DB_BACKEND=sqlite. WAL lets the dashboard read while the
+# API writes; synchronous=NORMAL is durable against application crashes in WAL mode.
+SQLITE_PATH = os.getenv('SQLITE_PATH', 'digitaltwin.db')
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', str(64 * 1024)))
+SQLITE_BUSY_TIMEOUT = float(os.getenv('SQLITE_BUSY_TIMEOUT', '30'))
+
+# Fraction of SQL statements to log with their duration (0 disables logging)
+SQL_LOG_SAMPLE_RATE = float(os.getenv('SQL_LOG_SAMPLE_RATE', '0'))
+
+if DB_BACKEND == 'sqlite':
+    database_url = f"sqlite:///{SQLITE_PATH}"
+elif DB_BACKEND == 'mysql':
+    database_url = f"mysql+pymysql://{DB_USER}:{quote(DB_PASSWORD)}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+else:
+    raise ValueError(f"Unknown DB_BACKEND {DB_BACKEND!r}, expected 'mysql' or 'sqlite'")
+
+# SQLite stores created_at as text; keep MySQL's whole-second format so rows inserted by
+# the server default and by the application compare and sort the same way
+SQLITE_TIMESTAMP = SQLITE_DATETIME(
+    storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"
+)
+
+# Declared schema of the 'patient' table (see digital_twin_patient.sql), so importing
+# this module needs no database round trip
+metadata = MetaData()
+
+patient_table = Table(
+    'patient', metadata,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('name', String(255)),
+    Column('age', Integer),
+    Column('waist_circ', Float),
+    Column('bmi', Float),
+    Column('blood_glucose', Float),
+    Column('hdl', Float),
+    Column('triglycerides', Float),
+    Column('created_at', TIMESTAMP().with_variant(SQLITE_TIMESTAMP, 'sqlite'), server_default=func.current_timestamp()),
+    # Risk scored when the row was written (or by backfill_risk.py) and the model that scored it
+    Column('risk_probability', Float),
+    Column('risk_cluster', Integer),
+    Column('model_version', String(32)),
+    Index('idx_age', 'age'),
+    Index('idx_bmi', 'bmi'),
+    Index('idx_name', 'name'),
+    Index('idx_created_at', 'created_at'),
+    Index('idx_risk_probability', 'risk_probability'),
+    Index('idx_risk_cluster', 'risk_cluster'),
+    Index('idx_model_version', 'model_version'),
+)
+
+_engine = None
+_engine_lock = threading.Lock()
+_session_factory = sessionmaker()
+
+
+def _install_sampled_logging(engine, sample_rate):
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._log_started_at = time.perf_counter() if random.random() < sample_rate else None
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started_at = getattr(context, '_log_started_at', None)
+        if started_at is not None:
+            print(f"SQL ({(time.perf_counter() - started_at) * 1000:.1f} ms): {' '.join(statement.split())}")
+
+
+STATEMENT_TYPES = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'PRAGMA', 'BEGIN', 'COMMIT', 'ROLLBACK')
+
+
+def _statement_type(statement):
+    # Leading keyword of the statement, e.g. SELECT; anything uncommon is counted as OTHER
+    keyword = statement.lstrip()[:8].split(None, 1)
+    keyword = keyword[0].upper() if keyword else ''
+    return keyword if keyword in STATEMENT_TYPES else 'OTHER'
+
+
+def _install_query_metrics(engine):
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started_at = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statement_type = _statement_type(statement)
+        DB_QUERIES.inc(statement=statement_type)
+        DB_QUERY_SECONDS.observe(time.perf_counter() - context._metrics_started_at, statement=statement_type)
+
+    @event.listens_for(engine, 'handle_error')
+    def handle_error(exception_context):
+        DB_QUERY_ERRORS.inc(statement=_statement_type(exception_context.statement or ''))
+
+
+def _install_sqlite_pragmas(engine):
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        # Negative cache_size is in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        cursor.execute(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT * 1000)}")
+        cursor.close()
+
+
+def _create_engine():
+    if database_url.startswith('sqlite'):
+        engine = create_engine(
+            database_url,
+            # Pooled connections are handed between the server's threads
+            connect_args={'check_same_thread': False, 'timeout': SQLITE_BUSY_TIMEOUT},
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+        _install_sqlite_pragmas(engine)
+        # There is no init script as with the MySQL container; create the table and indexes here
+        metadata.create_all(engine)
+        return engine
+    return create_engine(
+        database_url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+
+
+def get_engine():
+    # SQLAlchemy engine creation, deferred until the first query
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = _create_engine()
+                if METRICS_ENABLED:
+                    _install_query_metrics(engine)
+                if SQL_LOG_SAMPLE_RATE > 0:
+                    _install_sampled_logging(engine, SQL_LOG_SAMPLE_RATE)
+                _engine = engine
+    return _engine
+
+
+def dispose_engine():
+    # Drop pooled connections, e.g. in a freshly forked worker that must not share the parent's sockets
+    if _engine is not None:
+        _engine.dispose(close=False)
+
+
+def Session():
+    # Create a session bound to the lazily created engine
+    return _session_factory(bind=get_engine())
+
+
+def ensure_schema():
+    # Bring an existing patient table up to the declared schema: databases created from an
+    # older digital_twin_patient.sql get the missing columns (nullable) and indexes
+    engine = get_engine()
+    metadata.create_all(engine)
+    inspector = inspect(engine)
+    existing_columns = {column['name'] for column in inspector.get_columns(patient_table.name)}
+    existing_indexes = {index['name'] for index in inspector.get_indexes(patient_table.name)}
+    with engine.begin() as conn:
+        for column in patient_table.columns:
+            if column.name not in existing_columns:
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.exec_driver_sql(f"ALTER TABLE {patient_table.name} ADD COLUMN {column.name} {column_type}")
+                print(f"Added column {patient_table.name}.{column.name}")
+        for index in patient_table.indexes:
+            if index.name not in existing_indexes:
+                index.create(conn)
+                print(f"Added index {index.name}")
+
 
 # Function to test database connection with retries
 def wait_for_db(max_retries=5, retry_interval=5):
     for attempt in range(max_retries):
         try:
-            with engine.connect() as connection:
-                print("MySQL Database connection successful")
-                return True
+            with get_engine().connect() as connection:
+                print(f"{connection.dialect.name} database connection successful")
+            ensure_schema()
+            return True
         except OperationalError as e:
             if attempt < max_retries - 1:
                 print(f"Database connection attempt {attempt + 1} failed. Retrying in {retry_interval} seconds...")
@@ -29,18 +221,3 @@ def wait_for_db(max_retries=5, retry_interval=5):
             else:
                 print(f"Failed to connect to database after {max_retries} attempts")
                 raise e
-
-# Wait for database to be ready
-wait_for_db()
-
-# Reflect an existing database into a new model
-metadata = MetaData()
-metadata.reflect(engine)
-
-# Access the 'patient' table
-patient_table = metadata.tables['patient']
-
-# Create a session
-Session = sessionmaker(bind=engine)
-
-
@@ -1,12 +1,260 @@
+import functools
+import json
+import math
+import os
+import re
+import time
+from datetime import datetime
 import dash
-from dash import dcc, html, callback_context, dash_table, State
+import flask
+from dash import dcc, html, callback_context, dash_table, State, Patch, ClientsideFunction
 from dash.dependencies import Input, Output
+from dash.exceptions import PreventUpdate
 import plotly.express as px
 import plotly.graph_objects as go
 from sklearn.preprocessing import OneHotEncoder
 import numpy as np
 import pandas as pd
-from patient_service import get_latest_patient, fetch_all_patients, fetch_patient_data_by_id
+from patient_service import (get_latest_patient, get_latest_patient_id, fetch_patient_data_by_id,
+                             fetch_patient_ids_by_name, fetch_patients_page, count_patients,
+                             track_model_version)
+from inference_cache import InferenceCache
+from analytics_service import population_analytics
+from scoring import CLUSTER_DESCRIPTIONS
+from risk_pipeline import FEATURE_COLUMNS
+from metrics import DASH_CALLBACK_SECONDS, DASH_CALLBACK_ERRORS
+
+# The latest-patient page polls for new patients every MIN_POLL_INTERVAL_MS and backs off
+# to MAX_POLL_INTERVAL_MS while nothing changes
+MIN_POLL_INTERVAL_MS = 1000
+MAX_POLL_INTERVAL_MS = int(os.getenv('DASHBOARD_MAX_POLL_MS', '10000'))
+
+# Patient table columns in the order the models were trained on
+PATIENT_COLUMNS = list(FEATURE_COLUMNS.values())
+
+# (index in PATIENT_COLUMNS, alert label, comparison, threshold, normal range). Alerts and
+# the feature importance graph are evaluated in the browser (assets/digital_twin.js) from
+# these tables, published through the model-constants store.
+HEALTH_ALERTS = [
+    (3, 'High Blood Glucose Alert', 'above', 126, '< 126 mg/dL'),  # higher than this is considered diabetic
+    (4, 'Low HDL Alert', 'below', 40, '> 40 mg/dL'),               # lower than this is considered at risk for heart disease
+    (5, 'High Triglycerides Alert', 'above', 200, '< 200 mg/dL'),  # higher than this is considered high
+]
+
+# Feature names and their corresponding maximum values
+FEATURE_INFO = [
+    {'name': 'Age', 'display_name': 'Age', 'max_value': 100},
+    {'name': 'Waist Circumference', 'display_name': 'Waist\nCircumference', 'max_value': 150},
+    {'name': 'BMI', 'display_name': 'BMI', 'max_value': 50},
+    {'name': 'Blood Glucose', 'display_name': 'Blood\nGlucose', 'max_value': 200},
+    {'name': 'HDL', 'display_name': 'HDL\nCholesterol', 'max_value': 100},
+    {'name': 'Triglycerides', 'display_name': 'Triglycerides', 'max_value': 300}
+]
+
+# Metrics plotted by the trend graph: (trace name, index in PATIENT_COLUMNS)
+MONITORING_METRICS = [('BloodGlucose', 3), ('HDL', 4), ('Triglycerides', 5)]
+MONITORING_POINTS = 10
+
+CLUSTER_GRAPH_METRICS = ['Age', 'Waist\nCirc', 'BMI', 'Blood\nGlucose', 'HDL', 'Triglycerides']
+CLUSTER_COLORS = {0: '#2ecc71', 1: '#f1c40f', 2: '#e74c3c'}  # Green, Yellow, Red
+
+
+def timed_callback(function):
+    # Latency of a server callback, by name, and the ones that raised (PreventUpdate is not an error)
+    name = function.__name__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        except PreventUpdate:
+            raise
+        except Exception:
+            DASH_CALLBACK_ERRORS.inc(callback=name)
+            raise
+        finally:
+            DASH_CALLBACK_SECONDS.observe(time.perf_counter() - start, callback=name)
+    return wrapper
+
+
+# Figure skeletons of the digital twin page. They carry all layout, colors and gauge
+# steps and are sent once with the page; the callbacks below only patch in the values
+# of the current patient, which keeps every refresh down to a few hundred bytes.
+def risk_gauge_figure():
+    fig = go.Figure(go.Indicator(
+        mode="gauge+number",
+        domain={'x': [0, 1], 'y': [0, 1]},
+        title={'text': "Risk Level", 'font': {'size': 24, 'color': '#2c3e50'}},
+        gauge={
+            'axis': {'range': [0, 100], 'tickwidth': 1, 'tickcolor': "#2c3e50"},
+            'bar': {'color': "#2980b9"},
+            'bgcolor': "white",
+            'borderwidth': 2,
+            'bordercolor': "#2c3e50",
+            'steps': [
+                {'range': [0, 25], 'color': "#2ecc71"},  # Green
+                {'range': [25, 75], 'color': "#f1c40f"},  # Yellow
+                {'range': [75, 100], 'color': "#e74c3c"}  # Red
+            ],
+        }
+    ))
+    fig.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=10, r=10, t=60, b=10),
+        height=300
+    )
+    return fig
+
+
+def risk_monitoring_figure():
+    fig = go.Figure()
+    for metric, _ in MONITORING_METRICS:
+        fig.add_trace(go.Scatter(y=[], mode='lines+markers', name=metric))
+    fig.update_layout(
+        title={
+            'font': {
+                'family': 'Times New Roman, sans-serif',
+                'size': 20,
+                'color': 'black'
+            }
+        },
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+    )
+    return fig
+
+
+def cluster_figure():
+    fig = go.Figure(data=[
+        go.Bar(
+            x=CLUSTER_GRAPH_METRICS,
+            y=[],
+            textposition='auto',
+        )
+    ])
+    fig.update_layout(
+        title={
+            'y': 0.95,
+            'x': 0.5,
+            'xanchor': 'center',
+            'yanchor': 'top',
+            'font': {'size': 16, 'color': '#2c3e50'}
+        },
+        yaxis_title="Values",
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=10, r=10, t=60, b=10),
+        height=300,
+        font={'color': '#2c3e50'}
+    )
+    return fig
+
+
+# Patches that clear a graph back to its empty skeleton. A panel that cannot be built for
+# the current patient falls back to these, so it never keeps showing the previous patient.
+def blank_risk_gauge():
+    fig = Patch()
+    fig['data'][0]['value'] = None
+    return fig
+
+
+def blank_risk_monitoring():
+    fig = Patch()
+    for i in range(len(MONITORING_METRICS)):
+        fig['data'][i]['y'] = []
+    return fig
+
+
+def blank_cluster_graph():
+    fig = Patch()
+    fig['data'][0]['y'] = []
+    fig['data'][0]['text'] = []
+    return fig
+
+
+def feature_importance_figure():
+    fig = go.Figure(go.Bar(
+        x=[],
+        y=[],
+        orientation='h',
+        marker_color='#3498db',
+        textposition='auto',
+    ))
+    fig.update_layout(
+        title={
+            'y': 0.95,
+            'x': 0.5,
+            'xanchor': 'center',
+            'yanchor': 'top',
+            'font': {'size': 16, 'color': '#2c3e50'}
+        },
+        xaxis_title="Relative Impact (%)",
+        yaxis_title="Health Factors",
+        yaxis={'categoryorder': 'total ascending'},
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=10, r=10, t=60, b=10),
+        height=300,
+        font={'color': '#2c3e50'},
+        xaxis=dict(ticksuffix="%")
+    )
+    return fig
+
+
+# Past-patients table column ids -> patient table columns
+TABLE_COLUMNS = {
+    'Name': 'name',
+    'Age': 'age',
+    'Waist Circumference': 'waist_circ',
+    'BMI': 'bmi',
+    'Blood Glucose': 'blood_glucose',
+    'HDL': 'hdl',
+    'Triglycerides': 'triglycerides',
+    'Created At': 'created_at'
+}
+
+# DataTable filter operators -> patient_service filter operators
+FILTER_OPERATORS = {
+    'contains': 'contains',
+    'datestartswith': 'datestartswith',
+    'ge': '>=', '>=': '>=',
+    'le': '<=', '<=': '<=',
+    'lt': '<', '<': '<',
+    'gt': '>', '>': '>',
+    'ne': '!=', '!=': '!=',
+    'eq': '=', '=': '=',
+}
+
+# "{column id} operator value": the operator must follow the column id directly, so
+# operator tokens inside a quoted value are part of the value. Word operators need a
+# space after them, symbols do not.
+FILTER_CLAUSE = re.compile(
+    r"\s*\{(.+?)\}\s*(?:(contains|datestartswith|ge|le|lt|gt|ne|eq)\s+|(>=|<=|!=|<|>|=)\s*)(.*)", re.DOTALL)
+
+
+def parse_filter_query(filter_query):
+    # Turn a DataTable filter query such as "{Age} > 40 && {Name} contains test"
+    # into [(table column, operator, value)] for fetch_patients_page
+    filters = []
+    for part in (filter_query or '').split(' && '):
+        match = FILTER_CLAUSE.match(part)
+        if not match:
+            continue
+        column_id, word_operator, symbol_operator, value = match.groups()
+        operator = FILTER_OPERATORS[word_operator or symbol_operator]
+        value = value.strip()
+        if len(value) > 1 and value[0] == value[-1] and value[0] in ("'", '"', '`'):
+            value = value[1:-1].replace('\\' + value[0], value[0])
+        elif operator not in ('contains', 'datestartswith'):
+            try:
+                value = float(value)
+            except ValueError:
+                pass
+        if column_id in TABLE_COLUMNS:
+            filters.append((TABLE_COLUMNS[column_id], operator, value))
+    return filters
 
 
 class Dashboard:
@@ -91,6 +339,18 @@ class Dashboard:
         '''
         self.trainer = trainer
         self.clustertrainer = clustertrainer
+        if trainer.pipeline is not None:
+            # Cached patient rows scored by another model version are re-read
+            track_model_version(lambda: self.trainer.pipeline.stored_version())
+        self.inference_cache = InferenceCache(max_size=int(os.getenv('INFERENCE_CACHE_SIZE', '1024')))
+        self.cached_model_constants = None
+        # Built once and reused by every digital twin page
+        self.figure_skeletons = {
+            'risk-gauge': risk_gauge_figure().to_dict(),
+            'risk-monitoring-graph': risk_monitoring_figure().to_dict(),
+            'cluster-graph': cluster_figure().to_dict(),
+            'feature-importance-graph': feature_importance_figure().to_dict(),
+        }
 
 
     def layout(self):
@@ -115,6 +375,15 @@ class Dashboard:
                          'fontWeight': '500'
                      }),
             dcc.Link('List of Past Patients', href='/past-patients',
+                     className='nav-link',
+                     style={
+                         'marginRight': '20px',
+                         'textDecoration': 'none',
+                         'color': '#2980b9',
+                         'fontSize': '18px',
+                         'fontWeight': '500'
+                     }),
+            dcc.Link('Population Analytics', href='/population',
                      className='nav-link',
                      style={
                          'textDecoration': 'none',
@@ -125,12 +394,56 @@ class Dashboard:
         ], style={'textAlign': 'center', 'marginTop': '30px', 'marginBottom': '30px'})
         
     
-    def digital_twin_layout(self):
+    def population_layout(self):
+        # Rendered from the cached population summary, so opening the page is cheap
+        summary = population_analytics.summary()
+
+        histograms = []
+        for metric, histogram in summary['histograms'].items():
+            fig = go.Figure(go.Bar(x=histogram['buckets'], y=histogram['counts'], marker_color='#2980b9'))
+            fig.update_layout(title=f"{metric} Distribution", xaxis_title=metric, yaxis_title='Patients',
+                              margin=dict(l=40, r=20, t=50, b=40), height=320)
+            histograms.append(html.Div(dcc.Graph(figure=fig), style={'width': '50%', 'display': 'inline-block'}))
+
+        def percentile_table(title, groups, group_field):
+            # One row per group: patient count and the median (p25-p75) of every metric
+            rows = []
+            for group in groups:
+                row = {'Group': group[group_field], 'Patients': group['count']}
+                for metric, percentiles in group['percentiles'].items():
+                    row[metric] = ('-' if percentiles is None else
+                                   f"{percentiles['p50']:.1f} ({percentiles['p25']:.1f}-{percentiles['p75']:.1f})")
+                rows.append(row)
+            columns = ['Group', 'Patients'] + list(summary['histograms'])
+            return html.Div([
+                html.H3(title, style={'textAlign': 'center'}),
+                dash_table.DataTable(
+                    columns=[{'name': column, 'id': column} for column in columns],
+                    data=rows,
+                    style_cell={'textAlign': 'center', 'padding': '8px', 'fontFamily': "'Poppins', sans-serif"},
+                    style_header={'backgroundColor': '#2980b9', 'color': 'white', 'fontWeight': 'bold'}
+                )
+            ], style={'margin': '20px'})
+
+        return html.Div([
+            self.navigation_layout(),
+            html.H1('Population Analytics',
+                    className='page-title',
+                    style={'textAlign': 'center', 'fontSize': '2.5em', 'fontWeight': '600'}),
+            html.P(f"{summary['total']} patients. Percentile columns show the median (25th-75th percentile).",
+                   style={'textAlign': 'center'}),
+            html.Div(histograms),
+            percentile_table('By Risk Cluster', summary['by_risk_cluster'], 'label'),
+            percentile_table('By Age Band', summary['by_age_band'], 'band'),
+        ], style={'padding': '30px'})
+
+    def digital_twin_layout(self, follow_latest=True):
         return html.Div(
             className='dashboard-container',
             style={'padding': '30px'},
             children=[
             self.navigation_layout(),
+            dcc.Store(id='model-constants', data=self.model_constants()),
             html.H1(
                 children='Cardio Insight Digital Twin',
                 className='page-title',
@@ -160,7 +473,7 @@ class Dashboard:
                     html.Div([
                         html.H3('Metabolic Syndrome Risk Assessment', 
                                style={'textAlign': 'center', 'color': '#2c3e50', 'marginBottom': '20px'}),
-                        dcc.Graph(id='risk-gauge')
+                        dcc.Graph(id='risk-gauge', figure=self.figure_skeletons['risk-gauge'])
                     ], className='graph-container', style={'backgroundColor': '#f8f9fa', 'border': '1px solid #e9ecef'}),
                     
                     html.Div([
@@ -175,10 +488,11 @@ class Dashboard:
                                     style={'maxHeight': '150px', 'overflow': 'auto', 'padding': '15px'})
                         ], style={'marginBottom': '20px', 'borderBottom': '1px solid #e9ecef', 'paddingBottom': '10px'}),
                         
-                        dcc.Graph(id='risk-monitoring-graph')
+                        dcc.Graph(id='risk-monitoring-graph', figure=self.figure_skeletons['risk-monitoring-graph'])
                     ], className='graph-container', style={'backgroundColor': '#f8f9fa', 'border': '1px solid #e9ecef'}),
                     
-                    dcc.Interval(id='interval-update', interval=1000, n_intervals=0),
+                    dcc.Interval(id='interval-update', interval=MIN_POLL_INTERVAL_MS, n_intervals=0,
+                                 disabled=not follow_latest),
                 ]),
                 
                 # Right column
@@ -186,7 +500,8 @@ class Dashboard:
                     html.Div([
                         html.H3('Risk Factor Analysis', 
                                style={'textAlign': 'center', 'color': '#2c3e50', 'marginBottom': '20px'}),
-                        dcc.Graph(id='feature-importance-graph')
+                        dcc.Graph(id='feature-importance-graph',
+                                  figure=self.figure_skeletons['feature-importance-graph'])
                     ], className='graph-container', style={'backgroundColor': '#f8f9fa', 'border': '1px solid #e9ecef'}),
                     
                     html.Div([
@@ -199,54 +514,40 @@ class Dashboard:
                     html.Div([
                         html.H3('Patient Health Metrics', 
                                style={'textAlign': 'center', 'color': '#2c3e50', 'marginBottom': '20px'}),
-                        dcc.Graph(id='cluster-graph')
+                        dcc.Graph(id='cluster-graph', figure=self.figure_skeletons['cluster-graph'])
                     ], className='graph-container', style={'backgroundColor': '#f8f9fa', 'border': '1px solid #e9ecef'}),
-                    
-                    dcc.Interval(id='interval-update2', interval=1000, n_intervals=0),
                 ]),
             ]),
         ])
     
     def past_patients_layout(self):
-        patient_data = fetch_all_patients()
-
-        data = [{
-            "Name": patient.name,
-            "Age": patient.age,
-            "Waist Circumference": patient.waist_circ,
-            "BMI": patient.bmi,
-            "Blood Glucose": patient.blood_glucose,
-            "HDL": patient.hdl,
-            "Triglycerides": patient.triglycerides,
-            "Created At": patient.created_at.strftime("%Y-%m-%d %H:%M:%S") if patient.created_at else ""
-        } for patient in patient_data]
-        
-        data = sorted(data, key=lambda x: x["Created At"], reverse=True)
-    
+        # Rows are fetched one page at a time by the update_patient_table callback
         return html.Div([
             self.navigation_layout(),
             html.H1('List of Past Patients',
                    className='page-title',
                    style={'textAlign': 'center', 'fontSize': '2.5em', 'fontWeight': '600'}),
+            dcc.Store(id='patient-table-cursors', data={}),
             html.Div([
                 dash_table.DataTable(
                     id='patient-table',
                     columns=[
-                        {"name": "Name", "id": "Name"},
-                        {"name": "Age", "id": "Age"},
-                        {"name": "Waist Circumference", "id": "Waist Circumference"},
-                        {"name": "BMI", "id": "BMI"},
-                        {"name": "Blood Glucose", "id": "Blood Glucose"},
-                        {"name": "HDL", "id": "HDL"},
-                        {"name": "Triglycerides", "id": "Triglycerides"},
-                        {"name": "Created At", "id": "Created At"}
+                        {"name": "Name", "id": "Name", "type": "text"},
+                        {"name": "Age", "id": "Age", "type": "numeric"},
+                        {"name": "Waist Circumference", "id": "Waist Circumference", "type": "numeric"},
+                        {"name": "BMI", "id": "BMI", "type": "numeric"},
+                        {"name": "Blood Glucose", "id": "Blood Glucose", "type": "numeric"},
+                        {"name": "HDL", "id": "HDL", "type": "numeric"},
+                        {"name": "Triglycerides", "id": "Triglycerides", "type": "numeric"},
+                        {"name": "Created At", "id": "Created At", "type": "datetime"}
                     ],
-                    data=data,
-                    filter_action="native",
-                    sort_action="native",
-                    sort_mode="multi",
+                    data=[],
+                    filter_action="custom",
+                    filter_query="",
+                    sort_action="custom",
+                    sort_mode="single",
                     sort_by=[{"column_id": "Created At", "direction": "desc"}],
-                    page_action="native",
+                    page_action="custom",
                     page_current=0,
                     page_size=10,
                     style_table={
@@ -295,28 +596,150 @@ class Dashboard:
         ], style={'maxWidth': '1400px', 'margin': 'auto', 'padding': '20px'})
 
 
+    def patient_dict(self, patient):
+        # Store representation of a patient row; 'id' lets the change feed detect new patients
+        return {
+            'id': patient.id,
+            'age': patient.age,
+            'waist_circ': patient.waist_circ,
+            'bmi': patient.bmi,
+            'blood_glucose': patient.blood_glucose,
+            'hdl': patient.hdl,
+            'triglycerides': patient.triglycerides,
+            'name': patient.name
+        }
+
+    def patient_vector(self, patient_data):
+        # Feature vector (model order) of the selected patient, falling back to the latest patient
+        if patient_data:
+            return tuple(patient_data[column] for column in PATIENT_COLUMNS)
+        latest_patient = get_latest_patient()
+        if latest_patient:
+            return tuple(getattr(latest_patient, column) for column in PATIENT_COLUMNS)
+        return None
+
+    def infer(self, patient_vector):
+        # Every panel reads from one cached result per (patient vector, model versions);
+        # the cluster version moves when online clustering absorbs new patients
+        model_version = self.trainer.model_version or id(self.trainer.model)
+        return self.inference_cache.get_or_compute(
+            (patient_vector, model_version, self.clustertrainer.version),
+            lambda: self.compute_inference(patient_vector)
+        )
+
+    def compute_inference(self, patient_vector):
+        # Missing measurements (None) are imputed by the pipeline like in every other scoring path
+        probabilities, clusters = self.trainer.pipeline.score(np.array([patient_vector], dtype='float64'))
+        return {
+            'probability': probabilities[0] * 100,
+            'cluster': int(clusters[0]),
+        }
+
+    def model_constants(self):
+        # Store data the clientside callbacks need; rebuilt only when the model changes
+        model_version = self.trainer.model_version or id(self.trainer.model)
+        if self.cached_model_constants is None or self.cached_model_constants['model_version'] != model_version:
+            importances = self.trainer.model.feature_importances_
+            self.cached_model_constants = {
+                'model_version': model_version,
+                'alerts': [
+                    {'column': PATIENT_COLUMNS[index], 'label': label, 'comparison': comparison,
+                     'threshold': threshold, 'normal_range': normal_range}
+                    for index, label, comparison, threshold, normal_range in HEALTH_ALERTS
+                ],
+                'features': [
+                    {'column': column, 'display_name': info['display_name'], 'max_value': info['max_value'],
+                     'importance': float(importance)}
+                    for column, info, importance in zip(PATIENT_COLUMNS, FEATURE_INFO, importances)
+                ],
+            }
+        return self.cached_model_constants
+
+    def panels(self):
+        # (component id, property, builder, value when the builder fails or there is no patient)
+        return [
+            ('patient-name-display', 'children', self.patient_name_panel, "No patient data available"),
+            ('risk-gauge', 'figure', self.risk_gauge_panel, blank_risk_gauge()),
+            ('risk-monitoring-graph', 'figure', self.risk_monitoring_panel, blank_risk_monitoring()),
+            ('cluster-text', 'children', self.cluster_text_panel, html.Div()),
+            ('cluster-graph', 'figure', self.cluster_graph_panel, blank_cluster_graph()),
+        ]
+
+    def refresh_panels(self, patient_data):
+        # Values for every panel output. A panel that raises keeps its fallback value and
+        # does not take the other panels down with it.
+        if not patient_data:
+            latest_patient = get_latest_patient()
+            patient_data = self.patient_dict(latest_patient) if latest_patient else None
+        panels = self.panels()
+        if patient_data is None:
+            return [fallback for _, _, _, fallback in panels]
+
+        patient_vector = self.patient_vector(patient_data)
+        try:
+            inference = self.infer(patient_vector)
+        except Exception as e:
+            print(f"Dashboard inference failed for patient {patient_data.get('id')}: {e}")
+            inference = None
+
+        values = []
+        for component_id, prop, builder, fallback in panels:
+            try:
+                values.append(builder(patient_data, patient_vector, inference))
+            except Exception as e:
+                print(f"Dashboard panel {component_id} failed: {e}")
+                values.append(fallback)
+        return values
+
+    # Panel builders. inference is the cached result of compute_inference, or None when
+    # inference failed, in which case the panels that need it fall back.
+    # The graph panels return a Patch with only the values of the current patient; the
+    # rest of each figure is the skeleton sent with the page.
+    def patient_name_panel(self, patient_data, patient_vector, inference):
+        return f"Patient Name: {patient_data['name']}"
+
+    def risk_gauge_panel(self, patient_data, patient_vector, inference):
+        fig = Patch()
+        fig['data'][0]['value'] = inference['probability']
+        return fig
+
+    def risk_monitoring_panel(self, patient_data, patient_vector, inference):
+        fig = Patch()
+        for i, (metric, index) in enumerate(MONITORING_METRICS):
+            fig['data'][i]['y'] = [patient_vector[index]] * MONITORING_POINTS
+        return fig
+
+    def cluster_text_panel(self, patient_data, patient_vector, inference):
+        cluster = inference['cluster']
+        description = f"Risk Category: {CLUSTER_DESCRIPTIONS[cluster]}"
+        return html.Div(
+            [html.P(description, style={'color': CLUSTER_COLORS[cluster]})],
+            style={'font-weight': 'bold', 'margin': '20px', 'font-size':'20px', 'text-align': 'center'}
+        )
+
+    def cluster_graph_panel(self, patient_data, patient_vector, inference):
+        # Bar chart of the patient's metrics, colored by risk category
+        values = list(patient_vector)
+        fig = Patch()
+        fig['data'][0]['y'] = values
+        fig['data'][0]['text'] = values
+        fig['data'][0]['marker'] = {'color': CLUSTER_COLORS[inference['cluster']]}
+        return fig
+
     def add_callbacks(self):
         @self.app.callback(
             [Output('page-content', 'children'),
              Output('current-patient-data', 'data')],
             [Input('url', 'pathname')]
         )
+        @timed_callback
         def display_page(pathname):
             if pathname.startswith('/patient/'):
                 patient_id = int(pathname.split('/')[-1])  # Extract the patient ID from the URL
                 patient_data = fetch_patient_data_by_id(patient_id)
                 if patient_data:
-                    # Create a dictionary with the patient data
-                    patient_dict = {
-                        'age': patient_data.age,
-                        'waist_circ': patient_data.waist_circ,
-                        'bmi': patient_data.bmi,
-                        'blood_glucose': patient_data.blood_glucose,
-                        'hdl': patient_data.hdl,
-                        'triglycerides': patient_data.triglycerides,
-                        'name': patient_data.name
-                    }
-                    return self.digital_twin_layout(), patient_dict
+                    # A stored patient never changes, so this page does not need to poll
+                    return self.digital_twin_layout(follow_latest=False), self.patient_dict(patient_data)
                 else:
                     return html.Div([
                         html.H1("Patient not found"),
@@ -325,19 +748,12 @@ class Dashboard:
             elif pathname == '/digital-twin':
                 latest_patient = get_latest_patient()
                 if latest_patient:
-                    patient_dict = {
-                        'age': latest_patient.age,
-                        'waist_circ': latest_patient.waist_circ,
-                        'bmi': latest_patient.bmi,
-                        'blood_glucose': latest_patient.blood_glucose,
-                        'hdl': latest_patient.hdl,
-                        'triglycerides': latest_patient.triglycerides,
-                        'name': latest_patient.name
-                    }
-                    return self.digital_twin_layout(), patient_dict
+                    return self.digital_twin_layout(), self.patient_dict(latest_patient)
                 return self.digital_twin_layout(), None
             elif pathname == '/past-patients':
                 return self.past_patients_layout(), None
+            elif pathname == '/population':
+                return self.population_layout(), None
             else:
                 return html.Div([
                     html.H1("Welcome to the Main Page"),
@@ -345,402 +761,127 @@ class Dashboard:
                 ]), None
         
         @self.app.callback(
-            Output('patient-name-display', 'children'),
-            [Input('interval-update', 'n_intervals'),
-             Input('current-patient-data', 'data')]
+            [Output('current-patient-data', 'data', allow_duplicate=True),
+             Output('interval-update', 'interval')],
+            Input('interval-update', 'n_intervals'),
+            [State('interval-update', 'interval'),
+             State('current-patient-data', 'data')],
+            prevent_initial_call=True
         )
-        def update_patient_name(n, patient_data):
-            if patient_data:
-                return f"Patient Name: {patient_data['name']}"
-            else:
-                latest_patient = get_latest_patient()
-                if latest_patient:
-                    return f"Patient Name: {latest_patient['name']}"
-                else:
-                    return "No patient data available"
-            
+        @timed_callback
+        def poll_latest_patient(n, interval, patient_data):
+            # Only the latest-patient page polls. The high-water mark is shared by every tab,
+            # so an idle dashboard costs at most one MAX(id) query per refresh period.
+            latest_id = get_latest_patient_id()
+            if latest_id is None or (patient_data and patient_data.get('id') == latest_id):
+                # Nothing new: back off the poll interval up to the configured maximum
+                next_interval = min(interval * 2, MAX_POLL_INTERVAL_MS)
+                return dash.no_update, next_interval if next_interval != interval else dash.no_update
+
+            latest_patient = get_latest_patient()
+            if not latest_patient:
+                return dash.no_update, dash.no_update
+            return self.patient_dict(latest_patient), MIN_POLL_INTERVAL_MS
+
+        @self.app.callback(
+            [Output('patient-table', 'data'),
+             Output('patient-table', 'page_count'),
+             Output('patient-table-cursors', 'data')],
+            [Input('patient-table', 'page_current'),
+             Input('patient-table', 'page_size'),
+             Input('patient-table', 'sort_by'),
+             Input('patient-table', 'filter_query')],
+            State('patient-table-cursors', 'data')
+        )
+        @timed_callback
+        def update_patient_table(page_current, page_size, sort_by, filter_query, cursors):
+            sort_by = sort_by or [{"column_id": "Created At", "direction": "desc"}]
+            sort_column = TABLE_COLUMNS[sort_by[0]['column_id']]
+            descending = sort_by[0]['direction'] == 'desc'
+            filters = parse_filter_query(filter_query)
+
+            # Cursors are only valid for the query they were recorded for
+            query_key = json.dumps([sort_column, descending, filters, page_size])
+            if not cursors or cursors.get('query') != query_key:
+                cursors = {'query': query_key, 'pages': {}}
+
+            page_current = page_current or 0
+            cursor = cursors['pages'].get(str(page_current))
+            patients = fetch_patients_page(
+                page_size, sort_column=sort_column, descending=descending, filters=filters,
+                cursor=cursor, offset=page_current * page_size
+            )
+
+            if patients:
+                last = patients[-1]
+                last_value = getattr(last, sort_column)
+                if isinstance(last_value, datetime):
+                    last_value = last_value.isoformat()
+                cursors['pages'][str(page_current + 1)] = [last_value, last.id]
+
+            data = [{
+                "id": patient.id,
+                "Name": patient.name,
+                "Age": patient.age,
+                "Waist Circumference": patient.waist_circ,
+                "BMI": patient.bmi,
+                "Blood Glucose": patient.blood_glucose,
+                "HDL": patient.hdl,
+                "Triglycerides": patient.triglycerides,
+                "Created At": patient.created_at.strftime("%Y-%m-%d %H:%M:%S") if patient.created_at else ""
+            } for patient in patients]
+
+            page_count = max(1, math.ceil(count_patients(filters) / page_size))
+            return data, page_count, cursors
+
         @self.app.callback(
             Output('url', 'pathname'),
             Input('patient-table', 'selected_rows'),
             State('patient-table', 'data')
         )
+        @timed_callback
         def update_url_on_row_select(selected_rows, rows):
             if selected_rows:
-                # Get the selected patient's name
-                selected_name = rows[selected_rows[0]]['Name']
-                # Find the patient with this name in the database
-                patient_data = fetch_all_patients()
-                for patient in patient_data:
-                    if patient.name == selected_name:
-                        return f'/patient/{patient.id}'
+                row = rows[selected_rows[0]]
+                if row.get('id') is not None:
+                    return f'/patient/{row["id"]}'
+                # Rows without an id: resolve the name through the cached name index
+                patient_ids = fetch_patient_ids_by_name(row['Name'])
+                if patient_ids:
+                    return f'/patient/{patient_ids[0]}'
             return dash.no_update
         
+        # One callback refreshes every model-backed panel of the digital twin page, so a new
+        # patient costs a single request: the patient is resolved and inferred once, then each
+        # panel is built on its own (see refresh_panels)
         @self.app.callback(
-            dash.dependencies.Output('risk-gauge', 'figure'),
-            [dash.dependencies.Input('interval-update', 'n_intervals'),
-             Input('current-patient-data', 'data')]
-        )
-        def update_risk_gauge(n_intervals, patient_data):
-            if patient_data:
-                patient_data_array = [
-                    patient_data['age'],
-                    patient_data['waist_circ'],
-                    patient_data['bmi'],
-                    patient_data['blood_glucose'],
-                    patient_data['hdl'],
-                    patient_data['triglycerides']
-                ]
-            else:
-                latest_patient = get_latest_patient()
-                if latest_patient:
-                    patient_data_array = [
-                        latest_patient['age'],
-                        latest_patient['waist_circ'],
-                        latest_patient['bmi'],
-                        latest_patient['blood_glucose'],
-                        latest_patient['hdl'],
-                        latest_patient['triglycerides']
-                    ]
-                else:
-                    return go.Figure()
-
-            patient_data_array = np.array([patient_data_array], dtype='float32')
-            probability = self.trainer.model.predict_proba(patient_data_array)[0][1] * 100
-
-            fig = go.Figure(go.Indicator(
-                mode="gauge+number",
-                value=probability,
-                domain={'x': [0, 1], 'y': [0, 1]},
-                title={'text': "Risk Level", 'font': {'size': 24, 'color': '#2c3e50'}},
-                gauge={
-                    'axis': {'range': [0, 100], 'tickwidth': 1, 'tickcolor': "#2c3e50"},
-                    'bar': {'color': "#2980b9"},
-                    'bgcolor': "white",
-                    'borderwidth': 2,
-                    'bordercolor': "#2c3e50",
-                    'steps': [
-                        {'range': [0, 25], 'color': "#2ecc71"},  # Green
-                        {'range': [25, 75], 'color': "#f1c40f"},  # Yellow
-                        {'range': [75, 100], 'color': "#e74c3c"}  # Red
-                    ],
-                }
-            ))
-            
-            fig.update_layout(
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                margin=dict(l=10, r=10, t=60, b=10),
-                height=300
-            )
-            return fig
-        
-        @self.app.callback(
-            Output('risk-monitoring-text', 'children'),
-            [Input('interval-update', 'n_intervals'),
-             Input('current-patient-data', 'data')]
+            [Output(component_id, prop) for component_id, prop, _, _ in self.panels()],
+            Input('current-patient-data', 'data')
         )
-        def update_health_alerts(n, patient_data):
-            if patient_data:
-                patient_data_array = [
-                    patient_data['age'],
-                    patient_data['waist_circ'],
-                    patient_data['bmi'],
-                    patient_data['blood_glucose'],
-                    patient_data['hdl'],
-                    patient_data['triglycerides']
-                ]
-            else:
-                latest_patient = get_latest_patient()
-                if latest_patient:
-                    patient_data_array = [
-                        latest_patient['age'],
-                        latest_patient['waist_circ'],
-                        latest_patient['bmi'],
-                        latest_patient['blood_glucose'],
-                        latest_patient['hdl'],
-                        latest_patient['triglycerides']
-                    ]
-                else:
-                    return html.Div()
-
-            # Define thresholds for health alerts
-            thresholds = {
-                'BloodGlucose': 126,  # higher than this is considered diabetic
-                'HDL': 40,            # lower than this is considered at risk for heart disease
-                'Triglycerides': 200  # higher than this is considered high
-            }
-
-            alerts = []
-            
-            # Check blood glucose
-            if patient_data_array[3] > thresholds['BloodGlucose']:
-                value = patient_data_array[3]
-                alerts.append(html.Div([
-                    html.I(className="fas fa-exclamation-triangle", style={'color': '#e74c3c', 'marginRight': '10px'}),
-                    f"High Blood Glucose Alert: {value:.2f} mg/dL (Normal range: < 126 mg/dL)"
-                ], className='blinking'))
-                
-            # Check HDL
-            if patient_data_array[4] < thresholds['HDL']:
-                value = patient_data_array[4]
-                alerts.append(html.Div([
-                    html.I(className="fas fa-exclamation-triangle", style={'color': '#e74c3c', 'marginRight': '10px'}),
-                    f"Low HDL Alert: {value:.2f} mg/dL (Normal range: > 40 mg/dL)"
-                ], className='blinking'))
-                
-            # Check triglycerides
-            if patient_data_array[5] > thresholds['Triglycerides']:
-                value = patient_data_array[5]
-                alerts.append(html.Div([
-                    html.I(className="fas fa-exclamation-triangle", style={'color': '#e74c3c', 'marginRight': '10px'}),
-                    f"High Triglycerides Alert: {value:.2f} mg/dL (Normal range: < 200 mg/dL)"
-                ], className='blinking'))
-            
-            if not alerts:
-                return html.Div([
-                    html.I(className="fas fa-check-circle", style={'color': '#2ecc71', 'marginRight': '10px'}),
-                    "No health alerts at this time. All indicators are within normal ranges."
-                ], style={'color': '#2ecc71', 'fontWeight': 'bold'})
-                
-            return html.Div(alerts)
-            
-        @self.app.callback(
-             Output('risk-monitoring-graph', 'figure'),
-             Input('interval-update', 'n_intervals'),
-             Input('current-patient-data', 'data')
-         )
-        def update_risk_monitoring(n, patient_data):
-            if patient_data:
-                patient_data_array = [
-                    patient_data['age'],
-                    patient_data['waist_circ'],
-                    patient_data['bmi'],
-                    patient_data['blood_glucose'],
-                    patient_data['hdl'],
-                    patient_data['triglycerides']
-                ]
-            else:
-                latest_patient = get_latest_patient()
-                if latest_patient:
-                    patient_data_array = [
-                        latest_patient['age'],
-                        latest_patient['waist_circ'],
-                        latest_patient['bmi'],
-                        latest_patient['blood_glucose'],
-                        latest_patient['hdl'],
-                        latest_patient['triglycerides']
-                    ]
-                else:
-                    return go.Figure()
-
-            fig = go.Figure()
-            metrics = ['BloodGlucose', 'HDL', 'Triglycerides']
-            metric_indices = [3, 4, 5]
-
-            for i, metric in enumerate(metrics):
-                value = patient_data_array[metric_indices[i]]
-                y_values = [value] * 10
-
-                fig.add_trace(go.Scatter(
-                    y=y_values,
-                    mode='lines+markers',
-                    name=metric
-                ))
+        @timed_callback
+        def refresh_digital_twin(patient_data):
+            return self.refresh_panels(patient_data)
 
-            fig.update_layout(
-                title={
-                    
-                    'font': {
-                        'family': 'Times New Roman, sans-serif',
-                        'size': 20,
-                        'color': 'black'
-                    }
-                },
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-            )
-            
-            return fig
-        
-        @self.app.callback(
-            [Output('cluster-text', 'children'),
-             Output('cluster-graph', 'figure')],
-            [Input('interval-update2', 'n_intervals'),
-             Input('current-patient-data', 'data')]
+        # Health alerts and feature importance are plain arithmetic on the patient values and
+        # the published model constants, so the browser computes them without a request
+        self.app.clientside_callback(
+            ClientsideFunction(namespace='digitalTwin', function_name='healthAlerts'),
+            Output('risk-monitoring-text', 'children'),
+            [Input('current-patient-data', 'data'),
+             Input('model-constants', 'data')]
         )
-        def update_cluster(n, patient_data):
-            if patient_data:
-                patient_data_array = [
-                    patient_data['age'],
-                    patient_data['waist_circ'],
-                    patient_data['bmi'],
-                    patient_data['blood_glucose'],
-                    patient_data['hdl'],
-                    patient_data['triglycerides']
-                ]
-            else:
-                latest_patient = get_latest_patient()
-                if latest_patient:
-                    patient_data_array = [
-                        latest_patient['age'],
-                        latest_patient['waist_circ'],
-                        latest_patient['bmi'],
-                        latest_patient['blood_glucose'],
-                        latest_patient['hdl'],
-                        latest_patient['triglycerides']
-                    ]
-                else:
-                    return html.Div(), go.Figure()
-
-            patient_df = pd.DataFrame([patient_data_array], columns=['age', 'waist_circ', 'bmi', 'blood_glucose', 'hdl', 'triglycerides'])
-            cluster = self.clustertrainer.predict(patient_df)[0]
-
-            cluster_descriptions = {
-                0: "Lower risk",
-                1: "Moderate risk",
-                2: "Higher risk"
-            }
-
-            cluster_colors = {0: '#2ecc71', 1: '#f1c40f', 2: '#e74c3c'}  # Green, Yellow, Red
 
-            description = f"Risk Category: {cluster_descriptions[cluster]}"
-            color = cluster_colors[cluster]
-
-            styled_description = html.Div(
-                [html.P(description, style={'color': color})],
-                style={'font-weight': 'bold', 'margin': '20px', 'font-size':'20px', 'text-align': 'center'}
-            )
-
-            # Create bar chart for metrics
-            metrics = ['Age', 'Waist\nCirc', 'BMI', 'Blood\nGlucose', 'HDL', 'Triglycerides']
-            values = patient_data_array
-
-            fig = go.Figure(data=[
-                go.Bar(
-                    x=metrics,
-                    y=values,
-                    marker_color=color,
-                    text=values,
-                    textposition='auto',
-                )
-            ])
-
-            fig.update_layout(
-                title={
-                    
-                    'y': 0.95,
-                    'x': 0.5,
-                    'xanchor': 'center',
-                    'yanchor': 'top',
-                    'font': {'size': 16, 'color': '#2c3e50'}
-                },
-                yaxis_title="Values",
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                margin=dict(l=10, r=10, t=60, b=10),
-                height=300,
-                font={'color': '#2c3e50'}
-            )
-
-            return styled_description, fig
-        
-        @self.app.callback(
+        self.app.clientside_callback(
+            ClientsideFunction(namespace='digitalTwin', function_name='featureImportance'),
             Output('feature-importance-graph', 'figure'),
-            [Input('interval-update2', 'n_intervals'),
-             Input('current-patient-data', 'data')]
+            [Input('current-patient-data', 'data'),
+             Input('model-constants', 'data')],
+            State('feature-importance-graph', 'figure')
         )
-        def update_feature_importance(n, patient_data):
-            if patient_data:
-                patient_data_array = [
-                    patient_data['age'],
-                    patient_data['waist_circ'],
-                    patient_data['bmi'],
-                    patient_data['blood_glucose'],
-                    patient_data['hdl'],
-                    patient_data['triglycerides']
-                ]
-            else:
-                latest_patient = get_latest_patient()
-                if latest_patient:
-                    patient_data_array = [
-                        latest_patient['age'],
-                        latest_patient['waist_circ'],
-                        latest_patient['bmi'],
-                        latest_patient['blood_glucose'],
-                        latest_patient['hdl'],
-                        latest_patient['triglycerides']
-                    ]
-                else:
-                    return go.Figure()
-
-            # Get feature importances from the model
-            base_importances = self.trainer.model.feature_importances_
-
-            # Define feature names and their corresponding maximum values
-            feature_info = [
-                {'name': 'Age', 'display_name': 'Age', 'max_value': 100},
-                {'name': 'Waist Circumference', 'display_name': 'Waist\nCircumference', 'max_value': 150},
-                {'name': 'BMI', 'display_name': 'BMI', 'max_value': 50},
-                {'name': 'Blood Glucose', 'display_name': 'Blood\nGlucose', 'max_value': 200},
-                {'name': 'HDL', 'display_name': 'HDL\nCholesterol', 'max_value': 100},
-                {'name': 'Triglycerides', 'display_name': 'Triglycerides', 'max_value': 300}
-            ]
-            
-            # Extract lists for processing
-            max_values = [info['max_value'] for info in feature_info]
-            display_names = [info['display_name'] for info in feature_info]
-            
-            # Normalize patient values relative to typical maximum values
-            normalized_values = [min(1.0, value / max_val) for value, max_val in zip(patient_data_array, max_values)]
-            
-            # Calculate relative importance and convert to percentages
-            relative_importances = [base_imp * norm_val * 100 for base_imp, norm_val in zip(base_importances, normalized_values)]
-            
-            # Create DataFrame for visualization
-            df_feature_importances = pd.DataFrame({
-                'Features': display_names,
-                'Importance': relative_importances,
-                'Values': patient_data_array
-            })
-            
-            # Sort by relative importance
-            df_feature_importances = df_feature_importances.sort_values('Importance', ascending=True)
-            
-            # Create the bar chart
-            fig = go.Figure(go.Bar(
-                x=df_feature_importances['Importance'],
-                y=df_feature_importances['Features'],
-                orientation='h',
-                marker_color='#3498db',
-                text=[f'Value: {val:.1f} | Impact: {imp:.1f}%' 
-                      for val, imp in zip(df_feature_importances['Values'], 
-                                        df_feature_importances['Importance'])],
-                textposition='auto',
-            ))
-            
-            fig.update_layout(
-                title={
-                    
-                    'y': 0.95,
-                    'x': 0.5,
-                    'xanchor': 'center',
-                    'yanchor': 'top',
-                    'font': {'size': 16, 'color': '#2c3e50'}
-                },
-                xaxis_title="Relative Impact (%)",
-                yaxis_title="Health Factors",
-                yaxis={'categoryorder':'total ascending'},
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                margin=dict(l=10, r=10, t=60, b=10),
-                height=300,
-                font={'color': '#2c3e50'},
-                xaxis=dict(
-                    ticksuffix="%",
-                    range=[0, max(df_feature_importances['Importance']) * 1.1]  # Add 10% padding
-                )
-            )
-            return fig
+
+        @self.app.server.route('/api/inference_cache_stats')
+        def inference_cache_stats():
+            return flask.jsonify(self.inference_cache.stats())
         
     def run(self):
         self.app.run_server(host='0.0.0.0', port=8050, debug=True)
\ No newline at end of file
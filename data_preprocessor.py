@@ -1,28 +1,60 @@
 import pandas as pd
 from sklearn.impute import SimpleImputer
 from sklearn.preprocessing import StandardScaler
+from dataset_cache import DatasetCache
+
+# Bump when impute_missing_values changes so cached imputed datasets are rebuilt
+IMPUTATION_VERSION = 1
 
 class DataPreprocessor:
-    def __init__(self, file_path):
+    def __init__(self, file_path, use_cache=True):
         self.file_path = file_path
         self.data = None
+        self.cache = DatasetCache() if use_cache else None
+        # True while self.data still matches the cached source, so derived results can be cached too
+        self.data_matches_source = False
         self.numerical_cols = ['Age', 'Income', 'WaistCirc', 'BMI', 'UrAlbCr', 'UricAcid', 'BloodGlucose', 'HDL', 'Triglycerides']
         self.categorical_cols =  ['Sex', 'Marital']
 
     def load_data(self):
-        self.data = pd.read_excel(self.file_path)
+        if self.cache is not None:
+            self.data = self.cache.load(self.file_path, 'raw')
+            if self.data is None:
+                self.data = pd.read_excel(self.file_path)
+                self.cache.save(self.file_path, 'raw', self.data)
+        else:
+            self.data = pd.read_excel(self.file_path)
+        self.data_matches_source = self.cache is not None
     
+    def imputation_version(self):
+        # The code version plus the settings it depends on, so either change rebuilds the cache
+        return {
+            'version': IMPUTATION_VERSION,
+            'numerical': {'columns': self.numerical_cols, 'strategy': 'median'},
+            'categorical': {'columns': self.categorical_cols, 'strategy': 'most_frequent'},
+        }
+
     def impute_missing_values(self):
+        if self.data_matches_source:
+            imputed = self.cache.load(self.file_path, 'imputed', logic_version=self.imputation_version())
+            if imputed is not None:
+                self.data = imputed
+                return
+
         imputer_num = SimpleImputer(strategy='median')
         imputer_cat = SimpleImputer(strategy='most_frequent')
 
         self.data[self.numerical_cols] = imputer_num.fit_transform(self.data[self.numerical_cols])
         self.data[self.categorical_cols] = imputer_cat.fit_transform(self.data[self.categorical_cols])
 
+        if self.data_matches_source:
+            self.cache.save(self.file_path, 'imputed', self.data, logic_version=self.imputation_version())
+
     def scale_data(self):
         scaler = StandardScaler()
         numerical_cols = ['Age', 'Income', 'WaistCirc', 'BMI', 'UrAlbCr', 'UricAcid', 'BloodGlucose', 'HDL', 'Triglycerides']
         self.data[numerical_cols] = scaler.fit_transform(self.data[numerical_cols])
+        self.data_matches_source = False
 
     def get_processed_data(self):
         return self.data
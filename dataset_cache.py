@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+# Bump when the on-disk layout changes so stale caches are rebuilt
+CACHE_FORMAT_VERSION = 1
+
+DATASET_CACHE_DIR = os.getenv('DATASET_CACHE_DIR', '.dataset_cache')
+
+
+def file_digest(path, chunk_size=1 << 20):
+    # SHA-256 of the file contents, read in chunks so large workbooks stay cheap
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Columnar cache of a source workbook with one .npy file per column.
+# Numeric columns are memory-mapped copy-on-write so loading does not copy them;
+# text columns such as Sex and Marital are stored as integer codes plus a
+# category list and come back as pandas Categoricals.
+class DatasetCache:
+    def __init__(self, root=DATASET_CACHE_DIR):
+        self.root = root
+
+    def _entry_dir(self, file_path, variant):
+        source_id = hashlib.sha256(os.path.abspath(file_path).encode('utf-8')).hexdigest()[:16]
+        name = os.path.splitext(os.path.basename(file_path))[0].replace(' ', '_')
+        return os.path.join(self.root, f"{name}-{source_id}", variant)
+
+    def _read_manifest(self, entry_dir):
+        try:
+            with open(os.path.join(entry_dir, 'manifest.json')) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get('format_version') != CACHE_FORMAT_VERSION:
+            return None
+        return manifest
+
+    def _is_fresh(self, file_path, entry_dir, manifest):
+        stat = os.stat(file_path)
+        source = manifest['source']
+        if source['size'] == stat.st_size and source['mtime_ns'] == stat.st_mtime_ns:
+            return True
+        # The file was touched; only a content change invalidates the cache
+        if source['size'] != stat.st_size or file_digest(file_path) != source['sha256']:
+            return False
+        source['mtime_ns'] = stat.st_mtime_ns
+        try:
+            with open(os.path.join(entry_dir, 'manifest.json'), 'w') as f:
+                json.dump(manifest, f)
+        except OSError:
+            pass
+        return True
+
+    def source_digest(self, file_path):
+        # Reuse the digest recorded with the cached copy instead of rehashing an unchanged file
+        entry_dir = self._entry_dir(file_path, 'raw')
+        manifest = self._read_manifest(entry_dir)
+        if manifest is not None and self._is_fresh(file_path, entry_dir, manifest):
+            return manifest['source']['sha256']
+        return file_digest(file_path)
+
+    def load(self, file_path, variant='raw', logic_version=None):
+        # logic_version identifies the code that derived a variant from the source (e.g. the
+        # imputation); an entry written by other code is treated as missing
+        entry_dir = self._entry_dir(file_path, variant)
+        manifest = self._read_manifest(entry_dir)
+        if manifest is None or manifest.get('logic_version') != logic_version:
+            return None
+        if not self._is_fresh(file_path, entry_dir, manifest):
+            return None
+
+        columns = {}
+        try:
+            for i, column in enumerate(manifest['columns']):
+                values = np.load(os.path.join(entry_dir, f"col_{i}.npy"), mmap_mode='c')
+                if column['kind'] == 'categorical':
+                    values = pd.Categorical.from_codes(values, column['categories'])
+                columns[column['name']] = values
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable dataset cache {entry_dir}: {e}")
+            return None
+        return pd.DataFrame(columns, copy=False)
+
+    def save(self, file_path, variant, data, logic_version=None):
+        columns = []
+        arrays = []
+        for name in data.columns:
+            series = data[name]
+            if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+                columns.append({'name': name, 'kind': 'numeric'})
+                arrays.append(series.to_numpy())
+                continue
+            categorical = pd.Categorical(series)
+            if not all(isinstance(c, str) for c in categorical.categories):
+                print(f"Not caching {file_path}: column {name} has non-text values")
+                return False
+            columns.append({'name': name, 'kind': 'categorical', 'categories': list(categorical.categories)})
+            arrays.append(categorical.codes)
+
+        stat = os.stat(file_path)
+        manifest = {
+            'format_version': CACHE_FORMAT_VERSION,
+            'logic_version': logic_version,
+            'source': {
+                'path': file_path,
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'sha256': file_digest(file_path),
+            },
+            'columns': columns,
+        }
+
+        entry_dir = self._entry_dir(file_path, variant)
+        # Write into a temporary directory first so readers never see a half-written entry
+        tmp_dir = f"{entry_dir}.tmp-{os.getpid()}"
+        try:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+            for i, values in enumerate(arrays):
+                np.save(os.path.join(tmp_dir, f"col_{i}.npy"), np.ascontiguousarray(values))
+            with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+                json.dump(manifest, f)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(tmp_dir, entry_dir)
+        except OSError as e:
+            # A read-only cache directory should not stop the data from loading
+            print(f"Failed to write dataset cache {entry_dir}: {e}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return False
+        return True
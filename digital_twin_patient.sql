@@ -32,10 +32,17 @@ CREATE TABLE `patient` (
   `hdl` float DEFAULT NULL,
   `triglycerides` float DEFAULT NULL,
   `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+  `risk_probability` float DEFAULT NULL,
+  `risk_cluster` int DEFAULT NULL,
+  `model_version` varchar(32) DEFAULT NULL,
   PRIMARY KEY (`id`),
   KEY `idx_age` (`age`),
   KEY `idx_bmi` (`bmi`),
-  KEY `idx_name` (`name`)
+  KEY `idx_name` (`name`),
+  KEY `idx_created_at` (`created_at`),
+  KEY `idx_risk_probability` (`risk_probability`),
+  KEY `idx_risk_cluster` (`risk_cluster`),
+  KEY `idx_model_version` (`model_version`)
 ) ENGINE=InnoDB AUTO_INCREMENT=72 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
@@ -45,7 +52,7 @@ CREATE TABLE `patient` (
 
 LOCK TABLES `patient` WRITE;
 /*!40000 ALTER TABLE `patient` DISABLE KEYS */;
-INSERT INTO `patient` VALUES (1,'test 1',55,70,24,200,45,250,'2024-06-28 09:18:58'),(2,'test 1',55,70,24,150,45,250,'2024-06-28 09:19:19'),(3,'test 3',40,90,40,90,40,240,'2024-06-28 09:57:29'),(4,'test 1',55,70,24,150,45,250,'2024-06-28 09:57:47'),(5,'test 2',30,40,19,110,60,150,'2024-06-28 09:57:54'),(6,'test 3',40,90,40,90,40,240,'2024-06-28 09:58:18'),(7,'test 3',40,90,40,140,40,240,'2024-06-28 09:58:35'),(8,'test 3',40,90,40,140,39,240,'2024-06-28 09:58:46'),(9,'test 1',55,70,24,150,45,250,'2024-06-28 10:04:13'),(10,'test 3',40,90,40,140,39,240,'2024-06-28 10:04:23'),(11,'test 1',55,70,24,150,45,250,'2024-06-28 10:06:42'),(12,'test 2',30,40,19,110,60,150,'2024-06-28 10:07:00'),(13,'test 2',30,40,19,110,39,150,'2024-06-28 10:07:19'),(14,'test 3',40,90,40,140,39,240,'2024-06-28 10:07:40'),(15,'test 1',55,70,24,150,45,250,'2024-06-28 10:12:14'),(16,'test 2',30,40,19,110,39,150,'2024-06-28 10:13:40'),(17,'test 3',40,90,40,140,39,240,'2024-06-28 10:13:54'),(18,'test 1',55,70,24,150,45,250,'2024-06-28 10:32:29'),(19,'test 2',30,40,19,110,39,150,'2024-06-28 10:34:09'),(20,'test 2',30,40,19,110,40,150,'2024-06-28 14:48:27'),(21,'test 3',40,90,40,140,39,240,'2024-06-28 14:51:19'),(22,'test 1',55,70,24,150,45,250,'2024-06-28 14:51:44'),(23,'test 1',55,70,24,150,45,250,'2024-06-29 06:37:02'),(24,'test 3',40,90,40,140,39,240,'2024-06-29 06:55:11'),(25,'Minhaj',55,70,24,150,45,250,'2024-06-29 06:57:06'),(26,'Minhaj',55,70,24,150,45,250,'2024-07-01 16:38:10'),(27,'test 2',30,40,19,110,40,150,'2024-07-01 16:38:22'),(28,'test 3',40,90,40,140,39,240,'2024-07-01 16:38:38'),(29,'Minhaj',55,70,24,150,45,250,'2024-07-01 16:57:12'),(30,'test 2',30,40,19,110,40,150,'2024-07-01 16:58:45'),(31,'test 3',40,90,40,140,39,240,'2024-07-01 16:58:53'),(32,'Minhaj',55,70,24,150,45,250,'2024-07-01 17:06:32'),(33,'test 2',30,40,19,110,40,150,'2024-07-01 17:06:48'),(34,'Minhaj',55,70,24,150,45,250,'2024-07-01 17:07:45'),(35,'test 3',40,90,40,140,39,240,'2024-07-01 17:07:55'),(36,'Minhaj',55,70,24,150,45,250,'2024-07-01 18:26:31'),(37,'test 2',30,40,19,110,40,150,'2024-07-01 18:26:46'),(38,'test 3',40,90,40,140,39,240,'2024-07-01 18:27:12'),(39,'Minhaj',55,70,24,150,45,250,'2024-07-03 08:56:17'),(40,'test 2',30,40,19,110,40,150,'2024-07-03 09:12:09'),(41,'test 3',40,90,40,140,39,240,'2024-07-03 09:12:25'),(42,'Minhaj',55,70,24,150,45,250,'2024-07-03 09:12:33'),(43,'Minhaj',55,70,24,150,45,250,'2024-07-03 09:20:47'),(44,'test 2',30,40,19,110,40,150,'2024-07-03 09:20:54'),(45,'test 3',40,90,40,140,39,240,'2024-07-03 09:21:17'),(46,'test 2',30,40,19,110,40,150,'2024-07-03 09:22:17'),(47,'Minhaj',55,70,24,150,45,250,'2024-07-03 09:22:24'),(48,'test 2',30,40,19,110,40,150,'2024-07-03 18:39:16'),(49,'test 3',40,90,40,140,39,240,'2024-07-03 18:39:32'),(50,'Minhaj',55,70,24,150,45,250,'2024-07-03 18:39:42'),(51,'test 2',30,40,19,110,40,150,'2024-07-03 18:51:02'),(52,'test 3',40,90,40,140,39,240,'2024-07-03 18:55:17'),(53,'Test 1',55,70,24,150,45,250,'2024-07-03 19:01:07'),(54,'Test 1',55,70,24,150,45,250,'2024-07-04 04:30:21'),(55,'test 2',30,40,19,110,40,150,'2024-07-04 04:30:30'),(56,'test 3',40,90,40,140,39,240,'2024-07-04 04:30:36'),(57,'Test 1',55,70,24,150,45,250,'2024-07-04 04:33:38'),(58,'test 2',30,40,19,110,40,150,'2024-07-04 04:47:59'),(59,'test 3',40,90,40,140,39,240,'2024-07-04 04:48:09'),(60,'Test 1',55,70,24,150,45,250,'2024-07-04 04:51:42'),(61,'test 2',30,40,19,110,40,150,'2024-07-04 05:19:08'),(62,'test 3',40,90,40,140,39,240,'2024-07-04 05:19:13'),(63,'Test 1',55,70,24,150,45,250,'2024-07-04 05:19:21'),(64,'Test 1',55,70,24,150,45,250,'2024-07-04 05:24:57'),(65,'Test 1',55,70,24,148,45,250,'2024-07-04 05:28:44'),(66,'Test 1',55,70,24,148,45,236,'2024-07-04 05:28:55'),(67,'test 2',30,40,19,108,40,150,'2024-07-04 05:29:16'),(68,'test 2',30,40,19,108,40,125,'2024-07-04 05:29:37'),(69,'Test 1',55,70,24,148,45,236,'2024-07-04 05:49:30'),(70,'Test 1',55,70,24,148,45,236,'2024-07-04 06:07:11'),(71,'test 3',40,90,40,140,39,240,'2024-07-04 06:38:16');
+INSERT INTO `patient` (`id`,`name`,`age`,`waist_circ`,`bmi`,`blood_glucose`,`hdl`,`triglycerides`,`created_at`) VALUES (1,'test 1',55,70,24,200,45,250,'2024-06-28 09:18:58'),(2,'test 1',55,70,24,150,45,250,'2024-06-28 09:19:19'),(3,'test 3',40,90,40,90,40,240,'2024-06-28 09:57:29'),(4,'test 1',55,70,24,150,45,250,'2024-06-28 09:57:47'),(5,'test 2',30,40,19,110,60,150,'2024-06-28 09:57:54'),(6,'test 3',40,90,40,90,40,240,'2024-06-28 09:58:18'),(7,'test 3',40,90,40,140,40,240,'2024-06-28 09:58:35'),(8,'test 3',40,90,40,140,39,240,'2024-06-28 09:58:46'),(9,'test 1',55,70,24,150,45,250,'2024-06-28 10:04:13'),(10,'test 3',40,90,40,140,39,240,'2024-06-28 10:04:23'),(11,'test 1',55,70,24,150,45,250,'2024-06-28 10:06:42'),(12,'test 2',30,40,19,110,60,150,'2024-06-28 10:07:00'),(13,'test 2',30,40,19,110,39,150,'2024-06-28 10:07:19'),(14,'test 3',40,90,40,140,39,240,'2024-06-28 10:07:40'),(15,'test 1',55,70,24,150,45,250,'2024-06-28 10:12:14'),(16,'test 2',30,40,19,110,39,150,'2024-06-28 10:13:40'),(17,'test 3',40,90,40,140,39,240,'2024-06-28 10:13:54'),(18,'test 1',55,70,24,150,45,250,'2024-06-28 10:32:29'),(19,'test 2',30,40,19,110,39,150,'2024-06-28 10:34:09'),(20,'test 2',30,40,19,110,40,150,'2024-06-28 14:48:27'),(21,'test 3',40,90,40,140,39,240,'2024-06-28 14:51:19'),(22,'test 1',55,70,24,150,45,250,'2024-06-28 14:51:44'),(23,'test 1',55,70,24,150,45,250,'2024-06-29 06:37:02'),(24,'test 3',40,90,40,140,39,240,'2024-06-29 06:55:11'),(25,'Minhaj',55,70,24,150,45,250,'2024-06-29 06:57:06'),(26,'Minhaj',55,70,24,150,45,250,'2024-07-01 16:38:10'),(27,'test 2',30,40,19,110,40,150,'2024-07-01 16:38:22'),(28,'test 3',40,90,40,140,39,240,'2024-07-01 16:38:38'),(29,'Minhaj',55,70,24,150,45,250,'2024-07-01 16:57:12'),(30,'test 2',30,40,19,110,40,150,'2024-07-01 16:58:45'),(31,'test 3',40,90,40,140,39,240,'2024-07-01 16:58:53'),(32,'Minhaj',55,70,24,150,45,250,'2024-07-01 17:06:32'),(33,'test 2',30,40,19,110,40,150,'2024-07-01 17:06:48'),(34,'Minhaj',55,70,24,150,45,250,'2024-07-01 17:07:45'),(35,'test 3',40,90,40,140,39,240,'2024-07-01 17:07:55'),(36,'Minhaj',55,70,24,150,45,250,'2024-07-01 18:26:31'),(37,'test 2',30,40,19,110,40,150,'2024-07-01 18:26:46'),(38,'test 3',40,90,40,140,39,240,'2024-07-01 18:27:12'),(39,'Minhaj',55,70,24,150,45,250,'2024-07-03 08:56:17'),(40,'test 2',30,40,19,110,40,150,'2024-07-03 09:12:09'),(41,'test 3',40,90,40,140,39,240,'2024-07-03 09:12:25'),(42,'Minhaj',55,70,24,150,45,250,'2024-07-03 09:12:33'),(43,'Minhaj',55,70,24,150,45,250,'2024-07-03 09:20:47'),(44,'test 2',30,40,19,110,40,150,'2024-07-03 09:20:54'),(45,'test 3',40,90,40,140,39,240,'2024-07-03 09:21:17'),(46,'test 2',30,40,19,110,40,150,'2024-07-03 09:22:17'),(47,'Minhaj',55,70,24,150,45,250,'2024-07-03 09:22:24'),(48,'test 2',30,40,19,110,40,150,'2024-07-03 18:39:16'),(49,'test 3',40,90,40,140,39,240,'2024-07-03 18:39:32'),(50,'Minhaj',55,70,24,150,45,250,'2024-07-03 18:39:42'),(51,'test 2',30,40,19,110,40,150,'2024-07-03 18:51:02'),(52,'test 3',40,90,40,140,39,240,'2024-07-03 18:55:17'),(53,'Test 1',55,70,24,150,45,250,'2024-07-03 19:01:07'),(54,'Test 1',55,70,24,150,45,250,'2024-07-04 04:30:21'),(55,'test 2',30,40,19,110,40,150,'2024-07-04 04:30:30'),(56,'test 3',40,90,40,140,39,240,'2024-07-04 04:30:36'),(57,'Test 1',55,70,24,150,45,250,'2024-07-04 04:33:38'),(58,'test 2',30,40,19,110,40,150,'2024-07-04 04:47:59'),(59,'test 3',40,90,40,140,39,240,'2024-07-04 04:48:09'),(60,'Test 1',55,70,24,150,45,250,'2024-07-04 04:51:42'),(61,'test 2',30,40,19,110,40,150,'2024-07-04 05:19:08'),(62,'test 3',40,90,40,140,39,240,'2024-07-04 05:19:13'),(63,'Test 1',55,70,24,150,45,250,'2024-07-04 05:19:21'),(64,'Test 1',55,70,24,150,45,250,'2024-07-04 05:24:57'),(65,'Test 1',55,70,24,148,45,250,'2024-07-04 05:28:44'),(66,'Test 1',55,70,24,148,45,236,'2024-07-04 05:28:55'),(67,'test 2',30,40,19,108,40,150,'2024-07-04 05:29:16'),(68,'test 2',30,40,19,108,40,125,'2024-07-04 05:29:37'),(69,'Test 1',55,70,24,148,45,236,'2024-07-04 05:49:30'),(70,'Test 1',55,70,24,148,45,236,'2024-07-04 06:07:11'),(71,'test 3',40,90,40,140,39,240,'2024-07-04 06:38:16');
 /*!40000 ALTER TABLE `patient` ENABLE KEYS */;
 UNLOCK TABLES;
 /*!40103 SET TIME_ZONE=@OLD_TIME_ZONE */;
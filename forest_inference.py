@@ -0,0 +1,86 @@
+import numpy as np
+
+
+# A fitted RandomForestClassifier flattened into contiguous NumPy node arrays.
+# All trees are evaluated together by stepping every (row, tree) pair one level
+# per iteration, so a prediction costs max_depth vectorized steps and skips the
+# per-call validation and joblib dispatch of sklearn's predict_proba.
+class CompiledForest:
+    def __init__(self, feature, threshold, left, right, is_leaf, leaf_proba, roots, max_depth, n_features, classes):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.is_leaf = is_leaf
+        self.leaf_proba = leaf_proba
+        self.roots = roots
+        self.max_depth = max_depth
+        self.n_features = n_features
+        self.classes_ = classes
+
+    @classmethod
+    def from_sklearn(cls, model):
+        features, thresholds, lefts, rights, leaves, probas, roots = [], [], [], [], [], [], []
+        max_depth = 0
+        offset = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            node_ids = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+
+            # Leaves point at themselves so extra traversal steps are no-ops
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+            leaves.append(is_leaf)
+
+            # Same normalisation as DecisionTreeClassifier.predict_proba
+            value = tree.value[:, 0, :]
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            probas.append(value / normalizer)
+
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += tree.node_count
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.intp),
+            is_leaf=np.concatenate(leaves),
+            leaf_proba=np.ascontiguousarray(np.concatenate(probas), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            n_features=model.n_features_in_,
+            classes=model.classes_,
+        )
+
+    def apply(self, X):
+        # Leaf index of every (row, tree) pair. X is compared as float32, like sklearn does.
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        n_rows = X.shape[0]
+        flat_X = X.ravel()
+        # Offset of each row in flat_X, so a feature lookup is one take() on a flat array
+        row_offsets = (np.arange(n_rows, dtype=np.intp) * self.n_features)[:, None]
+        nodes = np.repeat(self.roots[None, :], n_rows, axis=0)
+        for _ in range(self.max_depth):
+            values = flat_X.take(row_offsets + self.feature.take(nodes))
+            go_left = values <= self.threshold.take(nodes)
+            nodes = np.where(go_left, self.left.take(nodes), self.right.take(nodes))
+            if self.is_leaf.take(nodes).all():
+                break
+        return nodes
+
+    def predict_proba(self, X):
+        # Summing over the tree axis adds the trees in order, matching sklearn's accumulation
+        proba = self.leaf_proba[self.apply(X)].sum(axis=1)
+        proba /= len(self.roots)
+        return proba
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
@@ -0,0 +1,120 @@
+import argparse
+import re
+import time
+from datetime import datetime
+
+from sqlalchemy import delete, func, select
+
+import connection
+from connection import patient_table
+
+# Loads the patient rows of a mysqldump file (such as digital_twin_patient.sql) into the
+# configured backend, typically to move an existing MySQL deployment to SQLite:
+#
+#   DB_BACKEND=sqlite SQLITE_PATH=digitaltwin.db python import_dump.py digital_twin_patient.sql
+
+# Column order of VALUES tuples in dumps made before the risk columns were added, which
+# have no column list
+PATIENT_COLUMNS = ['id', 'name', 'age', 'waist_circ', 'bmi', 'blood_glucose', 'hdl', 'triglycerides', 'created_at']
+
+IMPORT_CHUNK_SIZE = 5000
+
+INSERT_PATTERN = re.compile(r"INSERT INTO `patient`(?: \(([^)]*)\))? VALUES ")
+
+# One value of a VALUES tuple: a quoted string with MySQL escapes, NULL or a number
+VALUE_PATTERN = re.compile(r"\s*('(?:[^'\\]|\\.|'')*'|NULL|[-+0-9.eE]+)\s*")
+
+MYSQL_ESCAPES = {'0': '\0', 'b': '\b', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\x1a'}
+
+
+def _unquote(text):
+    body = text[1:-1].replace("''", "'")
+    return re.sub(r"\\(.)", lambda m: MYSQL_ESCAPES.get(m.group(1), m.group(1)), body)
+
+
+def _parse_value(token):
+    if token == 'NULL':
+        return None
+    if token.startswith("'"):
+        return _unquote(token)
+    if re.fullmatch(r"[-+]?\d+", token):
+        return int(token)
+    return float(token)
+
+
+def _parse_tuples(values, position):
+    # Yield the tuples of one "VALUES (...),(...);" list starting at position
+    while True:
+        if values[position] != '(':
+            raise ValueError(f"Expected '(' at offset {position}")
+        position += 1
+        row = []
+        while True:
+            match = VALUE_PATTERN.match(values, position)
+            if match is None:
+                raise ValueError(f"Cannot parse value at offset {position}")
+            row.append(_parse_value(match.group(1)))
+            position = match.end()
+            if values[position] == ',':
+                position += 1
+                continue
+            if values[position] == ')':
+                position += 1
+                break
+            raise ValueError(f"Unexpected {values[position]!r} at offset {position}")
+        yield row
+        if values[position] == ',':
+            position += 1
+        elif values[position] == ';':
+            return
+        else:
+            raise ValueError(f"Unexpected {values[position]!r} at offset {position}")
+
+
+def read_dump_rows(dump_path):
+    # Patient rows as dicts keyed by column name, in dump order
+    with open(dump_path, encoding='utf-8') as f:
+        sql = f.read()
+    for match in INSERT_PATTERN.finditer(sql):
+        if match.group(1):
+            columns = [column.strip().strip('`') for column in match.group(1).split(',')]
+        else:
+            columns = PATIENT_COLUMNS
+        for row in _parse_tuples(sql, match.end()):
+            record = dict(zip(columns, row))
+            if record['created_at'] is not None:
+                record['created_at'] = datetime.fromisoformat(record['created_at'])
+            yield record
+
+
+def import_dump(dump_path, replace=False):
+    connection.ensure_schema()
+    engine = connection.get_engine()
+    imported = 0
+    with engine.begin() as conn:
+        if replace:
+            conn.execute(delete(patient_table))
+        chunk = []
+        for record in read_dump_rows(dump_path):
+            chunk.append(record)
+            if len(chunk) == IMPORT_CHUNK_SIZE:
+                conn.execute(patient_table.insert(), chunk)
+                imported += len(chunk)
+                chunk = []
+        if chunk:
+            conn.execute(patient_table.insert(), chunk)
+            imported += len(chunk)
+        total = conn.execute(select(func.count()).select_from(patient_table)).scalar()
+    return imported, total
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Import the patient rows of a MySQL dump into the configured database')
+    parser.add_argument('dump', nargs='?', default='digital_twin_patient.sql', help='mysqldump file to import')
+    parser.add_argument('--replace', action='store_true', help='Delete existing patient rows first')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    imported, total = import_dump(args.dump, replace=args.replace)
+    print(f"Imported {imported} patients into {connection.DB_BACKEND} in {time.perf_counter() - start:.2f} s "
+          f"({total} rows in table)")
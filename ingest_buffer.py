@@ -0,0 +1,132 @@
+import queue
+import threading
+import time
+
+from patient_service import insert_patients
+
+
+class IngestUnavailable(Exception):
+    # Raised when a record cannot be queued: the buffer is full or shutting down
+    pass
+
+
+class PendingRecord:
+    def __init__(self, record):
+        self.record = record
+        self.committed = threading.Event()
+        self.error = None
+
+
+# Write-behind buffer for patient uploads. Records are queued in memory and a
+# background thread writes them with insert_patients in groups of up to
+# batch_size rows, or whatever arrived within flush_interval seconds.
+class IngestBuffer:
+    def __init__(self, max_queue=10000, batch_size=500, flush_interval=0.2, write_batch=insert_patients):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.write_batch = write_batch
+        self.stopping = threading.Event()
+        self.thread = None
+        self.start_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.flushes = 0
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.rejected = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def start(self):
+        # Started on first use so a forked worker runs its own writer thread
+        with self.start_lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.stopping.clear()
+                self.thread = threading.Thread(target=self.run, name='ingest-writer', daemon=True)
+                self.thread.start()
+
+    def submit(self, record):
+        if self.stopping.is_set():
+            raise IngestUnavailable("Ingest buffer is shutting down")
+        if self.thread is None:
+            self.start()
+        pending = PendingRecord(record)
+        try:
+            self.queue.put_nowait(pending)
+        except queue.Full:
+            with self.stats_lock:
+                self.rejected += 1
+            raise IngestUnavailable("Ingest queue is full")
+        return pending
+
+    def run(self):
+        while True:
+            try:
+                first = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if self.stopping.is_set():
+                    return
+                continue
+
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self.flush(batch)
+
+    def flush(self, batch):
+        start = time.perf_counter()
+        try:
+            errors = self.write_batch([pending.record for pending in batch])
+        except Exception as e:
+            errors = [(position, str(e)) for position in range(len(batch))]
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        for position, message in errors:
+            batch[position].error = message
+        for pending in batch:
+            pending.committed.set()
+
+        with self.stats_lock:
+            self.flushes += 1
+            self.rows_written += len(batch) - len(errors)
+            self.rows_failed += len(errors)
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.total_flush_ms += elapsed_ms
+
+    def stop(self, timeout=30):
+        # Stop accepting records and wait for the writer to drain the queue
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+        # Anything queued while the writer was exiting is written here
+        leftover = []
+        while True:
+            try:
+                leftover.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(leftover), self.batch_size):
+            self.flush(leftover[start:start + self.batch_size])
+
+    def stats(self):
+        with self.stats_lock:
+            return {
+                'queue_depth': self.queue.qsize(),
+                'queue_capacity': self.queue.maxsize,
+                'flushes': self.flushes,
+                'rows_written': self.rows_written,
+                'rows_failed': self.rows_failed,
+                'rejected': self.rejected,
+                'last_flush_ms': self.last_flush_ms,
+                'max_flush_ms': self.max_flush_ms,
+                'avg_flush_ms': self.total_flush_ms / self.flushes if self.flushes else 0.0,
+            }
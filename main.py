@@ -1,28 +1,18 @@
-from data_preprocessor import DataPreprocessor
-from model_trainer import ModelTrainer
+from connection import wait_for_db
 from dashboard import Dashboard
-from cluster_model_trainer import ClusterModelTrainer
+from model_store import load_or_train, DATASET_PATH, SELECTED_FEATURES
+from online_clustering import CLUSTER_MODE, online_cluster_model
 
-# Use relative path for the dataset
-file_path = 'heart datasets/Metabolic Syndrome_Minhas Open data set.xlsx'
+# Wait for database to be ready
+wait_for_db()
 
-# Data Preprocessing
-preprocessor = DataPreprocessor(file_path)
-preprocessor.load_data()
-preprocessor.impute_missing_values()
-#preprocessor.scale_data()
-processed_data = preprocessor.get_processed_data()
+# Model Training (loaded from the model store when the dataset, features and parameters are unchanged)
+trainer, clustertrainer = load_or_train(DATASET_PATH, SELECTED_FEATURES, n_clusters=3)
 
-# Model Training
-selected_features = ['Age', 'WaistCirc', 'BMI', 'BloodGlucose', 'HDL', 'Triglycerides']
-trainer = ModelTrainer(selected_features)
-trainer.prepare_data(processed_data)
-trainer.train_model()
-trainer.evaluate_model()
-
-# Cluster Analysis
-clustertrainer = ClusterModelTrainer(n_clusters=3)
-clustertrainer.fit(trainer.X_train)
+# Keep the clusters learning from new patients (resumes from the last checkpoint)
+if CLUSTER_MODE == 'online':
+    clustertrainer, cluster_updater = online_cluster_model(trainer, clustertrainer)
+    cluster_updater.start()
 
 # Dashboard
 dashboard = Dashboard(trainer, clustertrainer)
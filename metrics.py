@@ -0,0 +1,180 @@
+import bisect
+import functools
+import os
+import threading
+import time
+
+# In-process metrics for the hot paths, exported in the Prometheus text format at
+# /metrics (routes.py). Recording is a lock, a dict lookup and an add, so it stays on
+# in production; METRICS_ENABLED=0 turns recording into a no-op. Every server process
+# keeps its own values: with several gunicorn workers each scrape sees one worker, and
+# the `pid` label tells them apart.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') != '0'
+
+# Latency buckets in seconds, from 100 us to 10 s
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                   2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = tuple(labels[name] for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self.values.get(tuple(labels[name] for name in self.labelnames), 0)
+
+    def render(self, extra_labels):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            items = sorted(self.values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key, extra_labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [count per bucket (non-cumulative, last one is +Inf), sum]
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def count(self, **labels):
+        entry = self.values.get(tuple(labels[name] for name in self.labelnames))
+        return sum(entry[0]) if entry else 0
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def render(self, extra_labels):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self.values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, list(extra_labels) + [('le', _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, extra_labels)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+# Context manager and decorator that observes the elapsed time into a histogram
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+    def __call__(self, function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            # A timer per call, so concurrent calls do not share a start time
+            with _Timer(self.histogram, self.labels):
+                return function(*args, **kwargs)
+        return wrapper
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        extra_labels = [('pid', os.getpid())]
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render(extra_labels))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+DB_QUERIES = registry.register(Counter(
+    'digitaltwin_db_queries_total', 'SQL statements executed, by statement type', ['statement']))
+DB_QUERY_ERRORS = registry.register(Counter(
+    'digitaltwin_db_query_errors_total', 'SQL statements that raised, by statement type', ['statement']))
+DB_QUERY_SECONDS = registry.register(Histogram(
+    'digitaltwin_db_query_duration_seconds', 'SQL statement latency, by statement type', ['statement']))
+
+PATIENT_SERVICE_SECONDS = registry.register(Histogram(
+    'digitaltwin_patient_service_duration_seconds', 'patient_service call latency, including caches',
+    ['function']))
+
+INFERENCE_SECONDS = registry.register(Histogram(
+    'digitaltwin_inference_duration_seconds', 'Model call latency, by pipeline stage', ['operation']))
+INFERENCE_ROWS = registry.register(Counter(
+    'digitaltwin_inference_rows_total', 'Rows passed through each pipeline stage', ['operation']))
+
+DASH_CALLBACK_SECONDS = registry.register(Histogram(
+    'digitaltwin_dash_callback_duration_seconds', 'Dash callback latency', ['callback']))
+DASH_CALLBACK_ERRORS = registry.register(Counter(
+    'digitaltwin_dash_callback_errors_total', 'Dash callbacks that raised', ['callback']))
+
+HTTP_REQUEST_SECONDS = registry.register(Histogram(
+    'digitaltwin_http_request_duration_seconds', 'HTTP request latency by route and status',
+    ['method', 'route', 'status']))
+
+INGEST_RECORDS = registry.register(Counter(
+    'digitaltwin_ingest_records_total', 'Uploaded patient records by endpoint and outcome',
+    ['endpoint', 'outcome']))
+
+
+def render():
+    return registry.render()
@@ -0,0 +1,122 @@
+import hashlib
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+
+from forest_inference import CompiledForest
+
+# Candidate hyperparameters for the random forest. The grid is visited in a shuffled
+# order, so a search cut short by its time budget still samples the whole space.
+SEARCH_SPACE = {
+    'n_estimators': [50, 100, 200],
+    'max_depth': [None, 8, 12, 16],
+    'min_samples_leaf': [1, 2, 5],
+    'max_features': ['sqrt', 0.5, None],
+}
+
+# Calls used to time single-row prediction of each candidate
+LATENCY_CALLS = 50
+
+# Fold indices by (labels digest, n_folds, seed), shared by every search in the process
+_fold_cache = {}
+
+# Training data and folds of the current search, set once per pool worker
+_worker_data = None
+
+
+def fold_splits(y, n_folds=5, seed=42):
+    y = np.asarray(y)
+    key = (hashlib.sha256(y.tobytes()).hexdigest(), len(y), n_folds, seed)
+    if key not in _fold_cache:
+        splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed)
+        _fold_cache[key] = [(train, test) for train, test in splitter.split(np.zeros(len(y)), y)]
+    return _fold_cache[key]
+
+
+def candidate_params(space=SEARCH_SPACE, seed=42):
+    names = list(space)
+    candidates = [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+    random.Random(seed).shuffle(candidates)
+    return candidates
+
+
+def _init_worker(X, y, folds):
+    # Runs once per pool process so the data and folds are not pickled with every task
+    global _worker_data
+    _worker_data = (X, y, folds)
+
+
+def single_row_latency_ms(model, row):
+    compiled = CompiledForest.from_sklearn(model)
+    compiled.predict_proba(row)
+    start = time.perf_counter()
+    for _ in range(LATENCY_CALLS):
+        compiled.predict_proba(row)
+    return (time.perf_counter() - start) / LATENCY_CALLS * 1000
+
+
+def evaluate_candidate(params):
+    X, y, folds = _worker_data
+    start = time.perf_counter()
+    aucs = []
+    for train, test in folds:
+        model = RandomForestClassifier(random_state=42, n_jobs=1, **params)
+        model.fit(X[train], y[train])
+        aucs.append(roc_auc_score(y[test], model.predict_proba(X[test])[:, 1]))
+    return {
+        'params': params,
+        'auc': float(np.mean(aucs)),
+        'auc_std': float(np.std(aucs)),
+        # The dashboard serves single rows through the compiled forest, so time that path
+        'latency_ms': single_row_latency_ms(model, X[:1]),
+        'fit_seconds': time.perf_counter() - start,
+    }
+
+
+def select_model(results, auc_tolerance):
+    # Fastest candidate whose AUC is within auc_tolerance of the best one
+    best_auc = max(result['auc'] for result in results)
+    eligible = [result for result in results if result['auc'] >= best_auc - auc_tolerance]
+    return min(eligible, key=lambda result: (result['latency_ms'], -result['auc']))
+
+
+def search_hyperparameters(X, y, budget_seconds=300, n_folds=5, max_workers=None, auc_tolerance=0.005,
+                           space=SEARCH_SPACE):
+    # Cross-validated search over space in a process pool. New candidates are only
+    # started while the wall-clock budget lasts; ones already running are allowed to
+    # finish. Returns (chosen result, all results).
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    y = np.asarray(y)
+    folds = fold_splits(y, n_folds)
+    candidates = iter(candidate_params(space))
+    max_workers = max_workers or os.cpu_count() or 1
+    deadline = time.monotonic() + budget_seconds
+
+    results = []
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(X, y, folds)) as pool:
+        running = set()
+        while True:
+            while len(running) < max_workers and time.monotonic() < deadline:
+                params = next(candidates, None)
+                if params is None:
+                    break
+                running.add(pool.submit(evaluate_candidate, params))
+            if not running:
+                break
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    print(f"Hyperparameter candidate failed: {e}")
+
+    if not results:
+        return None, results
+    return select_model(results, auc_tolerance), results
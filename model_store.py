@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import joblib
+import sklearn
+
+from dataset_cache import DatasetCache
+from data_preprocessor import DataPreprocessor
+from streaming_preprocessor import StreamingPreprocessor, STREAM_QUANTILE_ACCURACY, STREAM_FREQUENT_ITEMS
+from model_trainer import ModelTrainer, STREAM_TRAIN_MAX_ROWS
+from cluster_model_trainer import ClusterModelTrainer
+from model_search import SEARCH_SPACE
+from risk_pipeline import RiskPipeline
+
+# Bump when the layout of the saved artifact changes so old entries are ignored
+ARTIFACT_FORMAT_VERSION = 2
+
+MODEL_STORE_DIR = os.getenv('MODEL_STORE_DIR', 'model_store')
+
+# Use relative path for the dataset
+DATASET_PATH = 'heart datasets/Metabolic Syndrome_Minhas Open data set.xlsx'
+SELECTED_FEATURES = ['Age', 'WaistCirc', 'BMI', 'BloodGlucose', 'HDL', 'Triglycerides']
+
+# TRAIN_MODE=search tunes the forest with a cross-validated search before training.
+# Among candidates within SEARCH_AUC_TOLERANCE of the best AUC the fastest to predict
+# a single row wins, since that is what the dashboard does every second.
+TRAIN_MODE = os.getenv('TRAIN_MODE', 'default')
+SEARCH_BUDGET_SECONDS = float(os.getenv('SEARCH_BUDGET_SECONDS', '300'))
+SEARCH_CV_FOLDS = int(os.getenv('SEARCH_CV_FOLDS', '5'))
+SEARCH_MAX_WORKERS = int(os.getenv('SEARCH_MAX_WORKERS', '0')) or None
+SEARCH_AUC_TOLERANCE = float(os.getenv('SEARCH_AUC_TOLERANCE', '0.005'))
+
+# PREPROCESS_MODE=streaming reads the dataset in chunks with sketched imputation values and
+# trains on a bounded sample (streaming_preprocessor.py), for sources larger than memory;
+# 'memory' (default) loads the whole dataset
+PREPROCESS_MODE = os.getenv('PREPROCESS_MODE', 'memory')
+
+
+class ModelStore:
+    def __init__(self, root=MODEL_STORE_DIR):
+        self.root = root
+
+    def make_key(self, file_path, selected_features, params):
+        # Everything that changes the fitted models must be part of the key
+        key_material = {
+            'format_version': ARTIFACT_FORMAT_VERSION,
+            'sklearn_version': sklearn.__version__,
+            'dataset_sha256': DatasetCache().source_digest(file_path),
+            'selected_features': list(selected_features),
+            'params': params,
+        }
+        encoded = json.dumps(key_material, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, key)
+
+    def load(self, key):
+        artifact_path = os.path.join(self._entry_dir(key), 'models.joblib')
+        if not os.path.exists(artifact_path):
+            return None
+        try:
+            return joblib.load(artifact_path)
+        except Exception as e:
+            print(f"Failed to load model artifact {key[:12]}: {e}")
+            return None
+
+    def save(self, key, artifact, manifest):
+        os.makedirs(self.root, exist_ok=True)
+        entry_dir = self._entry_dir(key)
+        # Write into a temporary directory first so readers never see a half-written entry
+        tmp_dir = f"{entry_dir}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        joblib.dump(artifact, os.path.join(tmp_dir, 'models.joblib'))
+        with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True, default=str)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(tmp_dir, entry_dir)
+
+
+def load_or_train(file_path, selected_features, n_clusters=3, store=None):
+    store = store or ModelStore()
+    trainer = ModelTrainer(selected_features)
+    clustertrainer = ClusterModelTrainer(n_clusters=n_clusters)
+
+    model_params = trainer.model.get_params()
+    # The number of cores does not change the fitted forest
+    model_params.pop('n_jobs')
+    params = {
+        'model': model_params,
+        'scaler': clustertrainer.scaler.get_params(),
+        'kmeans': clustertrainer.kmeans.get_params(),
+    }
+    if TRAIN_MODE == 'search':
+        params['search'] = {
+            'budget_seconds': SEARCH_BUDGET_SECONDS,
+            'cv_folds': SEARCH_CV_FOLDS,
+            'auc_tolerance': SEARCH_AUC_TOLERANCE,
+            'space': SEARCH_SPACE,
+        }
+    if PREPROCESS_MODE == 'streaming':
+        # The chunk size does not change the result, the sketches and the sample size do
+        params['streaming'] = {
+            'quantile_accuracy': STREAM_QUANTILE_ACCURACY,
+            'frequent_items': STREAM_FREQUENT_ITEMS,
+            'train_max_rows': STREAM_TRAIN_MAX_ROWS,
+        }
+    key = store.make_key(file_path, selected_features, params)
+
+    start = time.perf_counter()
+    artifact = store.load(key)
+    if artifact is not None:
+        pipeline = artifact['pipeline']
+        # Serve single-threaded per worker, also from artifacts stored with the training n_jobs
+        pipeline.forest.set_params(n_jobs=1)
+        trainer.model = pipeline.forest
+        trainer.imputer = pipeline.imputer
+        trainer.feature_importances = trainer.model.feature_importances_
+        trainer.model_version = key[:12]
+        trainer.pipeline = pipeline
+        clustertrainer = pipeline.cluster_model
+        print(f"Loaded models {key[:12]} from store in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return trainer, clustertrainer
+
+    print(f"No stored models for key {key[:12]}, training from {file_path}")
+
+    # Data Preprocessing
+    if PREPROCESS_MODE == 'streaming':
+        preprocessor = StreamingPreprocessor(file_path).fit()
+        trainer.prepare_data_from_chunks(preprocessor.iter_imputed_chunks())
+        print(f"Streamed {preprocessor.rows} rows, training on {len(trainer.X_train) + len(trainer.X_test)}")
+    else:
+        preprocessor = DataPreprocessor(file_path)
+        preprocessor.load_data()
+        preprocessor.impute_missing_values()
+        trainer.prepare_data(preprocessor.get_processed_data())
+
+    # Model Training
+    if TRAIN_MODE == 'search':
+        trainer.search_hyperparameters(budget_seconds=SEARCH_BUDGET_SECONDS, n_folds=SEARCH_CV_FOLDS,
+                                       max_workers=SEARCH_MAX_WORKERS, auc_tolerance=SEARCH_AUC_TOLERANCE)
+    trainer.train_model()
+    accuracy, precision, recall, roc_auc, _ = trainer.evaluate_model()
+    trainer.model_version = key[:12]
+
+    # Cluster Analysis
+    clustertrainer.fit(trainer.X_train)
+
+    # The whole fitted pipeline (imputer, forest, scaler and KMeans) is the artifact
+    trainer.pipeline = RiskPipeline.from_trainers(trainer, clustertrainer, version=trainer.model_version)
+    artifact = {
+        'pipeline': trainer.pipeline,
+        'selected_features': list(selected_features),
+    }
+    manifest = {
+        'key': key,
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'dataset': file_path,
+        'selected_features': list(selected_features),
+        'params': params,
+        'sklearn_version': sklearn.__version__,
+        'metrics': {'accuracy': accuracy, 'precision': precision, 'recall': recall, 'roc_auc': roc_auc},
+        'search': trainer.search_summary,
+    }
+    try:
+        store.save(key, artifact, manifest)
+        print(f"Saved models {key[:12]} to {store.root}")
+    except OSError as e:
+        # A read-only store should not stop the dashboard from starting
+        print(f"Failed to save model artifact {key[:12]}: {e}")
+
+    return trainer, clustertrainer
@@ -1,40 +1,53 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
 from sklearn.compose import ColumnTransformer
 from sklearn.ensemble import RandomForestClassifier
+from sklearn.impute import SimpleImputer
 from sklearn.metrics import accuracy_score, precision_score, recall_score, roc_auc_score, confusion_matrix
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import OneHotEncoder
 
+from model_search import search_hyperparameters
+
+# Cores used to fit the forest (-1: all of them); the fitted forest predicts on one
+TRAIN_N_JOBS = int(os.getenv('TRAIN_N_JOBS', '-1'))
+
+# Rows kept when training from a stream of chunks: a uniform sample of at most this many
+# rows, so training memory does not grow with the source
+STREAM_TRAIN_MAX_ROWS = int(os.getenv('STREAM_TRAIN_MAX_ROWS', '500000'))
+
 class ModelTrainer:
-    def __init__(self, selected_features):
+    def __init__(self, selected_features, n_jobs=TRAIN_N_JOBS):
         self.selected_features = selected_features
-        self.model = RandomForestClassifier(random_state=42)
+        self.model = RandomForestClassifier(random_state=42, n_jobs=n_jobs)
         self.X_train = None
         self.X_test = None
         self.y_train = None
         self.y_test = None
+        self.imputer = None
         self.feature_importances = None
+        self.model_version = None
+        self.search_summary = None
+        # RiskPipeline built from the fitted models (model_store.load_or_train)
+        self.pipeline = None
 
     def prepare_data(self, data):
         X = data[self.selected_features]
         y = data['MetabolicSyndrome']
-        
-        # Impute missing values with the median for continuous variables
-        for column in self.selected_features:
-            if X[column].isnull().any():
-                X[column].fillna(X[column].median(), inplace=True)
-
-        # Check again after imputation
-        missing_values_after_imputation = X.isnull().sum()
-        
-        # If all missing values are handled, proceed to train the model again
-        if not missing_values_after_imputation.any():
-            
-            for column in self.selected_features:
-                X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
-                self.X_train = X_train
-                self.X_test = X_test
-                self.y_train = y_train
-                self.y_test = y_test
+
+        # Impute missing values with the median for continuous variables. The fitted imputer
+        # is the first step of the RiskPipeline, so inference fills gaps the same way.
+        self.imputer = SimpleImputer(strategy='median')
+        X = pd.DataFrame(self.imputer.fit_transform(X), columns=self.selected_features, index=X.index)
+
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
+        self.X_train = X_train
+        self.X_test = X_test
+        self.y_train = y_train
+        self.y_test = y_test
 
         """
         preprocessor = ColumnTransformer(
@@ -47,8 +60,61 @@ class ModelTrainer:
         self.X_test = preprocessor.transform(self.X_test)
         """
 
+    def prepare_data_from_chunks(self, chunks, max_rows=STREAM_TRAIN_MAX_ROWS, seed=42):
+        # Same split as prepare_data, from an iterator of imputed DataFrame chunks. Only the
+        # selected features and the label are kept, in a reservoir sample (algorithm R,
+        # applied a chunk at a time) of at most max_rows rows.
+        rng = np.random.default_rng(seed)
+        columns = self.selected_features + ['MetabolicSyndrome']
+        reservoir = np.empty((0, len(columns)), dtype='float32')
+        seen = 0
+        for chunk in chunks:
+            rows = chunk[columns].to_numpy(dtype='float32')
+            # Fill the reservoir first, growing it geometrically up to max_rows
+            fill = min(len(rows), max(0, max_rows - seen))
+            if seen + fill > len(reservoir):
+                grown = np.empty((min(max_rows, max(seen + fill, 2 * len(reservoir))), len(columns)), dtype='float32')
+                grown[:seen] = reservoir[:seen]
+                reservoir = grown
+            reservoir[seen:seen + fill] = rows[:fill]
+            # Then row t (0-based over the stream) replaces a random slot with probability max_rows / (t + 1)
+            positions = np.arange(seen + fill, seen + len(rows))
+            slots = (rng.random(len(positions)) * (positions + 1)).astype(np.int64)
+            accepted = slots < max_rows
+            reservoir[slots[accepted]] = rows[fill:][accepted]
+            seen += len(rows)
+
+        sample = pd.DataFrame(reservoir[:min(seen, max_rows)], columns=columns)
+        self.prepare_data(sample.astype({'MetabolicSyndrome': 'int64'}))
+        return seen
+
+    def search_hyperparameters(self, budget_seconds=300, n_folds=5, max_workers=None, auc_tolerance=0.005):
+        # Cross-validated search on the training split; the chosen parameters are used by train_model
+        start = time.perf_counter()
+        best, results = search_hyperparameters(self.X_train.values, self.y_train.values, budget_seconds=budget_seconds,
+                                               n_folds=n_folds, max_workers=max_workers, auc_tolerance=auc_tolerance)
+        if best is None:
+            print("Hyperparameter search produced no results, keeping the default model settings")
+            return None
+
+        self.model.set_params(**best['params'])
+        self.search_summary = {
+            'params': best['params'],
+            'cv_auc': best['auc'],
+            'latency_ms': best['latency_ms'],
+            'best_cv_auc': max(result['auc'] for result in results),
+            'candidates_evaluated': len(results),
+            'seconds': time.perf_counter() - start,
+        }
+        print(f"Hyperparameter search evaluated {len(results)} candidates in {self.search_summary['seconds']:.1f} s, "
+              f"chose {best['params']} (AUC {best['auc']:.4f}, {best['latency_ms']:.3f} ms per row)")
+        return best
+
     def train_model(self):
         self.model.fit(self.X_train.values, self.y_train.values)
+        # TRAIN_N_JOBS is for fitting only: large batches predicted by sklearn would
+        # otherwise start a thread per core in every server worker
+        self.model.set_params(n_jobs=1)
         self.feature_importances = self.model.feature_importances_
 
     def evaluate_model(self):
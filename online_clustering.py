@@ -0,0 +1,219 @@
+import copy
+import os
+import threading
+import time
+
+import joblib
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from sklearn.cluster import MiniBatchKMeans
+
+from model_store import MODEL_STORE_DIR
+from patient_service import fetch_patients_after
+from risk_pipeline import FEATURE_COLUMNS
+
+# Bump when the checkpoint layout changes so old checkpoints are ignored
+CHECKPOINT_FORMAT_VERSION = 1
+
+# CLUSTER_MODE=online keeps updating the clusters from new patients; 'batch' (default)
+# serves the clusters fitted at training time unchanged
+CLUSTER_MODE = os.getenv('CLUSTER_MODE', 'batch')
+CLUSTER_UPDATE_BATCH_SIZE = int(os.getenv('CLUSTER_UPDATE_BATCH_SIZE', '100'))
+CLUSTER_UPDATE_INTERVAL = float(os.getenv('CLUSTER_UPDATE_INTERVAL', '30'))
+CLUSTER_CHECKPOINT_DIR = os.getenv('CLUSTER_CHECKPOINT_DIR', os.path.join(MODEL_STORE_DIR, 'online_clusters'))
+
+
+# Cluster model that keeps learning from new patients. It starts from the batch-fitted
+# StandardScaler and KMeans and updates both with partial_fit: the scaler keeps running
+# means and variances, the centers move by mini-batch k-means. Cluster labels keep the
+# meaning of the batch model (0/1/2 = lower/moderate/higher risk) by matching centers
+# after every update. Same predict interface as ClusterModelTrainer.
+class OnlineClusterModel:
+    def __init__(self, scaler, kmeans, label_map, base_version=None, last_patient_id=0, rows_seen=0, version=0):
+        # (scaler, kmeans, label_map) is replaced as a whole on update, so predict needs no lock
+        self.state = (scaler, kmeans, label_map)
+        self.base_version = base_version
+        self.last_patient_id = last_patient_id
+        self.rows_seen = rows_seen
+        self.version = version
+        self.update_lock = threading.Lock()
+
+    @classmethod
+    def from_cluster_trainer(cls, clustertrainer, base_version=None, batch_size=100):
+        kmeans = clustertrainer.kmeans
+        centers = kmeans.cluster_centers_
+        online = MiniBatchKMeans(n_clusters=len(centers), init=centers, n_init=1,
+                                 batch_size=batch_size, random_state=42)
+        # Seed the mini-batch counts with the batch model's cluster sizes, so the first new
+        # patients nudge the centers instead of replacing them. Each center repeated by its
+        # size has itself as mean, so this call leaves the centers where they are.
+        counts = np.bincount(kmeans.labels_, minlength=len(centers))
+        online.partial_fit(np.repeat(centers, counts, axis=0))
+        label_map = np.arange(len(centers))
+        return cls(copy.deepcopy(clustertrainer.scaler), online, label_map, base_version=base_version)
+
+    @property
+    def scaler(self):
+        return self.state[0]
+
+    @property
+    def kmeans(self):
+        return self.state[1]
+
+    @property
+    def cluster_centers(self):
+        # Centers in scaled feature space, indexed by stable label
+        scaler, kmeans, label_map = self.state
+        centers = np.empty_like(kmeans.cluster_centers_)
+        centers[label_map] = kmeans.cluster_centers_
+        return centers
+
+    def predict(self, X):
+        scaler, kmeans, label_map = self.state
+        return label_map[kmeans.predict(scaler.transform(np.asarray(X)))]
+
+    def partial_fit(self, X):
+        # X: raw feature matrix in model feature order
+        with self.update_lock:
+            scaler, kmeans, label_map = self.state
+            scaler = copy.deepcopy(scaler)
+            kmeans = copy.deepcopy(kmeans)
+
+            # Centers live in scaled space; carry them over to the updated scaling
+            previous_centers = scaler.inverse_transform(kmeans.cluster_centers_)
+            scaler.partial_fit(X)
+            kmeans.cluster_centers_ = scaler.transform(previous_centers)
+            kmeans.partial_fit(scaler.transform(X))
+
+            # Mini-batch k-means may re-seed a starved center; match every new center to the
+            # nearest previous one so labels follow the centers rather than their positions
+            new_centers = scaler.inverse_transform(kmeans.cluster_centers_)
+            distances = np.linalg.norm(previous_centers[:, None, :] - new_centers[None, :, :], axis=2)
+            previous_index, new_index = linear_sum_assignment(distances)
+            new_label_map = np.empty_like(label_map)
+            new_label_map[new_index] = label_map[previous_index]
+
+            self.state = (scaler, kmeans, new_label_map)
+            self.rows_seen += len(X)
+            self.version += 1
+
+    def checkpoint(self, path):
+        scaler, kmeans, label_map = self.state
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Write then rename so a crash never leaves a truncated checkpoint
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        joblib.dump({
+            'format_version': CHECKPOINT_FORMAT_VERSION,
+            'base_version': self.base_version,
+            'scaler': scaler,
+            'kmeans': kmeans,
+            'label_map': label_map,
+            'last_patient_id': self.last_patient_id,
+            'rows_seen': self.rows_seen,
+            'version': self.version,
+        }, tmp_path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, base_version=None):
+        # None when there is no usable checkpoint for this base model
+        try:
+            checkpoint = joblib.load(path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Failed to load cluster checkpoint {path}: {e}")
+            return None
+        if checkpoint.get('format_version') != CHECKPOINT_FORMAT_VERSION or checkpoint['base_version'] != base_version:
+            return None
+        return cls(checkpoint['scaler'], checkpoint['kmeans'], checkpoint['label_map'],
+                   base_version=checkpoint['base_version'], last_patient_id=checkpoint['last_patient_id'],
+                   rows_seen=checkpoint['rows_seen'], version=checkpoint['version'])
+
+
+def resume_or_start(clustertrainer, checkpoint_path, base_version=None, batch_size=100):
+    model = OnlineClusterModel.load(checkpoint_path, base_version)
+    if model is not None:
+        print(f"Resumed online clusters at patient {model.last_patient_id} ({model.rows_seen} rows absorbed)")
+        return model
+    return OnlineClusterModel.from_cluster_trainer(clustertrainer, base_version=base_version, batch_size=batch_size)
+
+
+# Background thread that feeds new rows of the patient table to an OnlineClusterModel.
+# Only whole batches of batch_size rows (by id) are applied, so every server process,
+# and a restarted one, applies exactly the same updates and agrees on cluster labels.
+class OnlineClusterUpdater:
+    def __init__(self, model, checkpoint_path, batch_size=100, interval=30, fetch_rows=fetch_patients_after):
+        self.model = model
+        self.checkpoint_path = checkpoint_path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.fetch_rows = fetch_rows
+        self.stopping = threading.Event()
+        self.thread = None
+        self.batches_applied = 0
+        self.last_update_ms = 0.0
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.stopping.clear()
+            self.thread = threading.Thread(target=self.run, name='cluster-updater', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        while not self.stopping.is_set():
+            try:
+                self.update()
+            except Exception as e:
+                print(f"Online cluster update failed: {e}")
+            self.stopping.wait(self.interval)
+
+    def update(self):
+        # Apply every complete batch available now; returns the number of batches applied
+        applied = 0
+        while not self.stopping.is_set():
+            rows = self.fetch_rows(self.model.last_patient_id, self.batch_size)
+            if len(rows) < self.batch_size:
+                break
+            start = time.perf_counter()
+            # Rows with missing measurements still count towards the batch but are not fitted
+            X = np.array([[getattr(row, column) for column in FEATURE_COLUMNS.values()] for row in rows
+                          if all(getattr(row, column) is not None for column in FEATURE_COLUMNS.values())],
+                         dtype='float64')
+            if len(X):
+                self.model.partial_fit(X)
+            self.model.last_patient_id = rows[-1].id
+            self.last_update_ms = (time.perf_counter() - start) * 1000
+            applied += 1
+        if applied:
+            self.batches_applied += applied
+            self.model.checkpoint(self.checkpoint_path)
+        return applied
+
+    def stop(self, timeout=5):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def stats(self):
+        return {
+            'version': self.model.version,
+            'last_patient_id': self.model.last_patient_id,
+            'rows_seen': self.model.rows_seen,
+            'batches_applied': self.batches_applied,
+            'last_update_ms': self.last_update_ms,
+        }
+
+
+def online_cluster_model(trainer, clustertrainer):
+    # Online model and its (not yet started) updater for the loaded models. Checkpoints
+    # are per model version, so retrained models start over from their own clusters.
+    # The trainer's RiskPipeline is switched to the online clusters as well.
+    checkpoint_path = os.path.join(CLUSTER_CHECKPOINT_DIR, f"{trainer.model_version}.joblib")
+    model = resume_or_start(clustertrainer, checkpoint_path, base_version=trainer.model_version,
+                            batch_size=CLUSTER_UPDATE_BATCH_SIZE)
+    updater = OnlineClusterUpdater(model, checkpoint_path, batch_size=CLUSTER_UPDATE_BATCH_SIZE,
+                                   interval=CLUSTER_UPDATE_INTERVAL)
+    if trainer.pipeline is not None:
+        trainer.pipeline = trainer.pipeline.with_cluster_model(model)
+    return model, updater
@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+# Read-through cache for patient rows, keyed by primary key, with a secondary
+# name -> ids index. Entries expire by TTL or LRU eviction; inserts invalidate the
+# affected names. The only in-place updates are the stored scores rewritten by
+# backfill_risk.py, usually from another process. It rewrites exactly the rows whose
+# model_version differs from the current model's, so with a version_source (a callable
+# returning the current version) such a cached row is treated as a miss and re-read.
+class PatientCache:
+    def __init__(self, max_size=10000, ttl_seconds=300, version_source=None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.version_source = version_source
+        self.rows = OrderedDict()
+        self.name_index = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, patient_id):
+        now = time.monotonic()
+        version = self.version_source() if self.version_source is not None else None
+        with self.lock:
+            entry = self.rows.get(patient_id)
+            if entry is None or entry[1] < now or (self.version_source is not None and
+                                                   entry[0].model_version != version):
+                if entry is not None:
+                    del self.rows[patient_id]
+                self.misses += 1
+                return None
+            self.rows.move_to_end(patient_id)
+            self.hits += 1
+            return entry[0]
+
+    def put_many(self, rows):
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self.lock:
+            for row in rows:
+                self.rows[row.id] = (row, expires_at)
+                self.rows.move_to_end(row.id)
+            while len(self.rows) > self.max_size:
+                self.rows.popitem(last=False)
+
+    def put(self, row):
+        self.put_many([row])
+
+    def get_ids_for_name(self, name):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.name_index.get(name)
+            if entry is None or entry[1] < now:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def put_ids_for_name(self, name, ids):
+        with self.lock:
+            self.name_index[name] = (tuple(ids), time.monotonic() + self.ttl_seconds)
+            # The name index holds short id lists; drop the oldest names past the size bound
+            while len(self.name_index) > self.max_size:
+                self.name_index.pop(next(iter(self.name_index)))
+
+    def invalidate_names(self, names):
+        with self.lock:
+            for name in names:
+                self.name_index.pop(name, None)
+
+    def clear(self):
+        with self.lock:
+            self.rows.clear()
+            self.name_index.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'rows': len(self.rows),
+                'names': len(self.name_index),
+                'max_size': self.max_size,
+            }
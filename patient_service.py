@@ -1,46 +1,172 @@
-from sqlalchemy import insert, desc
+import operator
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import insert, desc, func, select, and_, or_, DateTime, Float
 from connection import patient_table, Session
+from metrics import PATIENT_SERVICE_SECONDS
+from patient_cache import PatientCache
 
+# How long the patient id high-water mark may be served before MAX(id) is re-read
+CHANGE_FEED_REFRESH_SECONDS = float(os.getenv('CHANGE_FEED_REFRESH_SECONDS', '1'))
 
+# Comparison operators accepted by the past-patients filter
+PAGE_FILTER_OPERATORS = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+# Read-through cache of patient rows; the "latest id" slot is the high-water mark below
+patient_cache = PatientCache(
+    max_size=int(os.getenv('PATIENT_CACHE_SIZE', '10000')),
+    ttl_seconds=float(os.getenv('PATIENT_CACHE_TTL_SECONDS', '300'))
+)
+
+
+def track_model_version(version_source):
+    # Serve cached rows only while they carry the model_version returned by version_source
+    # (the server's RiskPipeline.stored_version), so scores rewritten by backfill_risk.py
+    # are re-read instead of served from the cache
+    patient_cache.version_source = version_source
+
+
+_high_water_mark = None
+_high_water_mark_checked_at = None
+_high_water_mark_lock = threading.Lock()
+
+
+def _patient_values(data):
+    # Map an API record onto the patient table columns
+    return {
+        'name': data.get('Name'),
+        'age': data['Age'],
+        'waist_circ': data['WaistCirc'],
+        'bmi': data['BMI'],
+        'blood_glucose': data['BloodGlucose'],
+        'hdl': data['HDL'],
+        'triglycerides': data['Triglycerides'],
+        'risk_probability': data.get('RiskProbability'),
+        'risk_cluster': data.get('RiskCluster'),
+        'model_version': data.get('ModelVersion')
+    }
+
+
+@PATIENT_SERVICE_SECONDS.time(function='insert_patient')
 def insert_patient(data):
     session = Session()
-    # Insert data statement using ORM dictionary unpacking
-    new_patient = patient_table.insert().values(
-        name=data['Name'],  # Make sure to include this if you've added a name column
-        age=data['Age'],
-        waist_circ=data['WaistCirc'],
-        bmi=data['BMI'],
-        blood_glucose=data['BloodGlucose'],
-        hdl=data['HDL'],
-        triglycerides=data['Triglycerides']
-    )
+    # Same column mapping as insert_patients, so Name is optional on both upload routes
+    new_patient = patient_table.insert().values(**_patient_values(data))
 
     try:
-        session.execute(new_patient)
+        result = session.execute(new_patient)
         session.commit()
+        patient_cache.invalidate_names([data.get('Name')])
+        _advance_high_water_mark(result.inserted_primary_key[0])
         print("Data inserted successfully.")
     except Exception as e:
         session.rollback()  # Rollback the changes on error
         print(f"Failed to insert data: {e}")
+        # Re-raise so the upload route answers 5xx and counts the write as failed
+        raise
     finally:
         session.close()  # Close the session to free resources
+
+
+@PATIENT_SERVICE_SECONDS.time(function='insert_patients')
+def insert_patients(records):
+    # Insert a chunk of records as one multi-row INSERT in a single transaction.
+    # Returns a list of (position, message) for the records that could not be stored.
+    if not records:
+        return []
+    session = Session()
+    try:
+        session.execute(patient_table.insert(), [_patient_values(data) for data in records])
+        session.commit()
+        patient_cache.invalidate_names({data.get('Name') for data in records})
+        _expire_high_water_mark()
+        return []
+    except Exception as e:
+        session.rollback()
+        print(f"Bulk insert of {len(records)} records failed, retrying row by row: {e}")
+
+        # Fall back to one row per transaction so a bad row only fails itself
+        errors = []
+        for position, data in enumerate(records):
+            try:
+                session.execute(patient_table.insert(), [_patient_values(data)])
+                session.commit()
+            except Exception as row_error:
+                session.rollback()
+                errors.append((position, str(row_error)))
+        patient_cache.invalidate_names({data.get('Name') for data in records})
+        _expire_high_water_mark()
+        return errors
+    finally:
+        session.close()
         
 
-def get_latest_patient():
+def _advance_high_water_mark(patient_id):
+    global _high_water_mark
+    with _high_water_mark_lock:
+        if patient_id is not None and (_high_water_mark is None or patient_id > _high_water_mark):
+            _high_water_mark = patient_id
+
+
+def _expire_high_water_mark():
+    # Multi-row inserts do not report their ids; re-read MAX(id) on the next check
+    global _high_water_mark_checked_at
+    with _high_water_mark_lock:
+        _high_water_mark_checked_at = None
+
+
+@PATIENT_SERVICE_SECONDS.time(function='get_latest_patient_id')
+def get_latest_patient_id():
+    # Change feed for the dashboard: the highest patient id, shared by every caller in
+    # this process and re-read at most once per CHANGE_FEED_REFRESH_SECONDS. Inserts made
+    # by this process advance it immediately; inserts from other processes (the API) are
+    # picked up on the next refresh. MAX(id) is answered from the primary key index.
+    global _high_water_mark, _high_water_mark_checked_at
+    now = time.monotonic()
+    with _high_water_mark_lock:
+        if _high_water_mark_checked_at is not None and now - _high_water_mark_checked_at < CHANGE_FEED_REFRESH_SECONDS:
+            return _high_water_mark
+
     session = Session()
     try:
-        # Assuming 'id' is the primary key that increments
-        latest_patient = session.execute(
-            patient_table.select().order_by(desc(patient_table.c.id)).limit(1)
-        ).fetchone()  # fetchone() to get only the latest record
+        latest_id = session.execute(select(func.max(patient_table.c.id))).scalar()
+    except Exception as e:
+        print(f"Error retrieving the latest patient id: {e}")
+        with _high_water_mark_lock:
+            return _high_water_mark
+    finally:
+        session.close()
+
+    with _high_water_mark_lock:
+        if latest_id is not None and (_high_water_mark is None or latest_id > _high_water_mark):
+            _high_water_mark = latest_id
+        _high_water_mark_checked_at = now
+        return _high_water_mark
+
 
-        return latest_patient if latest_patient else None  # Return the latest patient or None if no records
+@PATIENT_SERVICE_SECONDS.time(function='get_latest_patient')
+def get_latest_patient():
+    # The latest id comes from the shared high-water mark and the row from the cache,
+    # so repeated calls cost no round trips until a new patient arrives
+    latest_id = get_latest_patient_id()
+    if latest_id is None:
+        return None
+    try:
+        return fetch_patient_data_by_id(latest_id)
     except Exception as e:
         print(f"Error retrieving the latest patient: {e}")
         return None
-    finally:
-        session.close()
         
+@PATIENT_SERVICE_SECONDS.time(function='fetch_all_patients')
 def fetch_all_patients():
     session = Session()
     try:
@@ -49,6 +175,7 @@ def fetch_all_patients():
             patient_table.select().order_by(patient_table.c.id)
         ).fetchall()  # fetchall() to get all records
 
+        patient_cache.put_many(all_patients)
         return all_patients
     except Exception as e:
         print(f"Error retrieving all patients: {e}")
@@ -56,14 +183,149 @@ def fetch_all_patients():
     finally:
         session.close()
         
+@PATIENT_SERVICE_SECONDS.time(function='fetch_patient_data_by_id')
 def fetch_patient_data_by_id(patient_id):
+    patient = patient_cache.get(patient_id)
+    if patient is not None:
+        return patient
+
     session = Session()
     try:
         patient = session.execute(
             patient_table.select().where(patient_table.c.id == patient_id)
         ).fetchone()
+        if patient is not None:
+            patient_cache.put(patient)
         return patient
     finally:
         session.close()
-        
 
+
+@PATIENT_SERVICE_SECONDS.time(function='fetch_patient_ids_by_name')
+def fetch_patient_ids_by_name(name):
+    # Ids of all patients with this name, oldest first, served from the name index when fresh
+    ids = patient_cache.get_ids_for_name(name)
+    if ids is not None:
+        return ids
+
+    session = Session()
+    try:
+        ids = session.execute(
+            select(patient_table.c.id).where(patient_table.c.name == name).order_by(patient_table.c.id)
+        ).scalars().all()
+    finally:
+        session.close()
+    patient_cache.put_ids_for_name(name, ids)
+    return tuple(ids)
+
+
+@PATIENT_SERVICE_SECONDS.time(function='fetch_patients_after')
+def fetch_patients_after(last_id, limit=1000):
+    # Patients with id > last_id in id order, for consumers that follow the table in batches
+    session = Session()
+    try:
+        return session.execute(
+            patient_table.select().where(patient_table.c.id > last_id).order_by(patient_table.c.id).limit(limit)
+        ).fetchall()
+    finally:
+        session.close()
+
+
+def _date_prefix_range(prefix):
+    # '2024', '2024-06' or '2024-06-28...' -> [start, end) datetimes covering the prefix
+    parts = prefix.strip().split(' ')[0].split('-')
+    year = int(parts[0])
+    if len(parts) == 1 or not parts[1]:
+        return datetime(year, 1, 1), datetime(year + 1, 1, 1)
+    month = int(parts[1])
+    if len(parts) == 2 or not parts[2]:
+        start = datetime(year, month, 1)
+        return start, datetime(year + month // 12, month % 12 + 1, 1)
+    start = datetime(year, month, int(parts[2]))
+    return start, start + timedelta(days=1)
+
+
+def _filter_clauses(filters):
+    # filters: [(column name, operator, value)] as parsed from the DataTable filter query
+    clauses = []
+    for column_name, operator, value in filters or []:
+        column = patient_table.c[column_name]
+        if operator == 'contains':
+            # Typed % and _ are matched literally, not as wildcards
+            escaped = str(value).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            clauses.append(column.like(f"%{escaped}%", escape='\\'))
+        elif operator == 'datestartswith':
+            try:
+                start, end = _date_prefix_range(str(value))
+            except ValueError:
+                continue
+            clauses.append(and_(column >= start, column < end))
+        elif operator in PAGE_FILTER_OPERATORS:
+            clauses.append(PAGE_FILTER_OPERATORS[operator](column, value))
+    return clauses
+
+
+@PATIENT_SERVICE_SECONDS.time(function='count_patients')
+def count_patients(filters=None):
+    session = Session()
+    try:
+        return session.execute(
+            select(func.count()).select_from(patient_table).where(*_filter_clauses(filters))
+        ).scalar()
+    except Exception as e:
+        print(f"Error counting patients: {e}")
+        return 0
+    finally:
+        session.close()
+
+
+@PATIENT_SERVICE_SECONDS.time(function='fetch_patients_page')
+def fetch_patients_page(page_size, sort_column='created_at', descending=True, filters=None, cursor=None, offset=0):
+    # One page of patients ordered by (sort_column, id). When the caller passes the
+    # (sort value, id) of the last row of the previous page as cursor, the page is read
+    # with a keyset condition that walks the index; otherwise it falls back to OFFSET.
+    column = patient_table.c[sort_column]
+    id_column = patient_table.c.id
+    query = patient_table.select().where(*_filter_clauses(filters))
+
+    # The keyset condition matches ties by equality. A MySQL FLOAT column is single precision
+    # and never equals the double the cursor carries back, so those columns page by OFFSET.
+    if isinstance(column.type, Float):
+        cursor = None
+
+    if cursor is not None:
+        last_value, last_id = cursor
+        if last_value is not None and isinstance(column.type, DateTime):
+            last_value = datetime.fromisoformat(last_value)
+        # NULLs sort first ascending and last descending in both MySQL and SQLite
+        if last_value is None:
+            if descending:
+                query = query.where(and_(column.is_(None), id_column < last_id))
+            else:
+                query = query.where(or_(column.is_not(None), id_column > last_id))
+        elif descending:
+            query = query.where(or_(column < last_value,
+                                    and_(column == last_value, id_column < last_id),
+                                    column.is_(None)))
+        else:
+            query = query.where(or_(column > last_value,
+                                    and_(column == last_value, id_column > last_id)))
+    elif offset:
+        query = query.offset(offset)
+
+    if descending:
+        query = query.order_by(column.desc(), id_column.desc())
+    else:
+        query = query.order_by(column.asc(), id_column.asc())
+
+    session = Session()
+    try:
+        patients = session.execute(query.limit(page_size)).fetchall()
+        # Rows on screen are the ones a clinician is about to open
+        patient_cache.put_many(patients)
+        return patients
+    except Exception as e:
+        print(f"Error retrieving patients page: {e}")
+        return []
+    finally:
+        session.close()
@@ -0,0 +1,125 @@
+import copy
+import os
+
+import numpy as np
+
+from forest_inference import CompiledForest
+from metrics import INFERENCE_SECONDS, INFERENCE_ROWS
+
+# Batches up to this many rows go through the compiled forest; larger ones are
+# faster through sklearn's own tree code
+COMPILED_FOREST_MAX_ROWS = int(os.getenv('COMPILED_FOREST_MAX_ROWS', '256'))
+
+# Patient table column of each model feature
+FEATURE_COLUMNS = {
+    'Age': 'age',
+    'WaistCirc': 'waist_circ',
+    'BMI': 'bmi',
+    'BloodGlucose': 'blood_glucose',
+    'HDL': 'hdl',
+    'Triglycerides': 'triglycerides',
+}
+
+
+# Everything between a raw patient record and its risk, fitted together and stored as one
+# model store artifact:
+#
+#   median imputer -> selected features in model order -> random forest
+#   median imputer -> StandardScaler -> KMeans   (the ClusterModelTrainer)
+#
+# Records may leave out fields or carry None; those are filled with the training medians.
+# Single rows and batches go through the same NumPy preprocessing, and small batches are
+# predicted by the compiled forest. The cluster model can be swapped for an online one
+# (online_clustering.py) with the same predict interface.
+class RiskPipeline:
+    def __init__(self, features, imputer, forest, cluster_model, version=None):
+        self.features = list(features)
+        self.columns = [FEATURE_COLUMNS[feature] for feature in self.features]
+        self.imputer = imputer
+        self.forest = forest
+        self.cluster_model = cluster_model
+        self.version = version
+        self.medians = imputer.statistics_
+        self.compiled_forest = CompiledForest.from_sklearn(forest)
+        # Set on pipelines switched to online clusters (with_cluster_model)
+        self.online_clusters = False
+
+    @classmethod
+    def from_trainers(cls, trainer, clustertrainer, version=None):
+        return cls(trainer.selected_features, trainer.imputer, trainer.model, clustertrainer, version=version)
+
+    def __getstate__(self):
+        # The compiled forest is derived from the forest; rebuild it on load instead of storing it twice
+        state = self.__dict__.copy()
+        del state['compiled_forest']
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault('online_clusters', False)
+        self.__dict__.update(state)
+        self.compiled_forest = CompiledForest.from_sklearn(self.forest)
+
+    def with_cluster_model(self, cluster_model):
+        pipeline = copy.copy(self)
+        pipeline.cluster_model = cluster_model
+        pipeline.online_clusters = True
+        return pipeline
+
+    def stored_version(self):
+        # model_version stored with a score. Online clusters move as they absorb new patients,
+        # so their update count is part of it: rows scored against older centers then differ
+        # from the current version and backfill_risk.py rescores them.
+        if self.online_clusters and self.cluster_model.version:
+            return f"{self.version}.c{self.cluster_model.version}"
+        return self.version
+
+    def matrix(self, records):
+        # Raw records (dicts keyed by feature name, e.g. 'BloodGlucose', or patient column,
+        # e.g. 'blood_glucose') -> float64 matrix in model order, NaN where a value is missing
+        X = np.full((len(records), len(self.features)), np.nan)
+        for row, record in enumerate(records):
+            for position, (feature, column) in enumerate(zip(self.features, self.columns)):
+                value = record.get(feature, record.get(column))
+                if value is not None:
+                    X[row, position] = value
+        return X
+
+    def impute(self, X):
+        X = np.asarray(X, dtype='float64')
+        return np.where(np.isnan(X), self.medians, X)
+
+    def predict_proba(self, X):
+        return self._forest_proba(self.impute(X))
+
+    def predict_cluster(self, X):
+        return self._clusters(self.impute(X))
+
+    # The model stages on imputed matrices, timed per call in the inference metrics
+    def _forest_proba(self, X):
+        X = X.astype('float32')
+        INFERENCE_ROWS.inc(len(X), operation='predict_proba')
+        with INFERENCE_SECONDS.time(operation='predict_proba'):
+            if len(X) <= COMPILED_FOREST_MAX_ROWS:
+                return self.compiled_forest.predict_proba(X)
+            return self.forest.predict_proba(X)
+
+    def _clusters(self, X):
+        INFERENCE_ROWS.inc(len(X), operation='cluster_predict')
+        with INFERENCE_SECONDS.time(operation='cluster_predict'):
+            return self.cluster_model.predict(X)
+
+    def score(self, X, chunk_size=10000):
+        # (probability of metabolic syndrome, cluster) per row of a raw feature matrix. The
+        # matrix is imputed once; chunking bounds the temporary memory sklearn allocates
+        # for very large rosters.
+        X = self.impute(X)
+        probabilities = np.empty(len(X), dtype='float64')
+        clusters = np.empty(len(X), dtype='int64')
+        for start in range(0, len(X), chunk_size):
+            chunk = X[start:start + chunk_size]
+            probabilities[start:start + len(chunk)] = self._forest_proba(chunk)[:, 1]
+            clusters[start:start + len(chunk)] = self._clusters(chunk)
+        return probabilities, clusters
+
+    def score_records(self, records, chunk_size=10000):
+        return self.score(self.matrix(records), chunk_size=chunk_size)
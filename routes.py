@@ -1,20 +1,110 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, g, request, jsonify
+import atexit
+import json
+import os
+import threading
+import time
+import numpy as np
 import pandas as pd
-from patient_service import insert_patient
+from connection import wait_for_db
+from patient_service import insert_patient, insert_patients
+from ingest_buffer import IngestBuffer, IngestUnavailable
+from model_store import load_or_train, DATASET_PATH, SELECTED_FEATURES
+from analytics_service import population_analytics
+import metrics
+from metrics import HTTP_REQUEST_SECONDS, INGEST_RECORDS
+from scoring import (validate_records, score_matrix, score_records, risk_categories, CLUSTER_DESCRIPTIONS,
+                     FEATURE_FIELDS, MAX_FEATURE_MAGNITUDE)
 
-app = Flask(__name__)
+# The API routes live on a blueprint so they can be served standalone (app below)
+# or mounted on the dashboard's Flask server (serve.py)
+api = Blueprint('api', __name__)
 
+SCORE_BATCH_CHUNK_SIZE = int(os.getenv('SCORE_BATCH_CHUNK_SIZE', '10000'))
+SCORE_BATCH_MAX_RECORDS = int(os.getenv('SCORE_BATCH_MAX_RECORDS', '100000'))
+INGEST_CHUNK_SIZE = int(os.getenv('INGEST_CHUNK_SIZE', '500'))
 
-@app.route('/api/upload_patient_record', methods=['POST'])
-def upload_health_data():
-    data = request.json
-    if not data:
-        return jsonify(status="error", message="No data provided"), 400
-    
+# INGEST_MODE=write_behind queues single uploads and writes them in groups from a
+# background thread; INGEST_ACK chooses whether the API answers once the record is
+# queued ('enqueue', HTTP 202) or once its group is committed ('commit')
+INGEST_MODE = os.getenv('INGEST_MODE', 'sync')
+INGEST_ACK = os.getenv('INGEST_ACK', 'commit')
+INGEST_COMMIT_TIMEOUT = float(os.getenv('INGEST_COMMIT_TIMEOUT', '10'))
+
+_models = None
+_models_lock = threading.Lock()
+
+
+def _score_for_storage(records):
+    # Score records once as they are written. If scoring fails they are stored without
+    # a risk and backfill_risk.py fills it in later.
+    try:
+        trainer, clustertrainer = get_models()
+        score_records(trainer.pipeline, records)
+    except Exception as e:
+        print(f"Scoring {len(records)} records for storage failed: {e}")
+
+
+def _score_and_insert_patients(records):
+    # One vectorized scoring pass per chunk or write-behind group
+    _score_for_storage(records)
+    return insert_patients(records)
+
+
+ingest_buffer = None
+if INGEST_MODE == 'write_behind':
+    ingest_buffer = IngestBuffer(
+        max_queue=int(os.getenv('INGEST_QUEUE_SIZE', '10000')),
+        batch_size=int(os.getenv('INGEST_BATCH_SIZE', '500')),
+        flush_interval=float(os.getenv('INGEST_FLUSH_INTERVAL_MS', '200')) / 1000,
+        write_batch=_score_and_insert_patients
+    )
+    atexit.register(ingest_buffer.stop)
+
+
+# Latency of every request the app serves, the dashboard's included when the blueprint is
+# mounted there, labelled by route pattern so ids in URLs do not multiply the series
+@api.before_app_request
+def start_request_timer():
+    g.request_started_at = time.perf_counter()
+
+
+@api.after_app_request
+def observe_request_latency(response):
+    started_at = g.pop('request_started_at', None)
+    if started_at is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started_at,
+                                     method=request.method, route=route, status=response.status_code)
+    return response
+
+
+@api.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+def set_models(trainer, clustertrainer):
+    global _models
+    _models = (trainer, clustertrainer)
+
+
+def get_models():
+    # The API process loads the models lazily from the model store on first use
+    global _models
+    if _models is None:
+        with _models_lock:
+            if _models is None:
+                _models = load_or_train(DATASET_PATH, SELECTED_FEATURES, n_clusters=3)
+    return _models
+
+
+def validate_patient_record(data):
+    # Check and convert an uploaded record in place; returns an error message or None
     required_fields = ['Age', 'WaistCirc', 'BMI', 'BloodGlucose', 'HDL', 'Triglycerides']
     missing_fields = [field for field in required_fields if field not in data]
     if missing_fields:
-        return jsonify(status="error", message="Missing fields: " + ", ".join(missing_fields)), 400
+        return "Missing fields: " + ", ".join(missing_fields)
     
     try:
         data['Age'] = int(data['Age'])
@@ -23,15 +113,191 @@ def upload_health_data():
         data['BloodGlucose'] = float(data['BloodGlucose'])
         data['HDL'] = float(data['HDL'])
         data['Triglycerides'] = float(data['Triglycerides'])
-    except ValueError as e:
-        return jsonify(status="error", message="Invalid data format"), 400
+    except (TypeError, ValueError) as e:
+        return "Invalid data format"
+    # float() accepts "inf", "nan" and 1e400; none of them can be scored or stored
+    if not all(abs(data[field]) <= MAX_FEATURE_MAGNITUDE for field in required_fields):
+        return "Value out of range"
+    return None
+
+
+@api.route('/api/upload_patient_record', methods=['POST'])
+def upload_health_data():
+    data = request.json
+    if not data:
+        INGEST_RECORDS.inc(endpoint='single', outcome='invalid')
+        return jsonify(status="error", message="No data provided"), 400
     
+    error = validate_patient_record(data)
+    if error:
+        INGEST_RECORDS.inc(endpoint='single', outcome='invalid')
+        return jsonify(status="error", message=error), 400
     
+    if ingest_buffer is not None:
+        return _enqueue_health_data(data)
+
     try:
+        _score_for_storage([data])
         insert_patient(data)
+        INGEST_RECORDS.inc(endpoint='single', outcome='stored')
         return jsonify(status="success", message="Data received successfully")
     except Exception as e:
+        INGEST_RECORDS.inc(endpoint='single', outcome='failed')
         return jsonify(status="error", message=str(e)), 500
 
+
+def _enqueue_health_data(data):
+    try:
+        pending = ingest_buffer.submit(data)
+    except IngestUnavailable as e:
+        # Backpressure: the client should retry shortly
+        INGEST_RECORDS.inc(endpoint='single', outcome='rejected')
+        return jsonify(status="error", message=str(e)), 503, {'Retry-After': '1'}
+
+    if INGEST_ACK == 'enqueue':
+        INGEST_RECORDS.inc(endpoint='single', outcome='queued')
+        return jsonify(status="accepted", message="Data queued for storage"), 202
+
+    if not pending.committed.wait(INGEST_COMMIT_TIMEOUT):
+        INGEST_RECORDS.inc(endpoint='single', outcome='timeout')
+        return jsonify(status="error", message="Timed out waiting for the write to commit"), 504
+    if pending.error:
+        INGEST_RECORDS.inc(endpoint='single', outcome='failed')
+        return jsonify(status="error", message=pending.error), 500
+    INGEST_RECORDS.inc(endpoint='single', outcome='stored')
+    return jsonify(status="success", message="Data received successfully")
+
+
+@api.route('/api/ingest_stats', methods=['GET'])
+def ingest_stats():
+    if ingest_buffer is None:
+        return jsonify(mode=INGEST_MODE)
+    return jsonify(mode=INGEST_MODE, ack=INGEST_ACK, **ingest_buffer.stats())
+
+def _iter_bulk_records():
+    # Yields (index, record, error) from an NDJSON stream or a JSON array body
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        index = 0
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield index, json.loads(line), None
+            except ValueError:
+                yield index, None, "Invalid JSON"
+            index += 1
+        return
+
+    records = request.get_json(silent=True)
+    if not isinstance(records, list):
+        raise ValueError("Expected a JSON array or an NDJSON body")
+    for index, record in enumerate(records):
+        yield index, record, None
+
+
+@api.route('/api/upload_patient_records', methods=['POST'])
+def upload_health_data_bulk():
+    received = 0
+    inserted = 0
+    errors = []
+    chunk = []
+    chunk_indices = []
+
+    def flush():
+        nonlocal inserted
+        failed = _score_and_insert_patients(chunk)
+        for position, message in failed:
+            errors.append({'index': chunk_indices[position], 'message': message})
+        inserted += len(chunk) - len(failed)
+        INGEST_RECORDS.inc(len(chunk) - len(failed), endpoint='bulk', outcome='stored')
+        INGEST_RECORDS.inc(len(failed), endpoint='bulk', outcome='failed')
+        chunk.clear()
+        chunk_indices.clear()
+
+    try:
+        for index, record, error in _iter_bulk_records():
+            received += 1
+            if error is None and not isinstance(record, dict):
+                error = "Record must be a JSON object"
+            if error is None:
+                error = validate_patient_record(record)
+            if error:
+                errors.append({'index': index, 'message': error})
+                INGEST_RECORDS.inc(endpoint='bulk', outcome='invalid')
+                continue
+            chunk.append(record)
+            chunk_indices.append(index)
+            if len(chunk) >= INGEST_CHUNK_SIZE:
+                flush()
+        flush()
+    except ValueError as e:
+        return jsonify(status="error", message=str(e)), 400
+    except Exception as e:
+        return jsonify(status="error", message=str(e), received=received, inserted=inserted, errors=errors), 500
+
+    if received == 0:
+        return jsonify(status="error", message="No data provided"), 400
+    if inserted == 0:
+        return jsonify(status="error", received=received, inserted=0, errors=errors), 400
+    status = "success" if not errors else "partial"
+    return jsonify(status=status, received=received, inserted=inserted, errors=errors)
+
+
+@api.route('/api/score_batch', methods=['POST'])
+def score_batch():
+    records = request.get_json(silent=True)
+    if isinstance(records, dict):
+        records = records.get('records')
+    if not isinstance(records, list) or not records:
+        return jsonify(status="error", message="Expected a non-empty array of records"), 400
+    if len(records) > SCORE_BATCH_MAX_RECORDS:
+        return jsonify(status="error", message=f"At most {SCORE_BATCH_MAX_RECORDS} records per request"), 413
+
+    try:
+        chunk_size = int(request.args.get('chunk_size', SCORE_BATCH_CHUNK_SIZE))
+    except ValueError:
+        return jsonify(status="error", message="chunk_size must be an integer"), 400
+    if chunk_size <= 0:
+        return jsonify(status="error", message="chunk_size must be positive"), 400
+
+    # Missing or null fields are imputed by the pipeline; only malformed values are errors
+    X, positions, errors = validate_records(records, allow_missing=True)
+
+    try:
+        trainer, clustertrainer = get_models()
+        probabilities, clusters = score_matrix(trainer.pipeline, X, chunk_size=chunk_size)
+    except Exception as e:
+        return jsonify(status="error", message=str(e)), 500
+
+    categories = risk_categories(probabilities)
+    imputed = np.isnan(X)
+    results = [
+        {
+            'index': index,
+            'probability': probability,
+            'risk_category': category,
+            'cluster': cluster,
+            'cluster_description': CLUSTER_DESCRIPTIONS.get(cluster),
+            'imputed_fields': [field for field, flag in zip(FEATURE_FIELDS, row_imputed) if flag],
+        }
+        for index, probability, category, cluster, row_imputed in zip(
+            positions.tolist(), probabilities.tolist(), categories.tolist(), clusters.tolist(), imputed)
+    ]
+    return jsonify(status="success", count=len(records), scored=len(results), results=results, errors=errors)
+
+
+@api.route('/api/analytics/population', methods=['GET'])
+def population_analytics_summary():
+    try:
+        return jsonify(status="success", cache=population_analytics.stats(), **population_analytics.summary())
+    except Exception as e:
+        return jsonify(status="error", message=str(e)), 500
+
+
+app = Flask(__name__)
+app.register_blueprint(api)
+
 if __name__ == '__main__':
+    wait_for_db()
     app.run(debug=True, port=5000)
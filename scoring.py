@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+from risk_pipeline import FEATURE_COLUMNS
+
+# Feature order the models were trained on
+FEATURE_FIELDS = list(FEATURE_COLUMNS)
+
+# Same bands as the steps of the dashboard risk gauge (percent)
+RISK_BANDS = [25, 75]
+RISK_CATEGORIES = np.array(['Low', 'Moderate', 'High'])
+
+# The forest predicts on float32; larger magnitudes (and inf, which pd.to_numeric accepts
+# as "inf" or 1e400) cannot be scored
+MAX_FEATURE_MAGNITUDE = float(np.finfo(np.float32).max)
+
+CLUSTER_DESCRIPTIONS = {
+    0: "Lower risk",
+    1: "Moderate risk",
+    2: "Higher risk"
+}
+
+
+def risk_categories(probabilities):
+    # Vectorized mapping of probabilities (0-1) onto the gauge bands
+    return RISK_CATEGORIES[np.digitize(np.asarray(probabilities) * 100, RISK_BANDS, right=True)]
+
+
+def validate_records(records, allow_missing=False):
+    # Validate a list of records in one pass; returns the valid feature matrix,
+    # the positions of the valid records and a list of per-record errors. With
+    # allow_missing, absent or null fields are not errors and stay NaN in the matrix,
+    # for the RiskPipeline to impute.
+    errors = []
+    dict_positions = []
+    for i, record in enumerate(records):
+        if isinstance(record, dict):
+            dict_positions.append(i)
+        else:
+            errors.append({'index': i, 'message': "Record must be a JSON object"})
+
+    if not dict_positions:
+        return np.empty((0, len(FEATURE_FIELDS))), np.empty(0, dtype=int), errors
+
+    frame = pd.DataFrame.from_records([records[i] for i in dict_positions], columns=FEATURE_FIELDS)
+    missing = frame.isna().to_numpy()
+    if allow_missing:
+        missing = np.zeros_like(missing)
+    values = frame.apply(pd.to_numeric, errors='coerce')
+    invalid = values.isna().to_numpy() & ~frame.isna().to_numpy()
+    numbers = values.to_numpy(dtype='float64')
+    out_of_range = ~np.isnan(numbers) & ~(np.abs(numbers) <= MAX_FEATURE_MAGNITUDE)
+
+    bad_rows = np.flatnonzero(missing.any(axis=1) | invalid.any(axis=1) | out_of_range.any(axis=1))
+    for row in bad_rows:
+        messages = []
+        missing_fields = [field for field, flag in zip(FEATURE_FIELDS, missing[row]) if flag]
+        invalid_fields = [field for field, flag in zip(FEATURE_FIELDS, invalid[row]) if flag]
+        out_of_range_fields = [field for field, flag in zip(FEATURE_FIELDS, out_of_range[row]) if flag]
+        if missing_fields:
+            messages.append("Missing fields: " + ", ".join(missing_fields))
+        if invalid_fields:
+            messages.append("Invalid data format: " + ", ".join(invalid_fields))
+        if out_of_range_fields:
+            messages.append("Value out of range: " + ", ".join(out_of_range_fields))
+        errors.append({'index': dict_positions[row], 'message': "; ".join(messages)})
+    errors.sort(key=lambda error: error['index'])
+
+    good_rows = np.setdiff1d(np.arange(len(dict_positions)), bad_rows)
+    X = numbers[good_rows]
+    return X, np.asarray(dict_positions)[good_rows], errors
+
+
+def score_records(pipeline, records):
+    # Annotate validated upload records in place with their risk, stored with the row
+    # The version is read first: if the online clusters move while scoring, the rows carry
+    # the older version and the backfill rescores them
+    model_version = pipeline.stored_version()
+    probabilities, clusters = pipeline.score_records(records)
+    for record, probability, cluster in zip(records, probabilities.tolist(), clusters.tolist()):
+        record['RiskProbability'] = probability
+        record['RiskCluster'] = cluster
+        record['ModelVersion'] = model_version
+
+
+def score_matrix(pipeline, X, chunk_size=10000):
+    # One vectorized pass of the RiskPipeline per chunk; NaN values are imputed
+    return pipeline.score(X, chunk_size=chunk_size)
@@ -0,0 +1,92 @@
+import gc
+import multiprocessing
+import os
+
+from gunicorn.app.base import BaseApplication
+
+import connection
+import routes
+from connection import wait_for_db
+from dashboard import Dashboard
+from model_store import load_or_train, DATASET_PATH, SELECTED_FEATURES
+from online_clustering import CLUSTER_MODE, online_cluster_model
+
+# Production entry point: the dashboard and the /api routes on one gunicorn server.
+# Models are trained or loaded once in the master process; forked workers share the
+# forest, scaler and KMeans arrays copy-on-write and each opens its own DB pool.
+SERVE_HOST = os.getenv('SERVE_HOST', '0.0.0.0')
+SERVE_PORT = int(os.getenv('SERVE_PORT', '8050'))
+SERVE_WORKERS = int(os.getenv('SERVE_WORKERS', str(multiprocessing.cpu_count())))
+SERVE_THREADS = int(os.getenv('SERVE_THREADS', '4'))
+SERVE_TIMEOUT = int(os.getenv('SERVE_TIMEOUT', '60'))
+SERVE_GRACEFUL_TIMEOUT = int(os.getenv('SERVE_GRACEFUL_TIMEOUT', '30'))
+
+# Started in each worker after the fork when CLUSTER_MODE=online
+cluster_updater = None
+
+
+def create_app():
+    global cluster_updater
+    trainer, clustertrainer = load_or_train(DATASET_PATH, SELECTED_FEATURES, n_clusters=3)
+    if CLUSTER_MODE == 'online':
+        clustertrainer, cluster_updater = online_cluster_model(trainer, clustertrainer)
+
+    dashboard = Dashboard(trainer, clustertrainer)
+    dashboard.layout()
+    dashboard.add_callbacks()
+
+    # Mount the API on the dashboard's Flask server and let it reuse the loaded models
+    routes.set_models(trainer, clustertrainer)
+    dashboard.app.server.register_blueprint(routes.api)
+    return dashboard.app.server
+
+
+def post_fork(server, worker):
+    # Connections opened by the master (wait_for_db) must not be shared across processes
+    connection.dispose_engine()
+    # Threads do not survive fork; every worker applies the same whole batches to its own copy
+    if cluster_updater is not None:
+        cluster_updater.start()
+
+
+def worker_exit(server, worker):
+    if cluster_updater is not None:
+        cluster_updater.stop()
+    if routes.ingest_buffer is not None:
+        routes.ingest_buffer.stop()
+
+
+class DigitalTwinServer(BaseApplication):
+    def __init__(self, application, options):
+        self.application = application
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+
+if __name__ == '__main__':
+    # Wait for database to be ready
+    wait_for_db()
+
+    application = create_app()
+    # Move everything loaded so far out of the garbage collector's reach so that
+    # collections in the workers do not write to (and un-share) the model pages
+    gc.freeze()
+
+    DigitalTwinServer(application, {
+        'bind': f"{SERVE_HOST}:{SERVE_PORT}",
+        'workers': SERVE_WORKERS,
+        'threads': SERVE_THREADS,
+        'worker_class': 'gthread',
+        'timeout': SERVE_TIMEOUT,
+        'graceful_timeout': SERVE_GRACEFUL_TIMEOUT,
+        'preload_app': True,
+        'post_fork': post_fork,
+        'worker_exit': worker_exit,
+    }).run()
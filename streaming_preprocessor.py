@@ -0,0 +1,156 @@
+import math
+import os
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+# Out-of-core counterpart of DataPreprocessor for sources larger than memory. The source
+# is read twice in chunks: the first pass feeds bounded-memory sketches (medians of the
+# numerical columns, most frequent values of the categorical ones), the second yields
+# imputed chunks. Nothing ever holds more than one chunk of the source.
+
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', '50000'))
+# Relative accuracy of the streamed medians
+STREAM_QUANTILE_ACCURACY = float(os.getenv('STREAM_QUANTILE_ACCURACY', '0.001'))
+# Counters kept per categorical column; the most frequent value is exact while a column
+# has at most this many distinct values
+STREAM_FREQUENT_ITEMS = int(os.getenv('STREAM_FREQUENT_ITEMS', '64'))
+
+
+# Quantiles with bounded relative error from logarithmic buckets (the DDSketch scheme):
+# a value v > 0 falls in bucket ceil(log_gamma(v)) with gamma = (1 + a) / (1 - a), and the
+# bucket is reported as the value within relative error a of everything in it. Memory
+# grows with the logarithm of the value range, not with the number of values, and whole
+# chunks are added with NumPy.
+class QuantileSketch:
+    def __init__(self, relative_accuracy=STREAM_QUANTILE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+        self.count = 0
+
+    def _add_buckets(self, buckets, values):
+        keys, counts = np.unique(np.ceil(np.log(values) / self.log_gamma).astype(np.int64), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            buckets[key] = buckets.get(key, 0) + count
+
+    def update(self, values):
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self._add_buckets(self.positive, values[values > 0])
+        self._add_buckets(self.negative, -values[values < 0])
+        self.zeros += int((values == 0).sum())
+        self.count += len(values)
+
+    def _bucket_value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q):
+        if self.count == 0:
+            return np.nan
+        rank = q * (self.count - 1)
+        seen = 0
+        # Walk the buckets from the most negative value up
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._bucket_value(key)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._bucket_value(key)
+        return self._bucket_value(max(self.positive))
+
+
+# Misra-Gries frequent items summary with at most `capacity` counters. Chunks are added
+# as value counts and merged the mergeable-summary way: sum the counters, then subtract
+# the (capacity + 1)-th largest count from all of them and drop what is no longer positive.
+class FrequentItems:
+    def __init__(self, capacity=STREAM_FREQUENT_ITEMS):
+        self.capacity = capacity
+        self.counters = {}
+
+    def update(self, values):
+        for value, count in pd.Series(values).dropna().value_counts().items():
+            self.counters[value] = self.counters.get(value, 0) + int(count)
+        if len(self.counters) > self.capacity:
+            threshold = sorted(self.counters.values(), reverse=True)[self.capacity]
+            self.counters = {value: count - threshold for value, count in self.counters.items() if count > threshold}
+
+    def most_frequent(self):
+        if not self.counters:
+            return np.nan
+        # Ties go to the smallest value, like SimpleImputer(strategy='most_frequent')
+        return min(self.counters.items(), key=lambda item: (-item[1], item[0]))[0]
+
+
+def iter_source_chunks(file_path, chunk_size=STREAM_CHUNK_SIZE):
+    # DataFrames of up to chunk_size rows from a .csv file or the first sheet of a workbook
+    if file_path.lower().endswith('.csv'):
+        yield from pd.read_csv(file_path, chunksize=chunk_size)
+        return
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield pd.DataFrame(chunk, columns=header)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header)
+    finally:
+        workbook.close()
+
+
+class StreamingPreprocessor:
+    def __init__(self, file_path, chunk_size=STREAM_CHUNK_SIZE):
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self.numerical_cols = ['Age', 'Income', 'WaistCirc', 'BMI', 'UrAlbCr', 'UricAcid', 'BloodGlucose', 'HDL', 'Triglycerides']
+        self.categorical_cols = ['Sex', 'Marital']
+        self.medians = None
+        self.most_frequent = None
+        self.rows = 0
+
+    def chunks(self):
+        for chunk in iter_source_chunks(self.file_path, self.chunk_size):
+            chunk[self.numerical_cols] = chunk[self.numerical_cols].apply(pd.to_numeric, errors='coerce')
+            yield chunk
+
+    def fit(self):
+        # First pass: imputation values from the sketches
+        quantiles = {column: QuantileSketch() for column in self.numerical_cols}
+        frequent = {column: FrequentItems() for column in self.categorical_cols}
+        self.rows = 0
+        for chunk in self.chunks():
+            for column in self.numerical_cols:
+                quantiles[column].update(chunk[column].to_numpy(dtype='float64'))
+            for column in self.categorical_cols:
+                frequent[column].update(chunk[column])
+            self.rows += len(chunk)
+        self.medians = {column: sketch.quantile(0.5) for column, sketch in quantiles.items()}
+        self.most_frequent = {column: summary.most_frequent() for column, summary in frequent.items()}
+        return self
+
+    def iter_imputed_chunks(self):
+        # Second pass: the source again, chunk by chunk, with missing values filled in
+        if self.medians is None:
+            self.fit()
+        fill_values = {**self.medians, **self.most_frequent}
+        for chunk in self.chunks():
+            yield chunk.fillna(fill_values)